@@ -0,0 +1,102 @@
+"""
+Micro-benchmark of the export data processor against a synthetic
+Prometheus matrix result. It compares the current implementation
+with the previous one, which deep-copied the source data and every
+sample of every series.
+
+Usage: python3 benchmarks/export_processor.py [series] [points] [timestamp_format]
+"""
+from datetime import datetime
+from email.utils import formatdate
+from time import perf_counter
+import copy
+import sys
+
+benchmark_args = sys.argv[1:]
+sys.argv = [sys.argv[0], "--rule.path=.", "--config.file=.",
+            "--prom.addr=http://localhost:9090"]
+sys.path.insert(0, ".")
+
+from src.core.export import data_processor, replace_fields  # noqa: E402
+
+
+def synthetic_matrix(series: int, points: int) -> dict:
+    """Generates a Prometheus matrix result"""
+    start = 1706572800
+    return {
+        "status": "success",
+        "data": {
+            "resultType": "matrix",
+            "result": [
+                {
+                    "metric": {
+                        "__name__": "node_cpu_seconds_total",
+                        "instance": f"node-{i}.example.com:9100",
+                        "job": "node",
+                        "mode": "idle",
+                        "cpu": str(i % 64)
+                    },
+                    "values": [[start + p * 15, str(p * 0.25)] for p in range(points)]
+                } for i in range(series)
+            ]
+        }
+    }
+
+
+def legacy_data_processor(source_data: dict,
+                          custom_fields: dict,
+                          timestamp_format: str) -> tuple[list, list]:
+    """The matrix processor as it was before the rework"""
+
+    def format_timestamp(timestamp, fmt):
+        timestamp_formats = {
+            "unix": timestamp,
+            "rfc2822": formatdate(timestamp, localtime=True),
+            "iso8601": datetime.fromtimestamp(timestamp).isoformat(),
+            "rfc3339": datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='milliseconds'),
+            "friendly": datetime.fromtimestamp(timestamp).strftime('%A, %B %d, %Y %I:%M:%S %p')
+        }
+        return timestamp_formats[fmt]
+
+    data_raw = copy.deepcopy(source_data)
+    data_processed, unique_labels = [], set()
+    for ts in data_raw["data"]["result"]:
+        unique_labels.update(set(ts["metric"].keys()))
+        series = ts["metric"]
+        for idx in range(len(ts["values"])):
+            series_nested = copy.deepcopy(series)
+            series_nested["timestamp"] = format_timestamp(
+                ts["values"][idx][0], timestamp_format)
+            series_nested["value"] = ts["values"][idx][1]
+            replace_fields(series_nested, custom_fields)
+            data_processed.append(series_nested)
+    unique_labels = sorted(unique_labels)
+    unique_labels.extend(["timestamp", "value"])
+    replace_fields(unique_labels, custom_fields)
+    return unique_labels, data_processed
+
+
+def measure(processor, source_data: dict,
+            timestamp_format: str) -> tuple[float, list]:
+    """Runs the processor and consumes all rows"""
+    start = perf_counter()
+    _, rows = processor(source_data=source_data,
+                        custom_fields={"__name__": "name"},
+                        timestamp_format=timestamp_format)
+    rows = list(rows)
+    return perf_counter() - start, rows
+
+
+if __name__ == "__main__":
+    series = int(benchmark_args[0]) if len(benchmark_args) > 0 else 200
+    points = int(benchmark_args[1]) if len(benchmark_args) > 1 else 2000
+    timestamp_format = benchmark_args[2] if len(benchmark_args) > 2 else "unix"
+    data = synthetic_matrix(series, points)
+    legacy_time, legacy_rows = measure(legacy_data_processor, data, timestamp_format)
+    current_time, current_rows = measure(data_processor, data, timestamp_format)
+    assert legacy_rows == current_rows, "processors returned different rows"
+    rows = len(current_rows)
+    print(f"{series} series x {points} points ({rows} rows), {timestamp_format} timestamps")
+    print(f"legacy:  {legacy_time:8.3f}s  {rows / legacy_time:12.0f} rows/s")
+    print(f"current: {current_time:8.3f}s  {rows / current_time:12.0f} rows/s")
+    print(f"speed-up: {legacy_time / current_time:.1f}x")
@@ -0,0 +1,56 @@
+"""
+Micro-benchmark of the decoding of large Prometheus range query
+responses by the export. It compares the peak memory and the time
+of decoding the whole response at once, as the export did before,
+with decoding it while it is downloaded and spooling its series,
+followed by reading the samples of every series back.
+
+Usage: python3 benchmarks/result_spool.py [series] [points]
+"""
+from time import perf_counter
+import tracemalloc
+import json
+import sys
+
+benchmark_args = sys.argv[1:]
+sys.argv = [sys.argv[0], "--rule.path=.", "--config.file=.",
+            "--prom.addr=http://localhost:9090"]
+sys.path.insert(0, ".")
+
+from src.core.result_spool import spool_response  # noqa: E402
+
+
+def response(series: int, points: int) -> bytes:
+    """Builds the body of a range query response"""
+    result = [{"metric": {"__name__": "node_cpu_seconds_total", "instance": f"node-{i}:9100",
+                          "job": "node", "mode": "user", "cpu": str(i % 64)},
+               "values": [[1706572800 + j * 15, f"{i * j * 0.001:.3f}"] for j in range(points)]}
+              for i in range(series)]
+    return json.dumps({"status": "success", "data": {"resultType": "matrix", "result": result}}).encode()
+
+
+def chunks(body: bytes, size: int = 1024 * 1024):
+    for i in range(0, len(body), size):
+        yield body[i:i + size]
+
+
+def measure(decode, body: bytes) -> tuple[float, float, int]:
+    """Decodes the response, reads every series and returns the time, peak memory and samples"""
+    tracemalloc.start()
+    start = perf_counter()
+    samples = sum(len(ts["values"]) for ts in decode(body)["data"]["result"])
+    duration = perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak, samples
+
+
+if __name__ == "__main__":
+    series = int(benchmark_args[0]) if len(benchmark_args) > 0 else 500
+    points = int(benchmark_args[1]) if len(benchmark_args) > 1 else 2000
+    body = response(series, points)
+    print(f"response: {len(body) / 1024 / 1024:.1f}MiB, {series} series, {points} points each")
+    for name, decode in [("json.loads", json.loads), ("spooled", lambda b: spool_response(chunks(b)))]:
+        duration, peak, samples = measure(decode, body)
+        print(f"{name:<10} time: {duration:7.3f}s  peak memory: {peak / 1024 / 1024:8.1f}MiB  "
+              f"samples: {samples}")
@@ -0,0 +1,115 @@
+"""
+Micro-benchmark of the JSON schema validation of the configs, rules
+and export payloads. It compares the current implementation, which
+compiles one validator per schema and reuses it, with the previous
+one, which loaded the schema from disk and built a new validator on
+every request.
+
+Usage: python3 benchmarks/validations.py [iterations]
+"""
+from jsonschema import validate, exceptions
+from time import perf_counter
+import json
+import sys
+
+benchmark_args = sys.argv[1:]
+sys.argv = [sys.argv[0], "--rule.path=.", "--config.file=.",
+            "--prom.addr=http://localhost:9090"]
+sys.path.insert(0, ".")
+
+from src.utils.validations import validate_schema  # noqa: E402
+
+payloads = {
+    "configs.json": {
+        "global": {
+            "scrape_interval": "15s",
+            "evaluation_interval": "15s",
+            "external_labels": {"env": "production"}
+        },
+        "rule_files": ["/etc/prometheus/rules/*.yml"],
+        "alerting": {
+            "alertmanagers": [{"static_configs": [{"targets": ["alertmanager:9093"]}]}]
+        },
+        "scrape_configs": [
+            {
+                "job_name": f"node-{i}",
+                "scrape_interval": "30s",
+                "metrics_path": "/metrics",
+                "static_configs": [
+                    {
+                        "targets": [f"node-{i}-{j}.example.com:9100" for j in range(10)],
+                        "labels": {"team": "infrastructure"}
+                    }
+                ],
+                "relabel_configs": [
+                    {
+                        "source_labels": ["__address__"],
+                        "regex": "(.*):9100",
+                        "target_label": "instance",
+                        "replacement": "$1"
+                    }
+                ]
+            } for i in range(20)
+        ]
+    },
+    "rules.json": {
+        "groups": [
+            {
+                "name": f"ServiceHealthAlerts{i}",
+                "rules": [
+                    {
+                        "alert": "HighCPUUsage",
+                        "expr": "sum(rate(cpu_usage{job=\"webserver\"}[5m])) > 0.8",
+                        "for": "5m",
+                        "labels": {"severity": "warning"},
+                        "annotations": {"summary": "High CPU Usage Detected"}
+                    },
+                    {
+                        "record": "code:prometheus_http_requests_total:sum",
+                        "expr": "sum by (code) (prometheus_http_requests_total)"
+                    }
+                ]
+            } for i in range(10)
+        ]
+    },
+    "export.json": {
+        "expr": "users_login_count{status='success'}",
+        "start": "2024-01-30T00:00:00Z",
+        "end": "2024-01-31T23:59:59Z",
+        "step": "1h",
+        "timestamp_format": "iso8601",
+        "replace_fields": {"__name__": "Name", "timestamp": "Time"}
+    }
+}
+
+
+def legacy_validate_schema(schema_file, data) -> tuple[bool, int, str, str]:
+    """The schema validation as it was before the rework"""
+    schema_file = f"src/schemas/{schema_file}"
+    with open(schema_file) as f:
+        schema = json.load(f)
+    try:
+        validate(instance=data, schema=schema)
+    except exceptions.ValidationError as e:
+        return False, 400, "error", e.args[0]
+    return True, 200, "success", "Data is valid"
+
+
+def measure(validator, schema_file: str, data: dict, iterations: int) -> tuple[float, tuple]:
+    """Validates the payload and returns the mean latency"""
+    start = perf_counter()
+    for _ in range(iterations):
+        result = validator(schema_file, data)
+    return (perf_counter() - start) / iterations, result
+
+
+if __name__ == "__main__":
+    iterations = int(benchmark_args[0]) if len(benchmark_args) > 0 else 200
+    validate_schema("configs.json", {})
+    for schema_file, data in payloads.items():
+        for payload, name in [(data, "valid"), ({**data, "unexpected": True}, "invalid")]:
+            legacy_time, legacy_result = measure(legacy_validate_schema, schema_file, payload, iterations)
+            current_time, current_result = measure(validate_schema, schema_file, payload, iterations)
+            assert legacy_result == current_result, "validators returned different results"
+            print(f"{schema_file:<13} {name:<8} legacy: {legacy_time * 1000:8.3f}ms  "
+                  f"current: {current_time * 1000:8.3f}ms  speed-up: {legacy_time / current_time:.1f}x")
@@ -1,6 +1,8 @@
 from fastapi.middleware.cors import CORSMiddleware
+from src.utils.validations import compile_schemas
 from src.utils.arguments import arg_parser
 from src.utils.scheduler import schedule
+from src.core.rule_index import index
 from src.api.v1.api import api_router
 from src.utils.openapi import openapi
 from src.utils.metrics import metrics
@@ -16,7 +18,8 @@ host, port = args.get("web.listen_address").split(":")
 if not all([settings.check_files_and_directories(),
             settings.check_fs_permissions(),
             settings.establish_prom_connection(),
-            settings.check_reload_api_status()]):
+            settings.check_reload_api_status(),
+            compile_schemas()]):
     sys.exit()
 
 
@@ -56,5 +59,6 @@ def main():
 
 
 if __name__ == "__main__":
+    index.start()
     schedule()
     main()
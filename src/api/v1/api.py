@@ -1,4 +1,4 @@
-from .. v1.endpoints import reverse_proxy, rules, policies, web, health, export, configs, docs
+from .. v1.endpoints import reverse_proxy, rules, policies, web, health, export, configs, docs, labels
 from fastapi import APIRouter
 
 api_router = APIRouter()
@@ -6,6 +6,7 @@ api_router.include_router(rules.router, prefix="/api/v1")
 api_router.include_router(export.router, prefix="/api/v1")
 api_router.include_router(policies.router, prefix="/api/v1")
 api_router.include_router(configs.router, prefix="/api/v1")
+api_router.include_router(labels.router, prefix="/api/v1")
 api_router.include_router(docs.router, prefix="")
 api_router.include_router(web.router, prefix="")
 api_router.include_router(health.router, prefix="")
@@ -1,13 +1,15 @@
+from fastapi.responses import StreamingResponse, FileResponse
 from fastapi import APIRouter, Response, Request, Body, status
+from starlette.concurrency import run_in_threadpool
+from src.core import export_jobs as exj
+from src.models.export import ExportData, ExportBundle
 from src.utils.validations import validate_schema
-from starlette.background import BackgroundTask
-from fastapi.responses import FileResponse
-from src.models.export import ExportData
 from src.core import export as exp
 from src.utils.log import logger
 from typing import Annotated
 
 router = APIRouter()
+exj.load_jobs()
 
 
 @router.post("/export",
@@ -59,36 +61,39 @@ router = APIRouter()
              )
 async def export(
         request: Request,
-        response: FileResponse or Response,
+        response: StreamingResponse or Response,
         data: Annotated[
             ExportData,
             Body(
                 openapi_examples=ExportData._request_body_examples,
             )
         ],
-        format: str = "csv"
+        format: str = "csv",
+        compression: str = None
 ):
     data = data.dict()
     expr = data.get("expr")
     start, end = data.get("start"), data.get("end")
     step = data["step"] = exp.auto_max_resolution(
         start, end) if data.get("step") == "auto" else data.get("step")
-    file, file_format = None, format.lower()
-    custom_fields, timestamp_format = data.get(
-        "replace_fields"), data.get("timestamp_format")
-    validation_status, response.status_code, sts, msg = validate_schema(
-        "export.json", data)
-    if validation_status:
-        range_query = True if all([start, end, step]) else False
-        resp_status, response.status_code, resp_data = exp.prom_query(
-            range_query=range_query,
-            query=expr, start=start,
-            end=end, step=step)
+    file_format = format.lower()
+    compression = compression.lower() if compression else None
+    validation_status, response.status_code, sts, msg = exp.validate_export(
+        data, file_format, compression)
+    key = exp.cache_key(data, file_format) if validation_status else None
+    cached = exp.result_cache.get(key) if key else None
+    if cached is not None:
+        content = iter([cached])
+        sts, msg = "success", f"{file_format.upper()} file is served from cache"
+    elif validation_status:
+        resp_status, response.status_code, resp_data = await run_in_threadpool(
+            exp.query_data, data)
         if resp_status:
-            labels, data_processed = exp.data_processor(
-                source_data=resp_data, custom_fields=custom_fields, timestamp_format=timestamp_format)
-            file_generator_status, sts, response.status_code, file, msg = exp.file_generator(
-                file_format=file_format, data=data_processed, fields=labels)
+            content = exp.content_generator(
+                source_data=resp_data, file_format=file_format, options=data)
+            if key:
+                content = exp.cache_generator(content, key)
+            sts, msg = "success", f"{file_format.upper()} file is being streamed"
         else:
             sts, msg = resp_data.get("status"), resp_data.get("error")
 
@@ -101,6 +106,347 @@ async def export(
             "method": request.method,
             "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
     if sts == "success":
-        return FileResponse(path=file,
-                            background=BackgroundTask(exp.cleanup_files, file))
+        filename, media_type = f"data.{file_format}", exp.export_formats[file_format]
+        headers = {"Vary": "Accept-Encoding", "X-Cache": "HIT" if cached is not None else "MISS"}
+        if compression and compression != "none":
+            extension, media_type = exp.compression_formats[compression]
+            filename = f"{filename}.{extension}"
+            content = exp.compress_generator(content, compression)
+        elif compression is None and file_format not in exp.columnar_formats:
+            content_encoding = exp.negotiate_compression(
+                request.headers.get("accept-encoding"))
+            if content_encoding:
+                headers["Content-Encoding"] = content_encoding
+                content = exp.compress_generator(content, content_encoding)
+        headers["Content-Disposition"] = f'attachment; filename="{filename}"'
+        return StreamingResponse(content, media_type=media_type, headers=headers)
     return {"status": sts, "query": expr, "message": msg}
+
+
+@router.post("/export/bundle",
+             name="Export a bundle of queries from Prometheus",
+             description="Runs several named PromQL queries over the same time range concurrently and exports "
+                         "them as a ZIP archive with one file per query, or as a single Parquet or Arrow file "
+                         "with a 'query_name' column",
+             status_code=status.HTTP_200_OK,
+             tags=["export"],
+             responses={
+                 200: {
+                     "description": "OK",
+                     "content": {
+                         "application/zip": {
+                             "example": "cpu.csv, memory.csv, disk.csv"
+                         }
+                     }
+                 },
+                 400: {
+                     "description": "Bad Request",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "query": "cpu",
+                                     "message": "invalid parameter 'query': 1:41: parse error: unclosed left parenthesis"
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 500: {
+                     "description": "Internal Server Error",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "query": "cpu",
+                                     "message": "Prometheus query has failed. HTTPConnectionPool(host='localhost', port=9090)"
+                                 }
+                             ]
+                         }
+                     }
+                 }
+             }
+             )
+async def export_bundle(
+        request: Request,
+        response: StreamingResponse or Response,
+        data: Annotated[
+            ExportBundle,
+            Body(
+                openapi_examples=ExportBundle._request_body_examples,
+            )
+        ],
+        format: str = "csv"
+):
+    data = data.dict()
+    start, end = data.get("start"), data.get("end")
+    step = data["step"] = exp.auto_max_resolution(
+        start, end) if data.get("step") == "auto" else data.get("step")
+    file_format, query = format.lower(), None
+    validation_status, response.status_code, sts, msg = validate_schema(
+        "export_bundle.json", data)
+    if validation_status:
+        validation_status, response.status_code, sts, msg = exp.validate_format(
+            file_format)
+    names = [q["name"] for q in data["queries"]]
+    if validation_status and len(set(names)) != len(names):
+        validation_status, response.status_code, sts, msg = \
+            False, 400, "error", "Names of the queries must be unique"
+    if validation_status:
+        resp_status, response.status_code, resp_data, results = await run_in_threadpool(
+            exp.query_bundle, data)
+        if resp_status:
+            sts, msg = "success", f"Bundle of {len(names)} queries is being streamed"
+        else:
+            sts, msg, query = resp_data.get("status"), resp_data.get("error"), resp_data.get("query")
+
+    logger.info(
+        msg=msg,
+        extra={
+            "status": response.status_code,
+            "query": query or names,
+            "step": step,
+            "method": request.method,
+            "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
+    if sts == "success":
+        columnar = file_format in exp.columnar_formats
+        filename = f"data.{file_format if columnar else 'zip'}"
+        return StreamingResponse(
+            exp.bundle_generator(results, file_format, data),
+            media_type=exp.export_formats[file_format] if columnar else "application/zip",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+    return {"status": sts, "query": query, "message": msg}
+
+
+@router.post("/export/jobs",
+             name="Submit export job",
+             description="Submits an asynchronous export job based on the provided PromQL. "
+                         "The result can be downloaded once the job is completed",
+             status_code=status.HTTP_202_ACCEPTED,
+             tags=["export"],
+             responses={
+                 202: {
+                     "description": "Accepted",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "success",
+                                     "message": "Export job has been submitted successfully",
+                                     "job": {
+                                         "id": "b3a3cbc4-1f1e-4b8f-9b43-8b7f4f2e9f6c",
+                                         "status": "queued",
+                                         "message": "Export job is waiting in the queue",
+                                         "query": "up",
+                                         "format": "csv",
+                                         "compression": "gzip",
+                                         "filename": "data.csv.gz",
+                                         "created": "2024-06-23T10:30:38+00:00",
+                                         "started": None,
+                                         "finished": None,
+                                         "expires": None,
+                                         "progress": {
+                                             "queries_total": 0,
+                                             "queries_done": 0,
+                                             "bytes_written": 0
+                                         }
+                                     }
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 400: {
+                     "description": "Bad Request",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "Unsupported file format 'xlsx'"
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 429: {
+                     "description": "Too Many Requests",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "Too many pending export jobs. Try again later"
+                                 }
+                             ]
+                         }
+                     }
+                 }
+             }
+             )
+async def submit_job(
+        request: Request,
+        response: Response,
+        data: Annotated[
+            ExportData,
+            Body(
+                openapi_examples=ExportData._request_body_examples,
+            )
+        ],
+        format: str = "csv",
+        compression: str = None
+):
+    data = data.dict()
+    start, end = data.get("start"), data.get("end")
+    data["step"] = exp.auto_max_resolution(
+        start, end) if data.get("step") == "auto" else data.get("step")
+    file_format = format.lower()
+    compression = compression.lower() if compression else None
+    validation_status, response.status_code, sts, msg = exp.validate_export(
+        data, file_format, compression)
+    job = dict()
+    if validation_status:
+        response.status_code, sts, msg, job = exj.submit_job(
+            data, file_format, compression)
+    logger.info(
+        msg=msg,
+        extra={
+            "status": response.status_code,
+            "job": job.get("id"),
+            "query": data.get("expr"),
+            "step": data.get("step"),
+            "method": request.method,
+            "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
+    if job:
+        return {"status": sts, "message": msg, "job": exj.job_info(job)}
+    return {"status": sts, "message": msg}
+
+
+@router.get("/export/jobs/{job_id}",
+            name="Get export job",
+            description="Returns the status and progress of the export job",
+            status_code=status.HTTP_200_OK,
+            tags=["export"],
+            responses={
+                200: {
+                    "description": "OK",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "id": "b3a3cbc4-1f1e-4b8f-9b43-8b7f4f2e9f6c",
+                                    "status": "running",
+                                    "message": "Export job is in progress",
+                                    "query": "up",
+                                    "format": "csv",
+                                    "compression": "gzip",
+                                    "filename": "data.csv.gz",
+                                    "created": "2024-06-23T10:30:38+00:00",
+                                    "started": "2024-06-23T10:30:39+00:00",
+                                    "finished": None,
+                                    "expires": None,
+                                    "progress": {
+                                        "queries_total": 12,
+                                        "queries_done": 5,
+                                        "bytes_written": 0
+                                    }
+                                }
+                            ]
+                        }
+                    }
+                },
+                404: {
+                    "description": "Not Found",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "status": "error",
+                                    "message": "Export job not found"
+                                }
+                            ]
+                        }
+                    }
+                }
+            }
+            )
+async def get_job(job_id: str, request: Request, response: Response):
+    job = exj.get_job(job_id)
+    response.status_code = status.HTTP_200_OK if job else status.HTTP_404_NOT_FOUND
+    logger.info(
+        msg="Successfully returned the requested export job" if job else "Export job not found",
+        extra={
+            "status": response.status_code,
+            "job": job_id,
+            "method": request.method,
+            "request_path": request.url.path})
+    return exj.job_info(job) if job else {"status": "error", "message": "Export job not found"}
+
+
+@router.get("/export/jobs/{job_id}/download",
+            name="Download export job result",
+            description="Downloads the file generated by the completed export job",
+            status_code=status.HTTP_200_OK,
+            tags=["export"],
+            responses={
+                200: {
+                    "description": "OK",
+                    "content": {
+                        "text/csv; charset=utf-8": {
+                            "example": "__name__,instance,job,timestamp,value\n"
+                                       "up,parosly:5000,parosly,1719131438.585,1\n"
+                                       "up,localhost:9090,prometheus,1719131438.585,1"
+                        }
+                    }
+                },
+                404: {
+                    "description": "Not Found",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "status": "error",
+                                    "message": "Export job not found"
+                                }
+                            ]
+                        }
+                    }
+                },
+                409: {
+                    "description": "Conflict",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "status": "error",
+                                    "message": "Export job is running"
+                                }
+                            ]
+                        }
+                    }
+                }
+            }
+            )
+async def download_job(job_id: str, request: Request, response: Response):
+    job = exj.get_job(job_id)
+    if not job:
+        response.status_code, msg = status.HTTP_404_NOT_FOUND, "Export job not found"
+    elif job["status"] != "completed":
+        response.status_code, msg = status.HTTP_409_CONFLICT, f"Export job is {job['status']}"
+    else:
+        response.status_code, msg = status.HTTP_200_OK, "Export file has been sent successfully"
+    logger.info(
+        msg=msg,
+        extra={
+            "status": response.status_code,
+            "job": job_id,
+            "method": request.method,
+            "request_path": request.url.path})
+    if response.status_code != status.HTTP_200_OK:
+        return {"status": "error", "message": msg}
+    media_type = exp.compression_formats[job["compression"]][1] \
+        if job["compression"] else exp.export_formats[job["format"]]
+    return FileResponse(path=exj.result_file(job), media_type=media_type,
+                        filename=job["filename"])
@@ -1,4 +1,5 @@
 from src.utils.settings import check_prom_readiness
+from src.core.export import available_formats
 from fastapi import APIRouter, Response, status
 
 router = APIRouter()
@@ -6,7 +7,8 @@ router = APIRouter()
 
 @router.get("/health",
             name="Get system health",
-            description="Returns a 200 status when the Parosly is able to connect to the Prometheus server",
+            description="Returns a 200 status when the Parosly is able to connect to the Prometheus server. "
+                        "Also lists the export formats the server supports",
             status_code=status.HTTP_200_OK,
             tags=["health"],
             responses={
@@ -17,7 +19,8 @@ router = APIRouter()
                             "example": [
                                 {
                                     "status": "success",
-                                    "message": "Service is up and running"
+                                    "message": "Service is up and running",
+                                    "export_formats": ["csv", "yml", "yaml", "json", "ndjson", "jsonlines"]
                                 }
                             ]
                         }
@@ -30,7 +33,8 @@ router = APIRouter()
                             "example": [
                                 {
                                     "status": "error",
-                                    "message": "Service is unavailable due to a health-check failure"
+                                    "message": "Service is unavailable due to a health-check failure",
+                                    "export_formats": ["csv", "yml", "yaml", "json", "ndjson", "jsonlines"]
                                 }
                             ]
                         }
@@ -41,6 +45,8 @@ async def health(response: Response):
     if not check_prom_readiness():
         response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
         return {"status": "error",
-                "message": "Service is unavailable due to a health-check failure"}
+                "message": "Service is unavailable due to a health-check failure",
+                "export_formats": available_formats()}
     return {"status": "success",
-            "message": "Service is up and running"}
+            "message": "Service is up and running",
+            "export_formats": available_formats()}
@@ -0,0 +1,79 @@
+from fastapi import APIRouter, Response, Request, status
+from src.core import metadata_cache as mc
+from src.utils import upstream
+from src.utils.log import logger
+
+router = APIRouter()
+
+
+@router.get("/label/{name}/values/search",
+            name="Search label values",
+            description="Searches the values of the label by prefix and/or regular expression. The values are "
+                        "served from a local index of the cached label values, refreshed in the background",
+            status_code=status.HTTP_200_OK,
+            tags=["labels"],
+            responses={
+                200: {
+                    "description": "OK",
+                    "content": {
+                        "application/json": {
+                            "example": {
+                                "status": "success",
+                                "data": [
+                                    "node_cpu_seconds_total",
+                                    "node_memory_MemAvailable_bytes"
+                                ]
+                            }
+                        }
+                    }
+                },
+                400: {
+                    "description": "Bad Request",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "status": "error",
+                                    "message": "Invalid regular expression 'node_(cpu'. missing ), "
+                                               "unterminated subpattern at position 5"
+                                }
+                            ]
+                        }
+                    }
+                },
+                500: {
+                    "description": "Internal Server Error",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "status": "error",
+                                    "message": "Failed to connect to Prometheus. All connection attempts failed"
+                                }
+                            ]
+                        }
+                    }
+                }
+            }
+            )
+async def search_label_values(
+        name: str,
+        request: Request,
+        response: Response,
+        prefix: str = None,
+        regex: str = None,
+        limit: int = 100
+):
+    search_status, response.status_code, sts, data = await mc.search_label_values(
+        client=upstream.async_client, name=name, prefix=prefix, regex=regex,
+        limit=limit, authorization=request.headers.get("authorization"))
+    logger.info(
+        msg=f"Found {len(data)} label values" if search_status else data,
+        extra={
+            "status": response.status_code,
+            "label": name,
+            "method": request.method,
+            "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
+    if search_status:
+        return {"status": sts, "data": data}
+    return {"status": sts, "message": data}
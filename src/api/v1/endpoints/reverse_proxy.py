@@ -1,26 +1,205 @@
-from starlette.responses import StreamingResponse
+from starlette.responses import StreamingResponse, Response
 from starlette.background import BackgroundTask
-from src.utils.arguments import arg_parser
+from src.core import metadata_cache as mc
+from src.core import singleflight as sf
+from src.core import proxy_cache as pc
+from src.core import query_stats as qs
+from src.core import admission as adm
+from src.utils import metrics as m
+from src.utils import upstream
 from src.utils.log import logger
+from typing import AsyncIterator
+from src.core import sharding, fanout
+from time import perf_counter
 from fastapi import Request
 import httpx
+import json
 
-prom_addr = arg_parser().get("prom.addr")
-client = httpx.AsyncClient(base_url=prom_addr)
+client = upstream.async_client
+flight = sf.SingleFlight()
+excluded_headers = ["content-length", "transfer-encoding", "connection", "x-cache"]
+
+
+async def _body_stream(request: Request) -> AsyncIterator[bytes]:
+    """
+    This function passes the incoming request body
+    through as it arrives and records its size
+    """
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        yield chunk
+    m.proxy_request_body_bytes.observe(size)
+
+
+def _limited(request: Request) -> bool:
+    return adm.enabled() and bool(upstream.query_paths.match(request.url.path))
+
+
+def _too_many_requests() -> tuple[int, dict, bytes, str]:
+    m.proxy_rejected_queries.inc()
+    return 429, {"content-type": "application/json", "retry-after": str(adm.retry_after)}, json.dumps(
+        {"status": "error", "errorType": "too_many_requests",
+         "error": "Too many queries are waiting for Prometheus. Try again later"}).encode(), None
+
+
+async def _admit(client_id: str) -> tuple[bool, float]:
+    """
+    This function waits for the query of the client to
+    be admitted and returns whether it was admitted and
+    how long it has waited
+    """
+    queued = perf_counter()
+    admitted = await adm.controller.acquire(client_id)
+    waited = perf_counter() - queued
+    if admitted:
+        m.proxy_queue_wait_seconds.observe(waited)
+    return admitted, waited
+
+
+async def _fetch(request: Request, body: bytes, started: float) -> tuple[int, dict, bytes, str]:
+    """
+    This function sends a read request to Prometheus,
+    or serves it from the results cache, and returns
+    the whole response. Queries wait for admission first
+    and their cost is recorded, see src/core/query_stats.py
+    """
+    client_id, waited = adm.client_id(request) if _limited(request) else None, 0
+    if client_id:
+        admitted, waited = await _admit(client_id)
+        if not admitted:
+            return _too_many_requests()
+    sent = perf_counter()
+    try:
+        result = await _send(request, body, started + waited)
+    finally:
+        if client_id:
+            adm.controller.release(client_id)
+    if request.url.path in qs.query_paths:
+        status_code, headers, content, cache = result
+        qs.record(request.url.path, dict(sf.request_params(request, body)), status_code, headers,
+                  content, duration=perf_counter() - started, latency=perf_counter() - sent, cache=cache)
+    return result
+
+
+async def _send(request: Request, body: bytes, started: float) -> tuple[int, dict, bytes, str]:
+    params = dict(sf.request_params(request, body)) if request.url.path in fanout.query_paths else {}
+    if fanout.requested(request.url.path, params):
+        resp = await fanout.query(request.url.path, params=params, headers=dict(request.headers))
+        return resp.status_code, {k: v for k, v in resp.headers.items()
+                                  if k not in ["content-encoding", "content-length"]}, resp.content, None
+    if request.url.path == pc.query_range_path:
+        resp = await pc.query_range(client, request)
+        if resp is not None:
+            return resp.status_code, dict(resp.headers), resp.body, resp.headers.get("X-Cache")
+    if mc.cacheable(request):
+        status_code, headers, content = await mc.fetch(client, request, body)
+        return status_code, headers, content, "MISS"
+    if sharding.enabled() and request.url.path in sharding.query_paths:
+        resp = await sharding.query(client, request.url.path, params=params,
+                                    headers=dict(request.headers))
+        return resp.status_code, {k: v for k, v in resp.headers.items()
+                                  if k not in ["content-encoding", "content-length"]}, resp.content, None
+    url = httpx.URL(path=request.url.path,
+                    query=request.url.query.encode("utf-8"))
+    rp_req = client.build_request(request.method, url,
+                                  timeout=upstream.timeout(request.url.path),
+                                  headers=request.headers.raw,
+                                  content=body)
+    sent = perf_counter()
+    rp_resp = await client.send(rp_req, stream=True)
+    try:
+        content = b"".join([chunk async for chunk in rp_resp.aiter_raw()])
+    finally:
+        await rp_resp.aclose()
+    m.proxy_overhead_seconds.observe(sent - started)
+    return rp_resp.status_code, dict(rp_resp.headers), content, None
 
 
 async def _reverse_proxy(request: Request):
     """
     This function implements as a reverse proxy to the Prometheus HTTP API
     ref: https://github.com/tiangolo/fastapi/issues/1788#issuecomment-1071222163
+    Identical read requests in flight at the same time are sent to Prometheus once,
+    the bodies of other requests are streamed to Prometheus as they arrive. Queries
+    go through admission control, see src/core/admission.py, queries with fanout=true
+    are sent to several Prometheus servers, see src/core/fanout.py
     """
+    started = perf_counter()
+    if mc.cacheable(request):
+        body = await request.body()
+        key = mc.request_cache_key(request, body)
+        content, cache = mc.lookup(key)
+        if content is not None:
+            if cache == "STALE":
+                mc.revalidate(key, lambda: _fetch(request, body, perf_counter()))
+            logger.info(
+                msg="-",
+                extra={
+                    "status": 200,
+                    "method": request.method,
+                    "request_path": request.url.path,
+                    "cache": cache})
+            return Response(content=content, media_type="application/json",
+                            headers={"X-Cache": cache})
+    if sf.coalescable(request):
+        body = await request.body()
+        m.proxy_request_body_bytes.observe(len(body))
+        shared, (status_code, headers, content, cache) = await flight.do(
+            sf.request_key(request, body), lambda: _fetch(request, body, started))
+        logger.info(
+            msg="-",
+            extra={
+                "status": status_code,
+                "method": request.method,
+                "request_path": request.url.path,
+                "cache": cache,
+                "coalesced": shared})
+        headers = {k: v for k, v in headers.items() if k.lower() not in excluded_headers}
+        if cache:
+            headers["X-Cache"] = cache
+        return Response(content=content, status_code=status_code, headers=headers)
+    client_id = adm.client_id(request) if _limited(request) else None
+    if client_id:
+        admitted, waited = await _admit(client_id)
+        if not admitted:
+            status_code, headers, content, _ = _too_many_requests()
+            return Response(content=content, status_code=status_code, headers=headers)
+        started += waited
     url = httpx.URL(path=request.url.path,
                     query=request.url.query.encode("utf-8"))
     rp_req = client.build_request(request.method, url,
-                                  timeout=None,
+                                  timeout=upstream.timeout(request.url.path),
                                   headers=request.headers.raw,
-                                  content=await request.body())
-    rp_resp = await client.send(rp_req, stream=True)
+                                  content=_body_stream(request))
+    sent = perf_counter()
+    try:
+        rp_resp = await client.send(rp_req, stream=True)
+    except BaseException:
+        if client_id:
+            adm.controller.release(client_id)
+        raise
+    m.proxy_overhead_seconds.observe(sent - started)
+
+    closed = False
+
+    async def close() -> None:
+        nonlocal closed
+        if closed:
+            return
+        closed = True
+        await rp_resp.aclose()
+        if client_id:
+            adm.controller.release(client_id)
+
+    async def stream() -> AsyncIterator[bytes]:
+        # the admission slot must be released even if the upstream stream fails mid-body
+        try:
+            async for chunk in rp_resp.aiter_raw():
+                yield chunk
+        finally:
+            await close()
+
     logger.info(
         msg="-",
         extra={
@@ -28,8 +207,8 @@ async def _reverse_proxy(request: Request):
             "method": request.method,
             "request_path": rp_resp.url.path})
     return StreamingResponse(
-        rp_resp.aiter_raw(),
+        stream(),
         status_code=rp_resp.status_code,
         headers=rp_resp.headers,
-        background=BackgroundTask(rp_resp.aclose),
+        background=BackgroundTask(close),
     )
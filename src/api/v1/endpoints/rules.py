@@ -1,7 +1,10 @@
-from fastapi import APIRouter, Response, Request, Body, status
+from fastapi import APIRouter, Response, Request, Body, Query, status
+from starlette.concurrency import run_in_threadpool
 from src.core.prometheus import PrometheusAPIClient
 from src.utils.arguments import arg_parser
-from src.models.rule import Rule
+from src.models.rule import Rule, RuleBulk, RuleBacktest
+from src.core.rule_index import index
+from src.core.backtest import backtest
 from src.utils.log import logger
 from typing import Annotated
 from shutil import copy
@@ -14,7 +17,8 @@ rule_path = arg_parser().get('rule.path')
 
 @router.post("/rules",
              name="Create Rule",
-             description="Creates a new rule with a randomly generated filename",
+             description="Creates a new rule with a randomly generated filename. The rule expressions, durations "
+                         "and alert templates are checked before the file is written",
              status_code=status.HTTP_201_CREATED,
              tags=["rules"],
              responses={
@@ -39,7 +43,25 @@ rule_path = arg_parser().get('rule.path')
                              "example": [
                                  {
                                      "status": "error",
-                                     "message": "Additional properties are not allowed ('rule' was unexpected)"
+                                     "message": "expected type range vector in call to function \"rate\", "
+                                                "got instant vector at position 10",
+                                     "file": "example-rule.yml",
+                                     "errors": [
+                                         {
+                                             "group": "ServiceHealthAlerts",
+                                             "rule": "HighCPUUsage",
+                                             "field": "expr",
+                                             "message": "expected type range vector in call to function "
+                                                        "\"rate\", got instant vector at position 10"
+                                         },
+                                         {
+                                             "group": "ServiceHealthAlerts",
+                                             "rule": "HighCPUUsage",
+                                             "field": "annotations.summary",
+                                             "message": "invalid template: undefined variable \"$valu\" "
+                                                        "at position 0"
+                                         }
+                                     ]
                                  }
                              ]
                          }
@@ -71,7 +93,7 @@ async def create(
         ]
 ):
     r = Rule(data=rule.data)
-    response.status_code, resp = prom.create_rule(r)
+    response.status_code, resp = await run_in_threadpool(prom.create_rule, r)
     logger.info(
         msg=resp["message"],
         extra={
@@ -81,6 +103,305 @@ async def create(
     return resp
 
 
+@router.post("/rules/bulk",
+             name="Create Rules",
+             description="Lints and creates many rule files at once with a single Prometheus reload. "
+                         "If the reload fails, all the files of the batch are rolled back",
+             status_code=status.HTTP_201_CREATED,
+             tags=["rules"],
+             responses={
+                 201: {
+                     "description": "Created",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                {
+                                    "status": "success",
+                                    "files": ["http-requests.yml", "0b5c3f8e-8f2b-4c8e-9d6a-2f4b1a7e9c3d.yml"],
+                                    "message": "2 rules were created successfully"
+                                }
+                             ]
+                         }
+                     }
+                 },
+                 400: {
+                     "description": "Bad Request",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "Validation of the rules has failed",
+                                     "errors": [
+                                         {
+                                             "index": 1,
+                                             "file": "http-requests.yml",
+                                             "group": "HttpRequests",
+                                             "rule": "code:prometheus_http_requests_total:sum",
+                                             "field": "expr",
+                                             "message": "unexpected end of input, expected ')' at position 44"
+                                         }
+                                     ]
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 409: {
+                     "description": "Conflict",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "The requested files already exist",
+                                     "files": ["http-requests.yml"]
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 500: {
+                     "description": "Internal Server Error",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "failed to reload config: one or more errors occurred while applying the new configuration (--config.file=\"/etc/prometheus/prometheus.yml\")\n"
+                                 }
+                             ]
+                         }
+                     }
+                 }
+             }
+             )
+async def create_bulk(
+        request: Request,
+        response: Response,
+        bulk: Annotated[
+            RuleBulk,
+            Body(
+                openapi_examples=RuleBulk._request_body_examples,
+            )
+        ]
+):
+    response.status_code, resp = await run_in_threadpool(prom.create_rules, bulk.rules, bulk.recreate)
+    logger.info(
+        msg=resp["message"],
+        extra={
+            "status": response.status_code,
+            "method": request.method,
+            "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
+    return resp
+
+
+@router.get("/rules/search",
+            name="Search Rules",
+            description="Searches the rules of the rule files by name, type, group, file, metric and labels "
+                        "without asking Prometheus. The rules are served from an in-memory index of the rules "
+                        "directory that follows its changes. Names are matched by case-insensitive substring, "
+                        "labels are passed as 'key=value' and all the filters must match",
+            status_code=status.HTTP_200_OK,
+            tags=["rules"],
+            responses={
+                200: {
+                    "description": "OK",
+                    "content": {
+                        "application/json": {
+                            "example": {
+                                "status": "success",
+                                "data": [
+                                    {
+                                        "file": "example-rule.yml",
+                                        "hash": "6b1c3a2e9f0d4b7a8c5e2f1d0a9b8c7e6f5a4b3c2d1e0f9a8b7c6d5e4f3a2b1c",
+                                        "group": "ServiceHealthAlerts",
+                                        "type": "alerting",
+                                        "name": "HighCPUUsage",
+                                        "expr": "sum(rate(cpu_usage{job=\"webserver\"}[5m])) > 0.8",
+                                        "labels": {
+                                            "severity": "warning"
+                                        },
+                                        "metrics": ["cpu_usage"],
+                                        "for": "5m",
+                                        "annotations": {
+                                            "summary": "High CPU Usage Detected"
+                                        }
+                                    }
+                                ]
+                            }
+                        }
+                    }
+                },
+                400: {
+                    "description": "Bad Request",
+                    "content": {
+                        "application/json": {
+                            "example": [
+                                {
+                                    "status": "error",
+                                    "message": "Invalid label filter 'severity', expected 'key=value'"
+                                }
+                            ]
+                        }
+                    }
+                }
+            }
+            )
+async def search(
+        request: Request,
+        response: Response,
+        name: str = None,
+        type: str = None,
+        group: str = None,
+        file: Annotated[list[str], Query()] = None,
+        metric: str = None,
+        label: Annotated[list[str], Query()] = None,
+        limit: int = 100
+):
+    invalid_labels = [item for item in label or [] if "=" not in item]
+    if type not in [None, "alerting", "recording"]:
+        response.status_code, data = 400, f"Invalid rule type '{type}', expected 'alerting' or 'recording'"
+    elif invalid_labels:
+        response.status_code, data = 400, f"Invalid label filter '{invalid_labels[0]}', expected 'key=value'"
+    else:
+        response.status_code = 200
+        data = await run_in_threadpool(index.search, name, type, group, file, metric, label, max(limit, 0))
+    logger.info(
+        msg=f"Found {len(data)} rules" if response.status_code == 200 else data,
+        extra={
+            "status": response.status_code,
+            "method": request.method,
+            "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
+    if response.status_code == 200:
+        return {"status": "success", "data": data}
+    return {"status": "error", "message": data}
+
+
+@router.post("/rules/backtest",
+             name="Backtest Rule",
+             description="Evaluates the alerting rules of a rule file over the stored history and returns "
+                         "when each of their alerts would have been pending, firing and resolved. The "
+                         "rules are evaluated every 'step', every interval of their group or every minute. "
+                         "Nothing is written to the rules directory",
+             status_code=status.HTTP_200_OK,
+             tags=["rules"],
+             responses={
+                 200: {
+                     "description": "OK",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "success",
+                                     "data": {
+                                         "start": 1706572800.0,
+                                         "end": 1706659199.0,
+                                         "groups": [
+                                             {
+                                                 "name": "ServiceHealthAlerts",
+                                                 "step": 60.0,
+                                                 "rules": [
+                                                     {
+                                                         "alert": "HighCPUUsage",
+                                                         "expr": "sum(rate(cpu_usage{job=\"webserver\"}[5m])) > 0.8",
+                                                         "for": "5m",
+                                                         "keep_firing_for": "0s",
+                                                         "evaluations": 1440,
+                                                         "firing_count": 1,
+                                                         "firing_seconds": 1500.0,
+                                                         "alerts": [
+                                                             {
+                                                                 "labels": {
+                                                                     "alertname": "HighCPUUsage",
+                                                                     "severity": "warning"
+                                                                 },
+                                                                 "intervals": [
+                                                                     {
+                                                                         "pending_at": 1706601600.0,
+                                                                         "firing_at": 1706601900.0,
+                                                                         "resolved_at": 1706603400.0
+                                                                     }
+                                                                 ]
+                                                             }
+                                                         ]
+                                                     }
+                                                 ]
+                                             }
+                                         ]
+                                     }
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 400: {
+                     "description": "Bad Request",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "Validation of the rules has failed. unexpected end of input, "
+                                                "expected ')' at position 44",
+                                     "errors": [
+                                         {
+                                             "group": "ServiceHealthAlerts",
+                                             "rule": "HighCPUUsage",
+                                             "field": "expr",
+                                             "message": "unexpected end of input, expected ')' at position 44"
+                                         }
+                                     ]
+                                 }
+                             ]
+                         }
+                     }
+                 },
+                 422: {
+                     "description": "Unprocessable Entity",
+                     "content": {
+                         "application/json": {
+                             "example": [
+                                 {
+                                     "status": "error",
+                                     "message": "Evaluation of the rule HighCPUUsage has failed. "
+                                                "query processing would load too many samples into memory"
+                                 }
+                             ]
+                         }
+                     }
+                 }
+             }
+             )
+async def backtest_rule(
+        request: Request,
+        response: Response,
+        rule: Annotated[
+            RuleBacktest,
+            Body(
+                openapi_examples=RuleBacktest._request_body_examples,
+            )
+        ]
+):
+    resp_status, response.status_code, resp = await run_in_threadpool(
+        backtest, rule.data, rule.start, rule.end, rule.step)
+    if resp_status:
+        msg = "The rules were backtested successfully"
+    else:
+        msg = resp.get("error")
+        resp = {"status": "error", "message": msg, **({"errors": resp["errors"]} if "errors" in resp else {})}
+    logger.info(
+        msg=msg,
+        extra={
+            "status": response.status_code,
+            "method": request.method,
+            "start": rule.start,
+            "end": rule.end,
+            "step": rule.step,
+            "request_path": f"{request.url.path}{'?' + request.url.query if request.url.query else ''}"})
+    return resp
+
+
 @router.put("/rules/{file}",
             name="Create Rule",
             description="Creates a new rule file with the provided filename",
@@ -155,15 +476,20 @@ async def update(
 ):
     r = Rule(data=rule.data)
 
-    if file and os.path.exists(f"{rule_path}/{file}"):
+    if file and index.exists(file, verify=True):
         if recreate.lower() == "true":
             orig_file, temp_file = f"{rule_path}/{file}", f"{rule_path}/{file}.temp"
-            copy(orig_file, temp_file)
-            response.status_code, resp = prom.create_rule(r, file)
-            if resp.get("status") == "success":
+            try:
+                copy(orig_file, temp_file)
+            except FileNotFoundError:
+                # the file was removed in the meantime, so it is created instead
+                temp_file = None
+            response.status_code, resp = await run_in_threadpool(prom.create_rule, r, file)
+            if temp_file and resp.get("status") == "success":
                 os.remove(temp_file)
-            else:
+            elif temp_file:
                 os.rename(temp_file, orig_file)
+                index.refresh(file)
         else:
             response.status_code = status.HTTP_409_CONFLICT
             resp = {
@@ -171,7 +497,7 @@ async def update(
                 "message": "The requested file already exists.",
                 "file": file}
     else:
-        response.status_code, resp = prom.create_rule(r, file)
+        response.status_code, resp = await run_in_threadpool(prom.create_rule, r, file)
 
     logger.info(
         msg=resp["message"],
@@ -221,7 +547,7 @@ async def update(
                }
                )
 async def delete(file, request: Request, response: Response):
-    response.status_code, sts, msg = prom.delete_rule(file)
+    response.status_code, sts, msg = await run_in_threadpool(prom.delete_rule, file)
     logger.info(
         msg=msg,
         extra={
@@ -0,0 +1,114 @@
+from src.utils.arguments import arg_parser
+from collections import OrderedDict, deque
+from fastapi import Request
+import asyncio
+
+args = arg_parser()
+tenant_header = args.get("proxy.tenant_header")
+retry_after = 5
+
+
+class AdmissionController:
+    """
+    Limits the number of queries running against Prometheus,
+    in total and per client. Queries over the limits wait in
+    per-client queues that are served round-robin, so a busy
+    client cannot starve the others. Queries are rejected once
+    the queues are full.
+    """
+
+    def __init__(self, max_concurrent: int, max_per_client: int,
+                 max_queued: int, max_queued_per_client: int):
+        self.max_concurrent = max_concurrent
+        self.max_per_client = max_per_client
+        self.max_queued = max_queued
+        self.max_queued_per_client = max_queued_per_client
+        self.running, self.queued = 0, 0
+        self.active = dict()
+        self.queues = OrderedDict()
+
+    def _start(self, client: str) -> None:
+        self.running += 1
+        self.active[client] = self.active.get(client, 0) + 1
+
+    def _can_start(self, client: str) -> bool:
+        return self.running < self.max_concurrent and \
+            self.active.get(client, 0) < self.max_per_client
+
+    def _dispatch(self) -> None:
+        """Starts the queued queries of the clients in turn"""
+        started = True
+        while started and self.queues:
+            started = False
+            for client in list(self.queues):
+                if self.running >= self.max_concurrent:
+                    return
+                queue = self.queues.pop(client)
+                while queue and queue[0].cancelled():
+                    queue.popleft()
+                    self.queued -= 1
+                if queue and self._can_start(client):
+                    self.queued -= 1
+                    self._start(client)
+                    queue.popleft().set_result(None)
+                    started = True
+                if queue:
+                    self.queues[client] = queue
+
+    async def acquire(self, client: str) -> bool:
+        """
+        Waits until the query of the client may run.
+        Returns False if the query has been rejected
+        """
+        if client not in self.queues and self._can_start(client):
+            self._start(client)
+            return True
+        queue = self.queues.get(client, deque())
+        if self.queued >= self.max_queued or len(queue) >= self.max_queued_per_client:
+            return False
+        future = asyncio.get_running_loop().create_future()
+        queue.append(future)
+        self.queues[client] = queue
+        self.queued += 1
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self.release(client)
+            elif future in queue:
+                queue.remove(future)
+                self.queued -= 1
+                if not queue and self.queues.get(client) is queue:
+                    del self.queues[client]
+            raise
+        return True
+
+    def release(self, client: str) -> None:
+        """Frees the slot of a finished query"""
+        self.running -= 1
+        self.active[client] -= 1
+        if not self.active[client]:
+            del self.active[client]
+        self._dispatch()
+
+
+controller = AdmissionController(
+    max_concurrent=args.get("proxy.max_concurrent_queries"),
+    max_per_client=args.get("proxy.max_concurrent_queries_per_client"),
+    max_queued=args.get("proxy.max_queued_queries"),
+    max_queued_per_client=args.get("proxy.max_queued_queries_per_client"))
+
+
+def enabled() -> bool:
+    return controller.max_concurrent > 0
+
+
+def client_id(request: Request) -> str:
+    """
+    This function identifies the client by the tenant
+    header if it is set, otherwise by the source IP
+    """
+    tenant = request.headers.get(tenant_header) if tenant_header else None
+    if tenant:
+        return f"tenant:{tenant}"
+    return f"ip:{request.client.host if request.client else None}"
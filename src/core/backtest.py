@@ -0,0 +1,142 @@
+from src.core.export import prom_query, max_parallel_queries, max_points_per_query
+from src.core.query import parse_duration, split_range, merge_results
+from concurrent.futures import ThreadPoolExecutor
+from src.core.rule_linter import lint
+from dateutil.parser import parse
+from math import ceil
+
+default_step = "1m"
+# tolerance for the float arithmetic on the evaluation timestamps
+epsilon = 1e-6
+
+
+def _steps(duration: float, step: float) -> float:
+    """Returns the duration rounded up to whole evaluation steps"""
+    return ceil(duration / step - epsilon) * step
+
+
+def simulate(timestamps: list[float], step: float, hold: float,
+             keep_firing_for: float, end: float) -> list[dict]:
+    """
+    This function replays the state of one alert over the
+    evaluations it was returned by its expression. The alert
+    becomes pending at the first evaluation, fires once it
+    has been active for 'hold' seconds and resolves at the
+    first evaluation it is missing from, or 'keep_firing_for'
+    seconds later. Pending alerts which never fired are
+    dropped, alerts still firing at 'end' are not resolved.
+    """
+    runs = []
+    for ts in timestamps:
+        if runs and ts - runs[-1][1] <= step + epsilon:
+            runs[-1][1] = ts
+        else:
+            runs.append([ts, ts])
+    intervals, alert, last = [], None, None
+    for first, run_last in runs:
+        kept_firing = alert and alert["firing_at"] is not None and \
+            last + step + _steps(keep_firing_for, step) >= first - epsilon
+        if not kept_firing:
+            if alert and alert["firing_at"] is not None:
+                alert["resolved_at"] = last + step + _steps(keep_firing_for, step)
+                intervals.append(alert)
+            alert = {"pending_at": first, "firing_at": None, "resolved_at": None}
+        if alert["firing_at"] is None and alert["pending_at"] + _steps(hold, step) <= run_last + epsilon:
+            alert["firing_at"] = alert["pending_at"] + _steps(hold, step)
+        last = run_last
+    if alert and alert["firing_at"] is not None:
+        resolved_at = last + step + _steps(keep_firing_for, step)
+        alert["resolved_at"] = resolved_at if resolved_at <= end + epsilon else None
+        intervals.append(alert)
+    return intervals
+
+
+def _alerts(rule: dict, result: dict, step: float, end: float) -> list[dict]:
+    """
+    This function returns the firing intervals of the rule
+    per label set of the alerts. Static rule labels are
+    added, templated ones cannot be expanded and are left out
+    """
+    labels = {k: v for k, v in (rule.get("labels") or {}).items() if "{{" not in str(v)}
+    hold = parse_duration(rule.get("for", "0s"))
+    keep_firing_for = parse_duration(rule.get("keep_firing_for", "0s"))
+    alerts = []
+    for series in result["data"]["result"]:
+        timestamps = sorted(float(ts) for ts, _ in series.get("values", []))
+        intervals = simulate(timestamps, step, hold, keep_firing_for, end)
+        if intervals:
+            alert_labels = {k: v for k, v in series["metric"].items() if k != "__name__"}
+            alert_labels.update(labels, alertname=rule["alert"])
+            alerts.append({"labels": alert_labels, "intervals": intervals})
+    return alerts
+
+
+def _summary(rule: dict, alerts: list[dict], step: float, start: float, end: float) -> dict:
+    intervals = [i for alert in alerts for i in alert["intervals"]]
+    return {
+        "alert": rule["alert"],
+        "expr": rule["expr"],
+        "for": rule.get("for", "0s"),
+        "keep_firing_for": rule.get("keep_firing_for", "0s"),
+        "evaluations": int((end - start) // step) + 1,
+        "firing_count": len(intervals),
+        "firing_seconds": sum((i["resolved_at"] or end) - i["firing_at"] for i in intervals),
+        "alerts": alerts
+    }
+
+
+def backtest(data: dict, start: str, end: str, step: str = None) -> tuple[bool, int, dict]:
+    """
+    This function evaluates the alerting rules of the rule
+    file over the history stored in Prometheus and returns
+    when each of their alerts would have fired. The range
+    queries of all the rules and all the time chunks are
+    sent concurrently. Rules are evaluated every 'step' or
+    every interval of their group.
+    """
+    errors = lint(data)
+    if errors:
+        return False, 400, {"status": "error",
+                            "error": f"Validation of the rules has failed. {errors[0]['message']}",
+                            "errors": errors}
+    try:
+        start_timestamp, end_timestamp = parse(start).timestamp(), parse(end).timestamp()
+        groups = []
+        for group in data["groups"]:
+            group_step = parse_duration(step or group.get("interval") or default_step)
+            if group_step <= 0:
+                raise ValueError(f"invalid evaluation step of the group {group['name']}")
+            rules = [rule for rule in group["rules"] if "alert" in rule]
+            groups.append((group, group_step, rules))
+    except (ValueError, OverflowError) as e:
+        return False, 400, {"status": "error", "error": str(e)}
+    if end_timestamp < start_timestamp:
+        return False, 400, {"status": "error", "error": "The end of the time range is before its start"}
+
+    def sub_query(rule, group_step, time_range) -> tuple[bool, int, dict]:
+        return prom_query(query=rule["expr"], range_query=True, start=str(time_range[0]),
+                          end=str(time_range[1]), step=str(group_step))
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_queries)) as executor:
+        futures = [
+            [[executor.submit(sub_query, rule, group_step, r)
+              for r in split_range(start_timestamp, end_timestamp, group_step, max_points_per_query)]
+             for rule in rules]
+            for _, group_step, rules in groups]
+        results = [[[f.result() for f in rule] for rule in group] for group in futures]
+
+    resp_groups = []
+    for (group, group_step, rules), group_results in zip(groups, results):
+        resp_rules = []
+        for rule, rule_results in zip(rules, group_results):
+            for resp_status, status_code, resp_data in rule_results:
+                if not resp_status:
+                    resp_data["error"] = f"Evaluation of the rule {rule['alert']} has failed. " \
+                                         f"{resp_data.get('error')}"
+                    return resp_status, status_code, resp_data
+            merged = merge_results([resp_data for _, _, resp_data in rule_results])
+            alerts = _alerts(rule, merged, group_step, end_timestamp)
+            resp_rules.append(_summary(rule, alerts, group_step, start_timestamp, end_timestamp))
+        resp_groups.append({"name": group["name"], "step": group_step, "rules": resp_rules})
+    return True, 200, {"status": "success",
+                       "data": {"start": start_timestamp, "end": end_timestamp, "groups": resp_groups}}
@@ -0,0 +1,146 @@
+from collections import OrderedDict
+from threading import Lock
+from hashlib import sha256
+from time import time
+import os
+
+
+class LRUCache:
+    """
+    A thread-safe cache of byte strings bounded by their
+    total size. Once the size is exceeded, the least
+    recently used entries are evicted.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.entries = OrderedDict()
+        self.lock = Lock()
+
+    def get(self, key: str) -> bytes:
+        """Returns the cached value and marks it as recently used"""
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def _evict(self) -> None:
+        _, evicted = self.entries.popitem(last=False)
+        self.size -= len(evicted)
+
+    def set(self, key: str, value: bytes) -> bool:
+        """
+        Stores the value, evicting the least recently used
+        entries to make room for it. Values larger than
+        the whole cache are not stored.
+        """
+        if len(value) > self.max_bytes:
+            return False
+        with self.lock:
+            if key in self.entries:
+                self.size -= len(self.entries.pop(key))
+            while self.entries and self.size + len(value) > self.max_bytes:
+                self._evict()
+            self.entries[key] = value
+            self.size += len(value)
+        return True
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class TTLCache(LRUCache):
+    """
+    A size-bounded LRU cache of byte strings which also
+    records when each entry was stored, so that callers
+    can decide whether an entry is fresh or stale.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+        self.stored = dict()
+
+    def _evict(self) -> None:
+        key, evicted = self.entries.popitem(last=False)
+        self.size -= len(evicted)
+        self.stored.pop(key, None)
+
+    def set(self, key: str, value: bytes) -> bool:
+        """Stores the value along with the current time"""
+        stored = super().set(key, value)
+        if stored:
+            self.stored[key] = time()
+        return stored
+
+    def age(self, key: str) -> float:
+        """Returns the number of seconds since the entry was stored"""
+        stored = self.stored.get(key)
+        return time() - stored if stored is not None else None
+
+
+class DiskCache(LRUCache):
+    """
+    A cache of byte strings stored as files in a local
+    directory and bounded by their total size. The index
+    of the entries is kept in memory and rebuilt from the
+    directory at startup, oldest files first.
+    """
+
+    def __init__(self, path: str, max_bytes: int):
+        super().__init__(max_bytes)
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        files = [f for f in os.scandir(path) if f.is_file() and not f.name.endswith(".tmp")]
+        for f in sorted(files, key=lambda f: f.stat().st_mtime):
+            self.entries[f.name] = f.stat().st_size
+            self.size += f.stat().st_size
+        while self.entries and self.size > self.max_bytes:
+            self._evict()
+
+    def _evict(self) -> None:
+        name, size = self.entries.popitem(last=False)
+        self.size -= size
+        try:
+            os.remove(f"{self.path}/{name}")
+        except OSError:
+            pass
+
+    def get(self, key: str) -> bytes:
+        """Returns the cached value and marks it as recently used"""
+        name = sha256(key.encode()).hexdigest()
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+            try:
+                with open(f"{self.path}/{name}", "rb") as f:
+                    return f.read()
+            except OSError:
+                self.size -= self.entries.pop(name)
+                return None
+
+    def set(self, key: str, value: bytes) -> bool:
+        """
+        Stores the value in a file, evicting the least
+        recently used entries to make room for it.
+        Values larger than the whole cache are not stored.
+        """
+        if len(value) > self.max_bytes:
+            return False
+        name = sha256(key.encode()).hexdigest()
+        with self.lock:
+            if name in self.entries:
+                self.size -= self.entries.pop(name)
+            while self.entries and self.size + len(value) > self.max_bytes:
+                self._evict()
+            try:
+                with open(f"{self.path}/{name}.tmp", "wb") as f:
+                    f.write(value)
+                os.replace(f"{self.path}/{name}.tmp", f"{self.path}/{name}")
+            except OSError:
+                return False
+            self.entries[name] = len(value)
+            self.size += len(value)
+        return True
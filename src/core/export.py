@@ -1,39 +1,191 @@
+from src.core.query import parse_duration, split_range, normalize_expr
+from src.core.result_spool import spool_response, merge_spooled
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Iterator, Iterable
+from src.utils.validations import validate_schema
 from src.utils.arguments import arg_parser
 from email.utils import formatdate
 from dateutil.parser import parse
+from src.core.cache import LRUCache
+from functools import lru_cache
+from src.utils import upstream
 from datetime import datetime
-from uuid import uuid4
-from math import ceil
-import requests
+from math import ceil, floor, nan
+from array import array
+from time import time
+import zstandard
+import zipfile
 import json
 import yaml
-import copy
+import zlib
 import csv
-import os
+import io
 
-prom_addr = arg_parser().get("prom.addr")
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+args = arg_parser()
+max_parallel_queries = args.get("export.max_parallel_queries")
+max_points_per_query = args.get("export.max_points_per_query")
+result_cache = LRUCache(max_bytes=args.get("export.cache_size") * 1024 * 1024)
+result_cache_max_entry_size = min(args.get("export.cache_max_entry_size") * 1024 * 1024, result_cache.max_bytes)
+result_cache_min_age = 300
+chunk_size = 64 * 1024
+spool_chunk_size = 1024 * 1024
+export_formats = {
+    "csv": "text/csv; charset=utf-8",
+    "yml": "application/yaml",
+    "yaml": "application/yaml",
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "jsonlines": "application/x-ndjson"
+}
+columnar_formats = {
+    "parquet": "application/vnd.apache.parquet",
+    "arrow": "application/vnd.apache.arrow.stream"
+}
+export_formats.update(columnar_formats)
+batch_size = 64 * 1024
+compression_formats = {
+    "zstd": ("zst", "application/zstd"),
+    "gzip": ("gz", "application/gzip")
+}
 
 
 def prom_query(query, range_query=False, start="0", end="0",
-               step="0", url=prom_addr) -> tuple[bool, int, dict]:
+               step="0", url="", spool=False) -> tuple[bool, int, dict]:
     """
     This function queries data from Prometheus
     based on the information provided by the
     user and returns the data as a dictionary.
+    With 'spool', the response is decoded while it
+    is downloaded and its series are spooled, see
+    src/core/result_spool.py.
     """
+    path = f"/api/v1/{'query_range' if range_query else 'query'}"
     try:
-        r = requests.post(f"{url}/api/v1/{'query_range' if range_query else 'query'}",
-                          data={
-                              "query": query,
-                              "start": start,
-                              "end": end,
-                              "step": step},
-                          headers={"Content-Type": "application/x-www-form-urlencoded"})
+        with upstream.client.stream("POST", f"{url}{path}",
+                                    data={
+                                        "query": query,
+                                        "start": start,
+                                        "end": end,
+                                        "step": step},
+                                    headers={"Content-Type": "application/x-www-form-urlencoded"},
+                                    timeout=upstream.timeout(path)) as r:
+            try:
+                if spool and r.status_code == 200:
+                    resp_data = spool_response(r.iter_bytes(spool_chunk_size))
+                else:
+                    resp_data = json.loads(r.read())
+            except (ValueError, KeyError, TypeError) as e:
+                return False, r.status_code if r.status_code != 200 else 500, {
+                    "status": "error", "error": f"Prometheus returned an invalid response. {e}"}
     except BaseException as e:
         return False, 500, {"status": "error",
                             "error": f"Prometheus query has failed. {e}"}
-    else:
-        return True if r.status_code == 200 else False, r.status_code, r.json()
+    return True if r.status_code == 200 else False, r.status_code, resp_data
+
+
+def prom_query_range(query, start, end, step, url="",
+                     progress: dict = None) -> tuple[bool, int, dict]:
+    """
+    This function queries data over a time range from
+    Prometheus. Long ranges are split into step-aligned
+    sub-queries that stay under the Prometheus maximum
+    resolution, are sent concurrently and are stitched
+    back together in order. The number of total and
+    completed sub-queries is tracked in 'progress'.
+    """
+    progress = progress if progress is not None else dict()
+    try:
+        start_timestamp, end_timestamp = parse(start).timestamp(), parse(end).timestamp()
+        step_in_seconds = parse_duration(step)
+    except (ValueError, OverflowError) as e:
+        return False, 400, {"status": "error", "error": str(e)}
+    ranges = split_range(start_timestamp, end_timestamp,
+                         step_in_seconds, max_points_per_query)
+    progress.update(queries_total=len(ranges), queries_done=0)
+    if len(ranges) == 1:
+        result = prom_query(query=query, range_query=True,
+                            start=start, end=end, step=step, url=url, spool=True)
+        progress["queries_done"] = 1
+        return result
+
+    def sub_query(time_range) -> tuple[bool, int, dict]:
+        return prom_query(query=query, range_query=True, start=str(time_range[0]),
+                          end=str(time_range[1]), step=str(step_in_seconds), url=url, spool=True)
+
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_queries)) as executor:
+        futures = [executor.submit(sub_query, r) for r in ranges]
+        for _ in as_completed(futures):
+            progress["queries_done"] += 1
+        results = [f.result() for f in futures]
+    for resp_status, status_code, resp_data in results:
+        if not resp_status:
+            return resp_status, status_code, resp_data
+    return True, 200, merge_spooled([resp_data for _, _, resp_data in results])
+
+
+def query_data(data: dict, progress: dict = None) -> tuple[bool, int, dict]:
+    """
+    This function runs a range query when the time
+    range and step are provided, and an instant
+    query otherwise.
+    """
+    if all([data.get("start"), data.get("end"), data.get("step")]):
+        return prom_query_range(query=data.get("expr"), start=data.get("start"),
+                                end=data.get("end"), step=data.get("step"),
+                                progress=progress)
+    return prom_query(query=data.get("expr"), spool=True)
+
+
+def cache_key(options: dict, file_format: str) -> str:
+    """
+    This function builds the key of the export result
+    from the normalized query, time range and step, and
+    the options that affect the generated file. Instant
+    queries and ranges ending within the last few minutes
+    may still change, so no key is returned for them.
+    """
+    if not result_cache.max_bytes or not all(
+            [options.get("start"), options.get("end"), options.get("step")]):
+        return None
+    try:
+        start, end = parse(options["start"]).timestamp(), parse(options["end"]).timestamp()
+        step = parse_duration(options["step"])
+    except (ValueError, OverflowError):
+        return None
+    if end > time() - result_cache_min_age:
+        return None
+    return json.dumps([
+        normalize_expr(options.get("expr")), start, end, step,
+        options.get("timestamp_format"), list((options.get("replace_fields") or dict()).items()),
+        options.get("layout"), options.get("column_labels"), file_format])
+
+
+def cache_generator(content: Iterable[bytes], key: str) -> Iterator[bytes]:
+    """
+    This function passes the streamed content through
+    and stores it in the cache of export results once
+    it has been generated completely. Content larger
+    than the maximum entry size is not collected any
+    further, so large exports do not hold their whole
+    content in memory.
+    """
+    chunks, size = [], 0
+    for chunk in content:
+        if chunks is not None:
+            size += len(chunk)
+            if size > result_cache_max_entry_size:
+                chunks = None
+            else:
+                chunks.append(chunk)
+        yield chunk
+    if chunks is not None:
+        result_cache.set(key, b"".join(chunks))
 
 
 def replace_fields(data, custom_fields) -> None:
@@ -52,20 +204,34 @@ def replace_fields(data, custom_fields) -> None:
             pass
 
 
+timestamp_formatters = {
+    "unix": lambda timestamp: timestamp,
+    "rfc2822": lambda timestamp: formatdate(timestamp, localtime=True),
+    "iso8601": lambda timestamp: datetime.fromtimestamp(timestamp).isoformat(),
+    "rfc3339": lambda timestamp: datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='milliseconds'),
+    "friendly": lambda timestamp: datetime.fromtimestamp(timestamp).strftime('%A, %B %d, %Y %I:%M:%S %p')
+}
+
+
 def format_timestamp(timestamp, fmt) -> str:
     """
     This function converts Unix timestamps
     to several common time formats.
     """
-    timestamp_formats = {
-        "unix": timestamp,
-        "rfc2822": formatdate(timestamp, localtime=True),
-        "iso8601": datetime.fromtimestamp(timestamp).isoformat(),
-        "rfc3339": datetime.fromtimestamp(timestamp).astimezone().isoformat(timespec='milliseconds'),
-        "friendly": datetime.fromtimestamp(timestamp).strftime('%A, %B %d, %Y %I:%M:%S %p')
-    }
+    return timestamp_formatters[fmt](timestamp)
+
 
-    return timestamp_formats[fmt]
+def timestamp_formatter(fmt) -> Callable:
+    """
+    This function returns a converter of Unix timestamps
+    to the requested time format. Series of a range query
+    share the same step-aligned timestamps, so every
+    distinct timestamp is formatted only once and the
+    result is reused across all series.
+    """
+    if fmt == "unix":
+        return timestamp_formatters[fmt]
+    return lru_cache(maxsize=65536)(timestamp_formatters[fmt])
 
 
 def auto_max_resolution(start: str, end: str) -> str:
@@ -82,46 +248,59 @@ def auto_max_resolution(start: str, end: str) -> str:
 
 def data_processor(source_data: dict,
                    custom_fields: dict,
-                   timestamp_format: str) -> tuple[list, list]:
+                   timestamp_format: str) -> tuple[list, Iterator[dict]]:
     """
     This function preprocesses the results
     of the Prometheus query for future formatting.
-    It returns all labels of the query result
-    and the data of each time series.
+    It returns all labels of the query result and
+    a generator of the data of each time series, so
+    rows are produced lazily while being streamed.
+    The source data is never modified: each series
+    gets a row template with the renamed labels, and
+    every sample only makes a shallow copy of it.
     """
-    data_raw = copy.deepcopy(source_data)
-    data_processed, unique_labels = [], set()
-    data_result = data_raw["data"]["result"]
+    unique_labels = set()
+    data_result = source_data["data"]["result"]
+    to_timestamp_format = timestamp_formatter(timestamp_format)
+    for ts in data_result:
+        unique_labels.update(ts["metric"].keys())
+
+    def row_template(metric: dict) -> tuple[dict, str, str]:
+        """
+        Builds a row of the series with placeholders for
+        the timestamp and value fields and returns the
+        field names they have after replacing the fields
+        """
+        timestamp_placeholder, value_placeholder = object(), object()
+        template = dict(metric)
+        template["timestamp"] = timestamp_placeholder
+        template["value"] = value_placeholder
+        replace_fields(template, custom_fields)
+        fields = {id(v): k for k, v in template.items()}
+        return template, fields.get(id(timestamp_placeholder)), fields.get(id(value_placeholder))
+
+    def build_row(template, timestamp_field, value_field, sample) -> dict:
+        row = template.copy()
+        if timestamp_field:
+            row[timestamp_field] = to_timestamp_format(sample[0])
+        if value_field:
+            row[value_field] = sample[1]
+        return row
 
     def vector_processor():
         for ts in data_result:
-            ts_labels = set(ts["metric"].keys())
-            unique_labels.update(ts_labels)
-            series = ts["metric"]
-            series["timestamp"] = format_timestamp(
-                ts["value"][0], timestamp_format)
-            series["value"] = ts["value"][1]
-            replace_fields(series, custom_fields)
-            data_processed.append(series)
+            template, timestamp_field, value_field = row_template(ts["metric"])
+            yield build_row(template, timestamp_field, value_field, ts["value"])
 
     def matrix_processor():
         for ts in data_result:
-            ts_labels = set(ts["metric"].keys())
-            unique_labels.update(ts_labels)
-            series = ts["metric"]
-            for idx in range(len(ts["values"])):
-                series_nested = copy.deepcopy(series)
-                series_nested["timestamp"] = format_timestamp(
-                    ts["values"][idx][0], timestamp_format)
-                series_nested["value"] = ts["values"][idx][1]
-                replace_fields(series_nested, custom_fields)
-                data_processed.append(series_nested)
-                del series_nested
-
-    if data_raw["data"]["resultType"] == "vector":
-        vector_processor()
-    elif data_raw["data"]["resultType"] == "matrix":
-        matrix_processor()
+            template, timestamp_field, value_field = row_template(ts["metric"])
+            for sample in ts["values"]:
+                yield build_row(template, timestamp_field, value_field, sample)
+
+    processors = {"vector": vector_processor, "matrix": matrix_processor}
+    processor = processors.get(source_data["data"]["resultType"])
+    data_processed = processor() if processor else iter(())
 
     unique_labels = sorted(unique_labels)
     unique_labels.extend(["timestamp", "value"])
@@ -129,44 +308,375 @@ def data_processor(source_data: dict,
     return unique_labels, data_processed
 
 
-def cleanup_files(file) -> tuple[True, str]:
+def series_name(metric: dict, column_labels: list) -> str:
     """
-    This function removes the generated file
-    once it sends a response to the user.
+    This function builds the name of a time series from
+    the values of the selected labels, or from all of its
+    labels using the Prometheus series notation.
     """
-    try:
-        os.remove(file)
-    except BaseException as e:
-        return False, str(e)
+    if column_labels:
+        return ", ".join(metric.get(label, "") for label in column_labels)
+    labels = ", ".join(f'{k}="{v}"' for k, v in metric.items() if k != "__name__")
+    return f"{metric.get('__name__', '')}{{{labels}}}"
+
+
+def wide_data_processor(source_data: dict,
+                        custom_fields: dict,
+                        timestamp_format: str,
+                        column_labels: list,
+                        start: str = None,
+                        end: str = None,
+                        step: str = None) -> tuple[list, Iterator[dict]]:
+    """
+    This function pivots the results of the Prometheus
+    query into one row per timestamp and one column per
+    time series. Values of each series are kept in a
+    float array aligned on the step grid of the query;
+    missing samples are left empty.
+    """
+    data_result = source_data["data"]["result"]
+    to_timestamp_format = timestamp_formatter(timestamp_format)
+
+    def samples(ts) -> list:
+        # spooled series are read one at a time, see src/core/result_spool.py
+        return [ts["value"]] if source_data["data"]["resultType"] == "vector" else ts["values"]
+
+    if all([start, end, step]):
+        start_timestamp, end_timestamp = parse(start).timestamp(), parse(end).timestamp()
+        step_in_seconds = parse_duration(step)
+        grid = [start_timestamp + i * step_in_seconds for i in range(
+            floor((end_timestamp - start_timestamp) / step_in_seconds) + 1)]
     else:
-        return True, "File has been removed successfully"
+        grid = sorted({sample[0] for ts in data_result for sample in samples(ts)})
+    grid_index = {round(t * 1000): i for i, t in enumerate(grid)}
 
+    vectors = []
+    for ts in data_result:
+        vector = array("d", [nan]) * len(grid)
+        for timestamp, value in samples(ts):
+            idx = grid_index.get(round(timestamp * 1000))
+            if idx is not None:
+                vector[idx] = float(value)
+        vectors.append(vector)
 
-def file_generator(file_format, data, fields):
+    columns, names = [], dict()
+    for ts in data_result:
+        name = series_name(ts["metric"], column_labels)
+        names[name] = names.get(name, 0) + 1
+        columns.append(name if names[name] == 1 else f"{name} ({names[name]})")
+    fields = ["timestamp"] + columns
+    replace_fields(fields, custom_fields)
+
+    def rows():
+        for idx, timestamp in enumerate(grid):
+            row = {fields[0]: to_timestamp_format(timestamp)}
+            for field, vector in zip(fields[1:], vectors):
+                value = vector[idx]
+                row[field] = value if value == value else None
+            yield row
+
+    return fields, rows()
+
+
+def available_formats() -> list[str]:
+    """Returns the file formats the installed packages can generate"""
+    return [f for f in export_formats if f not in columnar_formats or pyarrow is not None]
+
+
+def validate_format(file_format: str) -> tuple[bool, int, str, str]:
     """
-    This function generates a file depending
-    on the provided file format/extension
+    This function checks whether the server is
+    able to generate the requested file format.
     """
+    if file_format not in export_formats:
+        return False, 400, "error", f"Unsupported file format '{file_format}'"
+    if file_format in columnar_formats and pyarrow is None:
+        return False, 400, "error", f"File format '{file_format}' requires " \
+                                    f"the 'pyarrow' package to be installed"
+    return True, 200, "success", "File format is valid"
 
-    file_path = f"/tmp/{str(uuid4())}.{file_format}"
-    try:
-        with open(file_path, 'w') as f:
-            if file_format == "csv":
-                writer = csv.DictWriter(
-                    f, fieldnames=fields, extrasaction='ignore')
-                writer.writeheader()
-                writer.writerows(data)
-            elif file_format in ["yml", "yaml"]:
-                f.write(yaml.dump(data))
-            elif file_format == "json":
-                f.write(json.dumps(data))
-            elif file_format in ["ndjson", "jsonlines"]:
-                for i in data:
-                    f.write(f"{json.dumps(i)}\n")
-            else:
-                cleanup_files(file_path)
-                return False, "error", 400, "", f"Unsupported file format '{file_format}'"
-    except BaseException as e:
-        return False, "error", 500, "", str(e)
+
+def validate_export(data: dict, file_format: str,
+                    compression: str) -> tuple[bool, int, str, str]:
+    """
+    This function validates the export request
+    body, file format and compression method.
+    """
+    validation_status, status_code, sts, msg = validate_schema(
+        "export.json", data)
+    if validation_status:
+        validation_status, status_code, sts, msg = validate_format(
+            file_format)
+    if validation_status:
+        validation_status, status_code, sts, msg = validate_compression(
+            compression)
+    return validation_status, status_code, sts, msg
+
+
+def validate_compression(compression: str) -> tuple[bool, int, str, str]:
+    """
+    This function checks whether the server is able
+    to compress the file with the requested method.
+    """
+    if compression and compression != "none" and compression not in compression_formats:
+        return False, 400, "error", f"Unsupported compression '{compression}'"
+    return True, 200, "success", "Compression is valid"
+
+
+def negotiate_compression(accept_encoding: str) -> str:
+    """
+    This function picks the preferred compression
+    supported by the server from the value of the
+    'Accept-Encoding' request header.
+    """
+    accepted = dict()
+    for encoding in (accept_encoding or "").split(","):
+        name, _, params = encoding.strip().partition(";")
+        quality = 1.0
+        if params.strip().startswith("q="):
+            try:
+                quality = float(params.strip()[2:])
+            except ValueError:
+                continue
+        accepted[name.strip().lower()] = quality
+    candidates = [c for c in compression_formats if accepted.get(c, accepted.get("*", 0)) > 0]
+    return max(candidates, key=lambda c: accepted.get(c, accepted.get("*", 0)), default=None)
+
+
+def compress_generator(content: Iterable[bytes],
+                       compression: str) -> Iterator[bytes]:
+    """
+    This function compresses the streamed
+    content on the fly with gzip or zstd.
+    """
+    if compression == "gzip":
+        compressor = zlib.compressobj(wbits=zlib.MAX_WBITS | 16)
+    else:
+        compressor = zstandard.ZstdCompressor().compressobj()
+    for chunk in content:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def stream_generator(file_format: str, data: Iterable[dict],
+                     fields: list) -> Iterator[bytes]:
+    """
+    This function serializes rows into the requested
+    file format and yields the encoded content in chunks
+    of roughly 'chunk_size' bytes, so the whole file is
+    never held in memory.
+    """
+    buffer = io.StringIO()
+
+    def flush() -> bytes:
+        content = buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate(0)
+        return content
+
+    if file_format == "csv":
+        writer = csv.DictWriter(
+            buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for row in data:
+            writer.writerow(row)
+            if buffer.tell() >= chunk_size:
+                yield flush()
+    elif file_format in ["yml", "yaml"]:
+        empty = True
+        for row in data:
+            empty = False
+            buffer.write(yaml.dump([row]))
+            if buffer.tell() >= chunk_size:
+                yield flush()
+        if empty:
+            buffer.write(yaml.dump([]))
+    elif file_format == "json":
+        buffer.write("[")
+        for idx, row in enumerate(data):
+            buffer.write(f"{', ' if idx else ''}{json.dumps(row)}")
+            if buffer.tell() >= chunk_size:
+                yield flush()
+        buffer.write("]")
+    elif file_format in ["ndjson", "jsonlines"]:
+        for row in data:
+            buffer.write(f"{json.dumps(row)}\n")
+            if buffer.tell() >= chunk_size:
+                yield flush()
+    content = flush()
+    if content:
+        yield content
+
+
+def process_data(source_data: dict, options: dict) -> tuple[list, Iterator[dict], str, list]:
+    """
+    This function processes the results of the Prometheus
+    query in the layout requested by the export options.
+    It returns the fields, a generator of rows and the
+    names of the timestamp and value fields.
+    """
+    custom_fields, timestamp_format = options.get("replace_fields"), options.get("timestamp_format")
+    if options.get("layout") == "wide":
+        fields, data_processed = wide_data_processor(
+            source_data=source_data, custom_fields=custom_fields,
+            timestamp_format=timestamp_format, column_labels=options.get("column_labels"),
+            start=options.get("start"), end=options.get("end"), step=options.get("step"))
+        return fields, data_processed, fields[0], fields[1:]
+    fields, data_processed = data_processor(
+        source_data=source_data, custom_fields=custom_fields, timestamp_format=timestamp_format)
+    return fields, data_processed, fields[-2], fields[-1:]
+
+
+def content_generator(source_data: dict, file_format: str,
+                      options: dict) -> Iterator[bytes]:
+    """
+    This function processes the results of the Prometheus
+    query and returns a generator of the file content.
+    """
+    fields, data_processed, timestamp_field, value_fields = process_data(
+        source_data, options)
+    if file_format in columnar_formats:
+        return columnar_generator(
+            file_format=file_format, data=data_processed, fields=fields,
+            timestamp_field=timestamp_field, value_fields=value_fields,
+            timestamp_format=options.get("timestamp_format"))
+    return stream_generator(
+        file_format=file_format, data=data_processed, fields=fields)
+
+
+def query_bundle(options: dict) -> tuple[bool, int, dict, list]:
+    """
+    This function runs all queries of the bundle
+    concurrently. It returns the results in the
+    order of the queries or the first error.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, max_parallel_queries)) as executor:
+        results = list(executor.map(
+            lambda q: query_data({**options, "expr": q["expr"]}), options["queries"]))
+    for query, (resp_status, status_code, resp_data) in zip(options["queries"], results):
+        if not resp_status:
+            return False, status_code, {**resp_data, "query": query["name"]}, list()
+    return True, 200, dict(), [resp_data for _, _, resp_data in results]
+
+
+def bundle_generator(results: list, file_format: str,
+                     options: dict) -> Iterator[bytes]:
+    """
+    This function streams the results of a bundle of
+    queries as a single Parquet or Arrow file with a
+    'query_name' column, or otherwise as a ZIP archive
+    with one file per query. Results are released as
+    soon as they have been written.
+    """
+    queries = options["queries"]
+    if file_format in columnar_formats:
+        fields, timestamp_field, value_fields, processed = ["query_name"], None, [], []
+        for idx, query in enumerate(queries):
+            query_fields, data_processed, timestamp_field, query_value_fields = process_data(
+                results[idx], {**options, "expr": query["expr"]})
+            fields.extend(f for f in query_fields if f not in fields)
+            value_fields.extend(f for f in query_value_fields if f not in value_fields)
+            processed.append(data_processed)
+        results.clear()
+
+        def rows():
+            for query, data_processed in zip(queries, processed):
+                for row in data_processed:
+                    row["query_name"] = query["name"]
+                    yield row
+
+        yield from columnar_generator(
+            file_format=file_format, data=rows(), fields=fields,
+            timestamp_field=timestamp_field, value_fields=value_fields,
+            timestamp_format=options.get("timestamp_format"))
+        return
+
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, mode="w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for idx, query in enumerate(queries):
+            result, results[idx] = results[idx], None
+            with archive.open(f"{query['name']}.{file_format}", mode="w", force_zip64=True) as f:
+                for chunk in content_generator(result, file_format, {**options, "expr": query["expr"]}):
+                    f.write(chunk)
+                    yield sink.take()
+            del result
+    yield sink.take()
+
+
+class _ChunkSink(io.RawIOBase):
+    """
+    A write-only file object that collects the
+    bytes written by PyArrow writers until they
+    are taken by the response stream.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.chunks = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self.chunks.append(bytes(b))
+        return len(b)
+
+    def take(self) -> bytes:
+        content = b"".join(self.chunks)
+        self.chunks = []
+        return content
+
+
+def columnar_generator(file_format: str, data: Iterable[dict], fields: list,
+                       timestamp_field: str, value_fields: list,
+                       timestamp_format: str) -> Iterator[bytes]:
+    """
+    This function writes rows into a Parquet file or
+    an Arrow IPC stream batch by batch. Label columns
+    are dictionary-encoded, values are float64 and
+    Unix timestamps are stored as int64 milliseconds.
+    """
+    value_fields = set(value_fields)
+    label_type = pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+    timestamp_type = pyarrow.timestamp("ms", tz="UTC") \
+        if timestamp_format == "unix" else pyarrow.string()
+    types = {f: pyarrow.float64() if f in value_fields else
+             timestamp_type if f == timestamp_field else label_type for f in fields}
+    schema = pyarrow.schema([(f, types[f]) for f in fields])
+
+    def to_array(field, values):
+        if field in value_fields:
+            return pyarrow.array([None if v is None else float(v) for v in values],
+                                 type=pyarrow.float64())
+        if field == timestamp_field:
+            if timestamp_format == "unix":
+                values = [None if v is None else round(float(v) * 1000) for v in values]
+            return pyarrow.array(values, type=timestamp_type)
+        return pyarrow.array(values, type=pyarrow.string()).dictionary_encode()
+
+    sink = _ChunkSink()
+    if file_format == "parquet":
+        writer = pyarrow.parquet.ParquetWriter(sink, schema)
     else:
-        return True, "success", 200, file_path, f"{file_format.upper()} file has been generated successfully"
+        writer = pyarrow.ipc.new_stream(
+            sink, schema, options=pyarrow.ipc.IpcWriteOptions(compression="zstd"))
+    columns = {f: [] for f in fields}
+    rows = 0
+    with writer:
+        for row in data:
+            for f in fields:
+                columns[f].append(row.get(f))
+            rows += 1
+            if rows >= batch_size:
+                writer.write_batch(pyarrow.record_batch(
+                    [to_array(f, columns[f]) for f in fields], schema=schema))
+                columns, rows = {f: [] for f in fields}, 0
+                yield sink.take()
+        if rows:
+            writer.write_batch(pyarrow.record_batch(
+                [to_array(f, columns[f]) for f in fields], schema=schema))
+    content = sink.take()
+    if content:
+        yield content
@@ -0,0 +1,183 @@
+from concurrent.futures import ThreadPoolExecutor
+from src.utils.arguments import arg_parser
+from src.core.query import parse_duration
+from src.core import export as exp
+from src.utils.log import logger
+from datetime import datetime
+from threading import Lock
+from uuid import uuid4
+from time import time
+import json
+import os
+
+args = arg_parser()
+jobs_path = args.get("export.job_path")
+jobs_ttl = parse_duration(args.get("export.job_ttl"))
+max_queued_jobs = args.get("export.max_queued_jobs")
+executor = ThreadPoolExecutor(max_workers=max(1, args.get("export.job_workers")),
+                              thread_name_prefix="export-job")
+jobs, jobs_lock = dict(), Lock()
+public_fields = ["id", "status", "message", "query", "format", "compression",
+                 "filename", "created", "started", "finished", "expires", "progress"]
+
+
+def _timestamp(value: float) -> str:
+    return datetime.fromtimestamp(value).astimezone().isoformat(
+        timespec='seconds') if value else None
+
+
+def _sync_to_file(job: dict) -> None:
+    """
+    This function saves the job state next to
+    its result, so that finished jobs can be
+    retrieved after a restart of the server
+    """
+    try:
+        with open(f"{jobs_path}/{job['id']}.json", "w") as f:
+            f.write(json.dumps(job))
+    except OSError as e:
+        logger.error(f"Failed to save export job state. {e}", extra={"job": job["id"]})
+
+
+def job_info(job: dict) -> dict:
+    """
+    This function returns the user-facing
+    representation of the export job
+    """
+    info = {k: job.get(k) for k in public_fields}
+    info.update(created=_timestamp(job["created"]), started=_timestamp(job["started"]),
+                finished=_timestamp(job["finished"]), expires=_timestamp(job["expires"]))
+    return info
+
+
+def get_job(job_id: str) -> dict:
+    """This function returns the export job by its ID"""
+    with jobs_lock:
+        return jobs.get(job_id)
+
+
+def result_file(job: dict) -> str:
+    """This function returns the path of the job result"""
+    return f"{jobs_path}/{job['id']}.result"
+
+
+def _run_job(job: dict, data: dict) -> None:
+    """
+    This function queries Prometheus and writes
+    the generated file to disk. It runs on the
+    bounded pool of export job workers.
+    """
+    job.update(status="running", message="Export job is in progress", started=time())
+    _sync_to_file(job)
+    key = exp.cache_key(data, job["format"])
+    cached = exp.result_cache.get(key) if key else None
+    resp_status, status_code = False, 500
+    try:
+        if cached is not None:
+            resp_status, status_code, resp_data = True, 200, dict()
+        else:
+            resp_status, status_code, resp_data = exp.query_data(data, progress=job["progress"])
+        if not resp_status:
+            raise RuntimeError(resp_data.get("error"))
+        if cached is not None:
+            content = iter([cached])
+        else:
+            content = exp.content_generator(
+                source_data=resp_data, file_format=job["format"], options=data)
+            if key:
+                content = exp.cache_generator(content, key)
+        if job["compression"]:
+            content = exp.compress_generator(content, job["compression"])
+        with open(f"{result_file(job)}.tmp", "wb") as f:
+            for chunk in content:
+                f.write(chunk)
+                job["progress"]["bytes_written"] += len(chunk)
+        os.rename(f"{result_file(job)}.tmp", result_file(job))
+    except BaseException as e:
+        status_code = status_code if not resp_status else 500
+        job.update(status="failed", message=f"Export job has failed. {e}")
+        if os.path.exists(f"{result_file(job)}.tmp"):
+            os.remove(f"{result_file(job)}.tmp")
+    else:
+        job.update(status="completed", message="Export file has been generated successfully")
+    job.update(finished=time(), expires=time() + jobs_ttl)
+    _sync_to_file(job)
+    logger.info(
+        msg=job["message"],
+        extra={
+            "status": status_code,
+            "job": job["id"],
+            "query": job["query"],
+            "step": data.get("step")})
+
+
+def submit_job(data: dict, file_format: str,
+               compression: str) -> tuple[int, str, str, dict]:
+    """
+    This function puts a new export job into the
+    queue unless the queue of pending jobs is full
+    """
+    compression = compression if compression != "none" else None
+    with jobs_lock:
+        pending = sum(1 for j in jobs.values() if j["status"] in ["queued", "running"])
+        if pending >= max_queued_jobs:
+            return 429, "error", "Too many pending export jobs. Try again later", dict()
+        filename = f"data.{file_format}"
+        if compression:
+            filename = f"{filename}.{exp.compression_formats[compression][0]}"
+        job = {
+            "id": str(uuid4()), "status": "queued",
+            "message": "Export job is waiting in the queue",
+            "query": data.get("expr"), "format": file_format,
+            "compression": compression, "filename": filename,
+            "created": time(), "started": None, "finished": None, "expires": None,
+            "progress": {"queries_total": 0, "queries_done": 0, "bytes_written": 0}}
+        jobs[job["id"]] = job
+    _sync_to_file(job)
+    executor.submit(_run_job, job, data)
+    return 202, "success", "Export job has been submitted successfully", job
+
+
+def cleanup_jobs() -> None:
+    """
+    This function removes finished export jobs
+    and their results once their TTL has expired
+    """
+    with jobs_lock:
+        expired = [j for j in jobs.values() if j["expires"] and j["expires"] <= time()]
+        for job in expired:
+            del jobs[job["id"]]
+    for job in expired:
+        for path in [result_file(job), f"{jobs_path}/{job['id']}.json"]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logger.error(f"Failed to remove export job file. {e}", extra={"job": job["id"]})
+    if expired:
+        logger.debug(f"Removed {len(expired)} expired export job(s)")
+
+
+def load_jobs() -> None:
+    """
+    This function loads the export jobs saved on disk
+    at startup. Jobs interrupted by a restart of the
+    server are marked as failed.
+    """
+    os.makedirs(jobs_path, exist_ok=True)
+    for name in os.listdir(jobs_path):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(f"{jobs_path}/{name}") as f:
+                job = json.loads(f.read())
+        except (OSError, ValueError) as e:
+            logger.error(f"Failed to load export job state. {e}", extra={"file": name})
+            continue
+        if job["status"] in ["queued", "running"]:
+            job.update(status="failed", message="Export job was interrupted by a restart of the server",
+                       finished=time(), expires=time() + jobs_ttl)
+            _sync_to_file(job)
+        jobs[job["id"]] = job
+    cleanup_jobs()
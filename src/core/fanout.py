@@ -0,0 +1,140 @@
+from starlette.concurrency import run_in_threadpool
+from src.utils.arguments import arg_parser
+from src.core.query import parse_duration
+from src.utils.log import logger
+from src.utils import upstream
+from time import time
+import asyncio
+import httpx
+import json
+
+args = arg_parser()
+timeout = parse_duration(args.get("proxy.fanout_timeout"))
+source_label = args.get("proxy.fanout_source_label")
+query_paths = ["/api/v1/query", "/api/v1/query_range"]
+excluded_headers = ["host", "content-length", "content-type", "accept-encoding", "connection"]
+client = httpx.AsyncClient(limits=upstream.limits, http2=upstream.http2)
+
+
+def parse_upstreams(value: str) -> dict:
+    """
+    This function parses the '--proxy.fanout-upstreams' flag
+    into a dictionary of Prometheus server names and URLs.
+    Servers without a name are named after their address.
+    """
+    upstreams = dict()
+    for entry in [e.strip() for e in value.split(",") if e.strip()]:
+        name, _, url = entry.partition("=") if "=" in entry.split("://")[0] else ("", "", entry)
+        url = url.rstrip("/")
+        upstreams[name or httpx.URL(url).netloc.decode()] = url
+    return upstreams
+
+
+upstreams = parse_upstreams(args.get("proxy.fanout_upstreams"))
+
+
+def requested(path: str, params: dict) -> bool:
+    return path in query_paths and params.get("fanout", "").lower() == "true"
+
+
+def _error(status_code: int, error_type: str, error: str) -> httpx.Response:
+    return httpx.Response(status_code, json={"status": "error", "errorType": error_type, "error": error})
+
+
+def _error_message(resp: httpx.Response) -> str:
+    try:
+        return resp.json().get("error") or resp.reason_phrase
+    except ValueError:
+        return resp.reason_phrase
+
+
+async def _query_upstream(name: str, url: str, path: str, params: dict,
+                          headers: dict) -> tuple[str, object]:
+    """
+    This function sends the query to a single Prometheus
+    server and returns its response, or the reason it failed
+    """
+    try:
+        resp = await asyncio.wait_for(
+            client.post(f"{url}{path}", data=params, headers=headers, timeout=upstream.timeout(path)),
+            timeout=timeout)
+    except asyncio.TimeoutError:
+        return name, f"query timed out after {args.get('proxy.fanout_timeout')}"
+    except httpx.HTTPError as e:
+        return name, f"failed to connect to Prometheus. {e}"
+    return name, resp
+
+
+def merge_results(results: list[tuple[str, dict]]) -> dict:
+    """
+    This function merges the vector or matrix results of
+    the Prometheus servers, adding the source label with
+    the name of the server to every series
+    """
+    merged, warnings = [], []
+    for name, result in results:
+        warnings.extend(w for w in result.get("warnings", []) if w not in warnings)
+        for ts in result["data"]["result"]:
+            merged.append({**ts, "metric": {**ts["metric"], source_label: name}})
+    response = {"status": "success", "data": {"resultType": results[0][1]["data"]["resultType"],
+                                              "result": merged}}
+    if warnings:
+        response["warnings"] = warnings
+    return response
+
+
+def _merge(contents: list[tuple[str, bytes]], failures: list[str]) -> bytes:
+    """
+    This function decodes the responses of the Prometheus
+    servers, merges them and reports the failed servers as
+    warnings. It is CPU-bound and runs in the thread pool.
+    Returns None if a result is not a vector or a matrix.
+    """
+    results = [(name, json.loads(content)) for name, content in contents]
+    if any(r["data"]["resultType"] not in ["vector", "matrix"] for _, r in results):
+        return None
+    response = merge_results(results)
+    if failures:
+        response["warnings"] = response.get("warnings", []) + failures
+    return json.dumps(response).encode("utf-8")
+
+
+async def query(path: str, params: dict, headers: dict) -> httpx.Response:
+    """
+    This function sends the query concurrently to the
+    configured Prometheus servers and merges their results.
+    Servers that fail or do not answer in time are reported
+    as warnings and the response is marked as partial.
+    """
+    if not upstreams:
+        return _error(400, "bad_data", "Fan-out queries require the '--proxy.fanout-upstreams' flag")
+    params = {k: v for k, v in params.items() if k != "fanout"}
+    if path == "/api/v1/query" and not params.get("time"):
+        params["time"] = time()
+    headers = {k: v for k, v in headers.items() if k.lower() not in excluded_headers}
+    responses = await asyncio.gather(*[
+        _query_upstream(name, url, path, params, headers) for name, url in upstreams.items()])
+
+    results, failures, error_response = [], [], None
+    for name, resp in responses:
+        if isinstance(resp, str):
+            failures.append(f"{name}: {resp}")
+        elif resp.status_code != 200:
+            error_response = resp if error_response is None else error_response
+            failures.append(f"{name}: {_error_message(resp)}")
+        else:
+            results.append((name, resp.content))
+    for failure in failures:
+        logger.warning(f"Fan-out query failed on {failure}", extra={"request_path": path})
+    if not results:
+        if error_response is not None:
+            return httpx.Response(error_response.status_code, content=error_response.content,
+                                  headers={"content-type": "application/json"})
+        return _error(503, "unavailable", f"All Prometheus servers failed. {'; '.join(failures)}")
+    content = await run_in_threadpool(_merge, results, failures)
+    if content is None:
+        return _error(400, "bad_data", "Fan-out queries must return an instant vector or a range vector")
+    return httpx.Response(200, content=content, headers={
+        "content-type": "application/json",
+        "X-Partial-Response": str(bool(failures)).lower(),
+        "X-Fanout-Upstreams": f"{len(results)}/{len(upstreams)}"})
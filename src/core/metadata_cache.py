@@ -0,0 +1,169 @@
+from src.utils.arguments import arg_parser
+from src.core.query import parse_duration
+from src.core import singleflight as sf
+from typing import Awaitable, Callable
+from collections import OrderedDict
+from src.core.cache import TTLCache
+from src.utils.log import logger
+from src.utils import upstream
+from bisect import bisect_left
+from fastapi import Request
+import asyncio
+import httpx
+import json
+import re
+
+args = arg_parser()
+cache = TTLCache(max_bytes=args.get("proxy.metadata_cache_size") * 1024 * 1024)
+ttl = parse_duration(args.get("proxy.metadata_cache_ttl"))
+max_stale = parse_duration(args.get("proxy.metadata_cache_max_stale"))
+cached_paths = re.compile(r"^/api/v1/(labels|label/[^/]+/values|series|metadata)$")
+form_cached_paths = ["/api/v1/labels", "/api/v1/series"]
+excluded_headers = ["host", "content-length", "accept-encoding", "connection"]
+label_name_pattern = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+flight = sf.SingleFlight()
+refreshing, tasks = set(), set()
+indexes, max_indexes = OrderedDict(), 256
+
+
+def cacheable(request: Request) -> bool:
+    """
+    This function checks whether the response to the
+    labels, label values, series or metadata request
+    may be cached
+    """
+    if not cache.max_bytes:
+        return False
+    if request.method == "GET":
+        return bool(cached_paths.match(request.url.path))
+    return request.method == "POST" and request.url.path in form_cached_paths
+
+
+def cache_key(path: str, params: list, authorization: str = None) -> str:
+    return json.dumps([path, params, authorization])
+
+
+def request_cache_key(request: Request, body: bytes) -> str:
+    return cache_key(request.url.path, sf.request_params(request, body),
+                     request.headers.get("authorization"))
+
+
+def lookup(key: str) -> tuple[bytes, str]:
+    """
+    This function returns the cached response and whether
+    it is fresh (HIT) or past its TTL but still allowed to
+    be served while it is refreshed (STALE)
+    """
+    content, age = cache.get(key), cache.age(key)
+    if content is None or age is None or age >= ttl + max_stale:
+        return None, None
+    return content, "HIT" if age < ttl else "STALE"
+
+
+def revalidate(key: str, fetch: Callable[[], Awaitable]) -> None:
+    """
+    This function refreshes the stale cache entry in
+    the background, once at a time for each entry
+    """
+    if key in refreshing:
+        return
+
+    async def refresh() -> None:
+        try:
+            await fetch()
+        except BaseException as e:
+            logger.warning(f"Failed to refresh cached response. {e}", extra={"key": key})
+        finally:
+            refreshing.discard(key)
+
+    refreshing.add(key)
+    task = asyncio.create_task(refresh())
+    tasks.add(task)
+    task.add_done_callback(tasks.discard)
+
+
+async def fetch(client: httpx.AsyncClient, request: Request,
+                body: bytes) -> tuple[int, dict, bytes]:
+    """
+    This function sends the request to Prometheus uncompressed
+    and caches successful responses
+    """
+    resp = await client.request(
+        request.method, request.url.path, params=request.query_params.multi_items(),
+        content=body, timeout=upstream.timeout(request.url.path),
+        headers={k: v for k, v in request.headers.items() if k not in excluded_headers})
+    headers = {k: v for k, v in resp.headers.items() if k not in ["content-encoding", "content-length"]}
+    if resp.status_code == 200:
+        cache.set(request_cache_key(request, body), resp.content)
+    return resp.status_code, headers, resp.content
+
+
+async def _fetch_label_values(client: httpx.AsyncClient, name: str,
+                              authorization: str, key: str) -> tuple[int, bytes]:
+    path = f"/api/v1/label/{name}/values"
+    resp = await client.get(path, timeout=upstream.timeout(path),
+                            headers={"authorization": authorization} if authorization else {})
+    if resp.status_code == 200:
+        cache.set(key, resp.content)
+    return resp.status_code, resp.content
+
+
+def _index(key: str, content: bytes) -> list[str]:
+    """
+    This function returns the sorted label values of the
+    cached response, which are rebuilt only when the
+    cached response changes
+    """
+    entry = indexes.get(key)
+    if entry is None or entry[0] is not content:
+        entry = (content, sorted(json.loads(content).get("data") or []))
+        indexes[key] = entry
+        while len(indexes) > max_indexes:
+            indexes.popitem(last=False)
+    indexes.move_to_end(key)
+    return entry[1]
+
+
+async def label_values(client: httpx.AsyncClient, name: str,
+                       authorization: str = None) -> tuple[bool, int, str, object]:
+    """
+    This function returns the sorted values of the label,
+    served from the cache when possible
+    """
+    if not label_name_pattern.match(name):
+        return False, 400, "error", f"Invalid label name '{name}'"
+    key = cache_key(f"/api/v1/label/{name}/values", [], authorization)
+    content, state = lookup(key) if cache.max_bytes else (None, None)
+    if content is None:
+        try:
+            _, (status_code, content) = await flight.do(
+                key, lambda: _fetch_label_values(client, name, authorization, key))
+        except httpx.HTTPError as e:
+            return False, 500, "error", f"Failed to connect to Prometheus. {e}"
+        if status_code != 200:
+            return False, status_code, "error", json.loads(content).get("error")
+    elif state == "STALE":
+        revalidate(key, lambda: _fetch_label_values(client, name, authorization, key))
+    return True, 200, "success", _index(key, content)
+
+
+async def search_label_values(client: httpx.AsyncClient, name: str, prefix: str, regex: str,
+                              limit: int, authorization: str = None) -> tuple[bool, int, str, object]:
+    """
+    This function searches the values of the label by
+    prefix and/or regular expression using the sorted
+    index of the cached label values
+    """
+    try:
+        pattern = re.compile(regex) if regex else None
+    except re.error as e:
+        return False, 400, "error", f"Invalid regular expression '{regex}'. {e}"
+    values_status, status_code, sts, values = await label_values(client, name, authorization)
+    if not values_status:
+        return values_status, status_code, sts, values
+    if prefix:
+        start, end = bisect_left(values, prefix), bisect_left(values, prefix + "\U0010ffff")
+        values = values[start:end]
+    if pattern:
+        values = [v for v in values if pattern.fullmatch(v)]
+    return True, 200, "success", values[:limit] if limit > 0 else values
@@ -5,7 +5,6 @@ from pytimeparse2 import parse
 import json
 
 rule_path = arg_parser().get("rule.path")
-prom_addr = arg_parser().get("prom.addr")
 policies_data_file = ".policies.json"
 
 
@@ -88,7 +87,7 @@ def validate_duration(val) -> tuple[bool, int, str, str, int]:
     field with the retention time of the Prometheus server
     """
     prom_storage_retention_human = prom_info(
-        prom_addr, "/runtimeinfo")["data"]["storageRetention"]
+        sub_path="/runtimeinfo")["data"]["storageRetention"]
     prom_storage_retention_seconds = parse(prom_storage_retention_human)
     val_seconds = parse(val)
     if val_seconds >= prom_storage_retention_seconds:
@@ -99,7 +98,7 @@ def validate_duration(val) -> tuple[bool, int, str, str, int]:
 
 def validate_prom_admin_api() -> tuple[bool, int, str, str]:
     prom_admin_api_status = prom_info(
-        prom_addr, "/flags")["data"]["web.enable-admin-api"]
+        sub_path="/flags")["data"]["web.enable-admin-api"]
     if prom_admin_api_status == "false":
         return False, 500, "error", "Metrics lifecycle policy API requires enabling Prometheus admin APIs. " \
                                     "For more information on configuration, check out this documentation " \
@@ -1,10 +1,13 @@
-from src.utils.validations import validate_schema
+from src.core.reload import ReloadCoalescer
+from src.core.rule_index import index
+from src.core.rule_linter import lint
 from src.utils.arguments import arg_parser
+from src.core.query import parse_duration
 from src.models.rule import Rule
 from src.utils.log import logger
+from src.utils import upstream
 from uuid import uuid4
-import requests
-import time
+import httpx
 import yaml
 import os
 
@@ -14,13 +17,14 @@ args = arg_parser()
 class PrometheusAPIClient:
 
     def __init__(self,
-                 prom_addr=args.get("prom.addr"),
+                 prom_addr="",
                  prom_config_file=args.get("config.file"),
                  prom_rule_path=args.get("rule.path")):
 
         self.prom_addr = prom_addr
         self.prom_rule_path = prom_rule_path
         self.prom_config_file = prom_config_file
+        self.reloader = ReloadCoalescer(self.reload, parse_duration(args.get("rule.reload_window")))
 
     def get_config(self) -> tuple[bool, int, dict]:
         """
@@ -28,8 +32,8 @@ class PrometheusAPIClient:
         of Prometheus as a dictionary object
         """
         try:
-            r = requests.request(method="GET",
-                                 url=f"{self.prom_addr}/api/v1/status/config")
+            r = upstream.client.get(f"{self.prom_addr}/api/v1/status/config",
+                                    timeout=upstream.timeout("/api/v1/status/config"))
         except BaseException as e:
             return False, 500, {"status": "error",
                                 "error": f"Failed to connect to Prometheus. {e}"}
@@ -38,7 +42,7 @@ class PrometheusAPIClient:
                 data_raw = r.json().get("data")
                 data = yaml.load(data_raw.get("yaml"), Loader=yaml.SafeLoader)
                 return True, r.status_code, data
-            return False, r.status_code, {"status": "error", "error": r.reason}
+            return False, r.status_code, {"status": "error", "error": r.reason_phrase}
 
     def update_config(self, data: str) -> tuple[bool, str]:
         """
@@ -57,23 +61,23 @@ class PrometheusAPIClient:
                 f"Successfully updated Prometheus configuration file: {self.prom_config_file}")
             return True, "success"
 
+    @staticmethod
+    def filename(file: str = None) -> str:
+        """
+        Generates a random filename depending on the
+        '--file.prefix' and '--file.extension' flags
+        """
+        file_prefix = f"{args.get('file.prefix')}-" if args.get(
+            'file.prefix') else ""
+        file_suffix = args.get('file.extension')
+        return file if file else f"{file_prefix}{str(uuid4())}{file_suffix}"
+
     def create_rule(self, rule: Rule, file: str = None) -> tuple[int, dict]:
         """
         A common function for the /rules API
         is used in the POST and PUT routes.
         """
 
-        def __filename_generator() -> str:
-            """
-            Generates a random filename depending on the
-            '--file.prefix' and '--file.extension' flags
-            """
-            nonlocal file
-            file_prefix = f"{args.get('file.prefix')}-" if args.get(
-                'file.prefix') else ""
-            file_suffix = args.get('file.extension')
-            return file if file else f"{file_prefix}{str(uuid4())}{file_suffix}"
-
         def __create_rule_file(data) -> tuple[bool, str, str]:
             """Creates a file"""
             nonlocal file
@@ -83,22 +87,22 @@ class PrometheusAPIClient:
                     f.write(rule_as_yaml)
             except (IOError, yaml.YAMLError) as e:
                 return False, "error", str(e)
+            finally:
+                index.refresh(file)
             return True, "success", "The rule was created successfully"
 
-        file = __filename_generator()
+        file = self.filename(file)
+        errors = lint(rule.data)
         while True:
-            validation_status, status_code, status_msg, msg = validate_schema(
-                "rules.json", rule.data)
-            if not validation_status:
-                status_code = 400
+            if errors:
+                status_code, status_msg, msg = 400, "error", errors[0]["message"]
                 break
             create_rule_status, status_msg, msg = __create_rule_file(
                 data=rule.data)
             if not create_rule_status:
                 status_code = 500
                 break
-            time.sleep(0.1)
-            status_code, status_msg, msg = self.reload()
+            status_code, status_msg, msg = self.reloader.reload()
             if status_code != 200:
                 self.delete_rule(file)
                 break
@@ -107,8 +111,78 @@ class PrometheusAPIClient:
             break
 
         resp = {"status": status_msg, "message": msg, "file": file}
+        if errors:
+            resp["errors"] = errors
         return status_code, resp
 
+    def create_rules(self, rules: list[Rule], recreate: bool = False) -> tuple[int, dict]:
+        """
+        This function lints and writes many rule files at
+        once, then reloads Prometheus a single time. The files
+        are written to temporary files first and renamed once
+        all of them are written. If the reload fails, the whole
+        batch is rolled back and Prometheus is reloaded again.
+        """
+        files = [self.filename(rule.file) for rule in rules]
+        errors = []
+        for i, (rule, file) in enumerate(zip(rules, files)):
+            errors.extend({"index": i, "file": file, **e} for e in lint(rule.data))
+            if not index.indexed(file) or ".." in file or "/" in file:
+                errors.append({"index": i, "file": file,
+                               "message": f"Invalid filename, expected a name ending with one of "
+                                          f"{', '.join(index.extensions)} and without a path"})
+            if files.index(file) != i:
+                errors.append({"index": i, "file": file, "message": "Duplicate filename in the batch"})
+        if errors:
+            return 400, {"status": "error", "message": "Validation of the rules has failed", "errors": errors}
+        existing = [file for file in files if index.exists(file, verify=True)]
+        if existing and not recreate:
+            return 409, {"status": "error", "message": "The requested files already exist", "files": existing}
+
+        originals, written = dict(), []
+        try:
+            for file in existing:
+                with open(f"{self.prom_rule_path}/{file}") as f:
+                    originals[file] = f.read()
+            for rule, file in zip(rules, files):
+                with open(f"{self.prom_rule_path}/.{file}.tmp", "w") as f:
+                    f.write(yaml.dump(rule.data))
+            for file in files:
+                os.replace(f"{self.prom_rule_path}/.{file}.tmp", f"{self.prom_rule_path}/{file}")
+                written.append(file)
+                index.refresh(file)
+        except (IOError, yaml.YAMLError) as e:
+            self.__rollback(written, originals, reload=False)
+            for file in files:
+                if os.path.exists(f"{self.prom_rule_path}/.{file}.tmp"):
+                    os.remove(f"{self.prom_rule_path}/.{file}.tmp")
+            return 500, {"status": "error", "message": str(e)}
+
+        status_code, status_msg, msg = self.reloader.reload()
+        if status_code != 200:
+            self.__rollback(written, originals)
+            return status_code, {"status": status_msg, "message": msg}
+        return 201, {"status": "success", "message": f"{len(files)} rules were created successfully",
+                     "files": files}
+
+    def __rollback(self, files: list[str], originals: dict, reload: bool = True) -> None:
+        """
+        Restores the original content of the recreated
+        rule files and removes the new ones
+        """
+        for file in files:
+            try:
+                if file in originals:
+                    with open(f"{self.prom_rule_path}/{file}", "w") as f:
+                        f.write(originals[file])
+                else:
+                    os.remove(f"{self.prom_rule_path}/{file}")
+            except OSError as e:
+                logger.error(f"Failed to roll back rule file {file}. {e}")
+            index.refresh(file)
+        if reload and files:
+            self.reloader.reload()
+
     def delete_rule(self, file) -> tuple[int, str, str]:
         """Deletes Prometheus rule file"""
 
@@ -117,19 +191,23 @@ class PrometheusAPIClient:
             nonlocal file
             try:
                 os.remove(f"{self.prom_rule_path}/{file}")
+            except FileNotFoundError:
+                return False, "error", "File not found"
             except OSError as e:
                 return False, "error", str(e.strerror)
+            finally:
+                index.refresh(file)
             return True, "success", "The rule was deleted successfully"
 
         while True:
-            if not os.path.exists(f"{self.prom_rule_path}/{file}"):
+            if not index.exists(file, verify=True):
                 status_code, status_msg, msg = 404, "error", "File not found"
                 break
             delete_rule_status, status_msg, msg = __delete_rule_file()
             if not delete_rule_status:
-                status_code = 500
+                status_code = 500 if index.exists(file) else 404
                 break
-            reload_status, status_msg, msg = self.reload()
+            reload_status, status_msg, msg = self.reloader.reload()
             if reload_status != 200:
                 status_code = reload_status
                 break
@@ -139,9 +217,17 @@ class PrometheusAPIClient:
         return status_code, status_msg, msg
 
     def reload(self) -> tuple[int, str, str]:
-        """Reloads the Prometheus configuration"""
-        try:
-            r = requests.post(f"{self.prom_addr}/-/reload")
-        except requests.RequestException as e:
-            return 500, "error", str(e)
-        return r.status_code, "success" if r.status_code == 200 else "error", r.text
+        """
+        Reloads the Prometheus configuration. Without an
+        address, every replica is reloaded and the first
+        failure is returned
+        """
+        addresses = [self.prom_addr] if self.prom_addr else upstream.prom_addrs
+        responses = upstream.client.broadcast("POST", "/-/reload", addresses=addresses,
+                                              timeout=upstream.timeout("/-/reload"))
+        for addr, r in responses:
+            if isinstance(r, httpx.HTTPError):
+                return 500, "error", f"{addr}: {r}"
+            if r.status_code != 200:
+                return r.status_code, "error", r.text
+        return 200, "success", responses[0][1].text
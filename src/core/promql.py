@@ -0,0 +1,595 @@
+from collections import namedtuple
+import warnings
+import re
+
+Token = namedtuple("Token", ["kind", "value", "pos"])
+
+aggregation_operators = ["sum", "min", "max", "avg", "group", "stddev", "stdvar", "count",
+                         "count_values", "bottomk", "topk", "quantile", "limitk", "limit_ratio"]
+grouping_keywords = ["by", "without", "on", "ignoring", "group_left", "group_right"]
+keywords = grouping_keywords + ["offset", "bool", "and", "or", "unless", "atan2"]
+token_patterns = [
+    ("COMMENT", r"#[^\n]*"),
+    ("SPACE", r"\s+"),
+    ("STRING", r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`[^`]*`'),
+    ("DURATION", r"(?:\d+(?:ms|[smhdwy]))+(?!\w)"),
+    ("NUMBER", r"0[xX][0-9a-fA-F]+|(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"),
+    ("IDENTIFIER", r"[a-zA-Z_:][a-zA-Z0-9_:]*"),
+    ("OPERATOR", r"==|!=|>=|<=|=~|!~|[=<>+\-*/%^@]"),
+    ("LEFT_PAREN", r"\("),
+    ("RIGHT_PAREN", r"\)"),
+    ("LEFT_BRACE", r"\{"),
+    ("RIGHT_BRACE", r"\}"),
+    ("LEFT_BRACKET", r"\["),
+    ("RIGHT_BRACKET", r"\]"),
+    ("COMMA", r","),
+    ("COLON", r":")
+]
+token_pattern = re.compile("|".join(f"(?P<{kind}>{pattern})" for kind, pattern in token_patterns))
+
+
+class PromQLError(ValueError):
+    """Raised for PromQL expressions that cannot be parsed"""
+
+    def __init__(self, message: str, pos: int):
+        super().__init__(f"{message} at position {pos}")
+        self.pos = pos
+
+
+def tokenize(expr: str) -> list[Token]:
+    """
+    This function splits a PromQL expression into tokens,
+    skipping whitespace and comments. The list always ends
+    with an EOF token.
+    """
+    tokens, pos = [], 0
+    while pos < len(expr):
+        match = token_pattern.match(expr, pos)
+        if not match:
+            raise PromQLError(f"unexpected character '{expr[pos]}'", pos)
+        if match.lastgroup not in ["SPACE", "COMMENT"]:
+            tokens.append(Token(match.lastgroup, match.group(), pos))
+        pos = match.end()
+    tokens.append(Token("EOF", "", pos))
+    return tokens
+
+
+def matching_paren(tokens: list[Token], start: int) -> int:
+    """
+    This function returns the index of the token closing
+    the parenthesis, brace or bracket opened at 'start'
+    """
+    opening = tokens[start].kind
+    closing = opening.replace("LEFT", "RIGHT")
+    depth = 0
+    for i in range(start, len(tokens)):
+        if tokens[i].kind == opening:
+            depth += 1
+        elif tokens[i].kind == closing:
+            depth -= 1
+            if depth == 0:
+                return i
+    raise PromQLError(f"unclosed {opening.lower().replace('_', ' ')}", tokens[start].pos)
+
+
+def selectors(tokens: list[Token]) -> list[tuple[int, int]]:
+    """
+    This function finds the vector selectors of the expression
+    and returns the indexes of their first and last tokens
+    """
+    found, i = [], 0
+    while i < len(tokens):
+        token = tokens[i]
+        if token.kind == "IDENTIFIER" and tokens[i + 1].kind != "LEFT_PAREN" and \
+                token.value.lower() not in keywords + ["inf", "nan"] and not (
+                token.value.lower() in aggregation_operators and
+                tokens[i + 1].value.lower() in ["by", "without"]):
+            end = matching_paren(tokens, i + 1) if tokens[i + 1].kind == "LEFT_BRACE" else i
+            found.append((i, end))
+            i = end + 1
+            continue
+        if token.kind == "LEFT_BRACE":
+            end = matching_paren(tokens, i)
+            found.append((i, end))
+            i = end + 1
+            continue
+        if token.kind == "LEFT_BRACKET" or (token.kind == "LEFT_PAREN" and i > 0 and
+                                            tokens[i - 1].value.lower() in grouping_keywords):
+            i = matching_paren(tokens, i) + 1
+            continue
+        i += 1
+    return found
+
+
+value_types = {"s": "scalar", "v": "instant vector", "m": "range vector", "S": "string"}
+# Argument types, number of variadic arguments (-1 for any) and return type, as in Prometheus
+functions = {
+    "abs": ("v", 0, "v"), "absent": ("v", 0, "v"), "absent_over_time": ("m", 0, "v"),
+    "acos": ("v", 0, "v"), "acosh": ("v", 0, "v"), "asin": ("v", 0, "v"), "asinh": ("v", 0, "v"),
+    "atan": ("v", 0, "v"), "atanh": ("v", 0, "v"), "avg_over_time": ("m", 0, "v"), "ceil": ("v", 0, "v"),
+    "changes": ("m", 0, "v"), "clamp": ("vss", 0, "v"), "clamp_max": ("vs", 0, "v"),
+    "clamp_min": ("vs", 0, "v"), "cos": ("v", 0, "v"), "cosh": ("v", 0, "v"),
+    "count_over_time": ("m", 0, "v"), "days_in_month": ("v", 1, "v"), "day_of_month": ("v", 1, "v"),
+    "day_of_week": ("v", 1, "v"), "day_of_year": ("v", 1, "v"), "deg": ("v", 0, "v"),
+    "delta": ("m", 0, "v"), "deriv": ("m", 0, "v"), "double_exponential_smoothing": ("mss", 0, "v"),
+    "exp": ("v", 0, "v"), "floor": ("v", 0, "v"), "histogram_avg": ("v", 0, "v"),
+    "histogram_count": ("v", 0, "v"), "histogram_fraction": ("ssv", 0, "v"),
+    "histogram_quantile": ("sv", 0, "v"), "histogram_stddev": ("v", 0, "v"),
+    "histogram_stdvar": ("v", 0, "v"), "histogram_sum": ("v", 0, "v"), "holt_winters": ("mss", 0, "v"),
+    "hour": ("v", 1, "v"), "idelta": ("m", 0, "v"), "increase": ("m", 0, "v"), "info": ("vv", 1, "v"),
+    "irate": ("m", 0, "v"), "label_join": ("vSSS", -1, "v"), "label_replace": ("vSSSS", 0, "v"),
+    "last_over_time": ("m", 0, "v"), "ln": ("v", 0, "v"), "log10": ("v", 0, "v"), "log2": ("v", 0, "v"),
+    "mad_over_time": ("m", 0, "v"), "max_over_time": ("m", 0, "v"), "min_over_time": ("m", 0, "v"),
+    "minute": ("v", 1, "v"), "month": ("v", 1, "v"), "pi": ("", 0, "s"), "predict_linear": ("ms", 0, "v"),
+    "present_over_time": ("m", 0, "v"), "quantile_over_time": ("sm", 0, "v"), "rad": ("v", 0, "v"),
+    "rate": ("m", 0, "v"), "resets": ("m", 0, "v"), "round": ("vs", 1, "v"), "scalar": ("v", 0, "s"),
+    "sgn": ("v", 0, "v"), "sin": ("v", 0, "v"), "sinh": ("v", 0, "v"), "sort": ("v", 0, "v"),
+    "sort_by_label": ("vS", -1, "v"), "sort_by_label_desc": ("vS", -1, "v"), "sort_desc": ("v", 0, "v"),
+    "sqrt": ("v", 0, "v"), "stddev_over_time": ("m", 0, "v"), "stdvar_over_time": ("m", 0, "v"),
+    "sum_over_time": ("m", 0, "v"), "tan": ("v", 0, "v"), "tanh": ("v", 0, "v"), "time": ("", 0, "s"),
+    "timestamp": ("v", 0, "v"), "vector": ("s", 0, "v"), "year": ("v", 1, "v")
+}
+aggregation_parameters = {"topk": "scalar", "bottomk": "scalar", "quantile": "scalar", "limitk": "scalar",
+                          "limit_ratio": "scalar", "count_values": "string"}
+binary_precedence = [["or"], ["and", "unless"], ["==", "!=", "<=", "<", ">=", ">"], ["+", "-"],
+                     ["*", "/", "%", "atan2"]]
+comparison_operators = binary_precedence[2]
+set_operators = ["and", "or", "unless"]
+matching_operators = ["=", "!=", "=~", "!~"]
+label_name_pattern = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_]*$")
+string_escapes = {"a": "\a", "b": "\b", "f": "\f", "n": "\n", "r": "\r", "t": "\t", "v": "\v", "\\": "\\"}
+unsupported_regex = re.compile(r"\(\?(?:[=!]|<[=!])|\\[1-9]")
+re2_only_regex = re.compile(r"\\[pPQEzC]")
+modifier_error = "modifier must be preceded by an instant vector selector or range vector selector or a subquery"
+
+
+class Node:
+    """A node of the syntax tree of a PromQL expression"""
+    __slots__ = ["kind", "type", "pos", "args", "name", "offset", "at"]
+
+    def __init__(self, kind: str, type: str, pos: int, args: list = None, name: str = None):
+        self.kind, self.type, self.pos = kind, type, pos
+        self.args, self.name = args or [], name
+        self.offset, self.at = False, False
+
+
+def unquote(token: Token) -> str:
+    """
+    This function returns the value of the string token,
+    with its escape sequences checked as Prometheus does
+    """
+    quote, body = token.value[0], token.value[1:-1]
+    if quote == "`":
+        return body
+    value, i = [], 0
+    while i < len(body):
+        if body[i] != "\\":
+            value.append(body[i])
+            i += 1
+            continue
+        escape = body[i + 1]
+        if escape in string_escapes or escape == quote:
+            value.append(string_escapes.get(escape, escape))
+            i += 2
+        elif escape in "xuU":
+            digits = body[i + 2:i + 2 + {"x": 2, "u": 4, "U": 8}[escape]]
+            if len(digits) != {"x": 2, "u": 4, "U": 8}[escape] or \
+                    any(c not in "0123456789abcdefABCDEF" for c in digits):
+                raise PromQLError(f"invalid escape sequence '\\{escape}{digits}'", token.pos + i + 1)
+            value.append(chr(int(digits, 16)))
+            i += 2 + len(digits)
+        elif escape in "01234567":
+            digits = body[i + 1:i + 4]
+            if len(digits) != 3 or any(c not in "01234567" for c in digits):
+                raise PromQLError(f"invalid escape sequence '\\{digits}'", token.pos + i + 1)
+            value.append(chr(int(digits, 8)))
+            i += 4
+        else:
+            raise PromQLError(f"unknown escape sequence '\\{escape}'", token.pos + i + 1)
+    return "".join(value)
+
+
+def regex_error(regex: str) -> str:
+    """
+    This function returns why the regular expression is
+    invalid in Prometheus, which uses the RE2 syntax,
+    or None if it is valid
+    """
+    if unsupported_regex.search(regex):
+        return f"invalid regular expression \"{regex}\": lookarounds and backreferences are not supported"
+    if re2_only_regex.search(regex):
+        return None
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            re.compile(regex)
+    except re.error as e:
+        return f"invalid regular expression \"{regex}\": {e.msg}"
+    return None
+
+
+def _matches_empty(operator: str, value: str) -> bool:
+    if operator == "=":
+        return value == ""
+    if operator == "!=":
+        return value != ""
+    try:
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")
+            matched = re.fullmatch(value, "", re.DOTALL) is not None
+    except re.error:
+        return False
+    return matched if operator == "=~" else not matched
+
+
+class Parser:
+    """
+    A recursive descent parser of PromQL expressions. Syntax
+    errors stop the parsing, type errors are collected in
+    'errors' so all of them are reported at once.
+    """
+
+    def __init__(self, expr: str):
+        self.tokens = tokenize(expr)
+        self.i = 0
+        self.errors = []
+
+    @property
+    def token(self) -> Token:
+        return self.tokens[self.i]
+
+    def peek(self) -> Token:
+        return self.tokens[min(self.i + 1, len(self.tokens) - 1)]
+
+    def next(self) -> Token:
+        token = self.tokens[self.i]
+        if token.kind != "EOF":
+            self.i += 1
+        return token
+
+    def is_keyword(self, *values: str) -> bool:
+        return self.token.kind == "IDENTIFIER" and self.token.value.lower() in values
+
+    def unexpected(self, expected: str) -> PromQLError:
+        found = "end of input" if self.token.kind == "EOF" else f"'{self.token.value}'"
+        return PromQLError(f"unexpected {found}, expected {expected}", self.token.pos)
+
+    def expect(self, kind: str, expected: str) -> Token:
+        if self.token.kind != kind:
+            raise self.unexpected(expected)
+        return self.next()
+
+    def error(self, message: str, pos: int) -> None:
+        self.errors.append(PromQLError(message, pos))
+
+    def expect_type(self, node: Node, expected: str, context: str) -> None:
+        if node.type != expected:
+            self.error(f"expected type {expected} in {context}, got {node.type}", node.pos)
+
+    def parse(self) -> Node:
+        if self.token.kind == "EOF":
+            raise PromQLError("no expression found in input", 0)
+        node = self.binary(0)
+        if self.token.kind != "EOF":
+            raise self.unexpected("an operator or end of input")
+        return node
+
+    def operator(self, level: int) -> str:
+        token = self.token
+        value = token.value.lower() if token.kind == "IDENTIFIER" else token.value
+        if token.kind in ["OPERATOR", "IDENTIFIER"] and value in binary_precedence[level]:
+            return value
+        return None
+
+    def binary(self, level: int) -> Node:
+        if level == len(binary_precedence):
+            return self.unary()
+        lhs = self.binary(level + 1)
+        operator = self.operator(level)
+        while operator:
+            pos = self.next().pos
+            modifiers = self.binary_modifiers(operator)
+            lhs = self.check_binary(operator, lhs, self.binary(level + 1), pos, modifiers)
+            operator = self.operator(level)
+        return lhs
+
+    def unary(self) -> Node:
+        token = self.token
+        if token.kind == "OPERATOR" and token.value in ["+", "-"]:
+            self.next()
+            operand = self.unary()
+            if operand.type not in ["scalar", "instant vector"]:
+                self.error("unary expression only allowed on expressions of type scalar or instant vector",
+                           token.pos)
+            return Node("unary", operand.type, token.pos, [operand], name=token.value)
+        return self.power()
+
+    def power(self) -> Node:
+        lhs = self.postfix()
+        if self.token.kind == "OPERATOR" and self.token.value == "^":
+            pos = self.next().pos
+            modifiers = self.binary_modifiers("^")
+            return self.check_binary("^", lhs, self.unary(), pos, modifiers)
+        return lhs
+
+    def binary_modifiers(self, operator: str) -> dict:
+        modifiers = {"bool": False, "matching": None, "group": None}
+        if self.is_keyword("bool"):
+            if operator not in comparison_operators:
+                self.error("bool modifier can only be used on comparison operators", self.token.pos)
+            self.next()
+            modifiers["bool"] = True
+        if self.is_keyword("on", "ignoring"):
+            modifiers["matching"] = (self.next().value.lower(), self.labels())
+            if self.is_keyword("group_left", "group_right"):
+                keyword = self.next().value.lower()
+                modifiers["group"] = (keyword, self.labels() if self.token.kind == "LEFT_PAREN" else [])
+        return modifiers
+
+    def check_binary(self, operator: str, lhs: Node, rhs: Node, pos: int, modifiers: dict) -> Node:
+        for side in [lhs, rhs]:
+            if side.type not in ["scalar", "instant vector"]:
+                self.error("binary expression must contain only scalar and instant vector types", side.pos)
+        scalars = lhs.type == "scalar" and rhs.type == "scalar"
+        if operator in comparison_operators and scalars and not modifiers["bool"]:
+            self.error("comparisons between scalars must use BOOL modifier", pos)
+        if operator in set_operators and "scalar" in [lhs.type, rhs.type]:
+            self.error(f"set operator \"{operator}\" not allowed in binary scalar expression", pos)
+        elif (modifiers["matching"] or modifiers["group"]) and "scalar" in [lhs.type, rhs.type]:
+            self.error("vector matching only allowed between instant vectors", pos)
+        if modifiers["group"] and operator in set_operators:
+            self.error(f"no grouping allowed for \"{operator}\" operation", pos)
+        if modifiers["group"] and modifiers["matching"] and modifiers["matching"][0] == "on":
+            for label in set(modifiers["matching"][1]) & set(modifiers["group"][1]):
+                self.error(f"label \"{label}\" must not occur in ON and GROUP clause at once", pos)
+        return Node("binary", "scalar" if scalars else "instant vector", pos, [lhs, rhs], name=operator)
+
+    def postfix(self) -> Node:
+        node = self.primary()
+        while True:
+            if self.token.kind == "LEFT_BRACKET":
+                node = self.range(node)
+            elif self.is_keyword("offset"):
+                pos = self.next().pos
+                if self.token.kind == "OPERATOR" and self.token.value in ["+", "-"]:
+                    self.next()
+                self.duration()
+                if node.kind not in ["vector_selector", "matrix_selector", "subquery"]:
+                    self.error(f"offset {modifier_error}", pos)
+                elif node.offset:
+                    self.error("offset may not be set multiple times", pos)
+                node.offset = True
+            elif self.token.kind == "OPERATOR" and self.token.value == "@":
+                pos = self.next().pos
+                self.timestamp()
+                if node.kind not in ["vector_selector", "matrix_selector", "subquery"]:
+                    self.error(f"@ {modifier_error}", pos)
+                elif node.at:
+                    self.error("@ <timestamp> may not be set multiple times", pos)
+                node.at = True
+            else:
+                return node
+
+    def duration(self) -> Token:
+        if self.token.kind not in ["DURATION", "NUMBER"]:
+            raise self.unexpected("a duration")
+        return self.next()
+
+    def timestamp(self) -> None:
+        if self.is_keyword("start", "end") and self.peek().kind == "LEFT_PAREN":
+            self.next()
+            self.next()
+            self.expect("RIGHT_PAREN", "')'")
+            return
+        if self.token.kind == "OPERATOR" and self.token.value in ["+", "-"]:
+            self.next()
+        if self.token.kind != "NUMBER":
+            raise self.unexpected("a timestamp, start() or end()")
+        self.next()
+
+    def range(self, node: Node) -> Node:
+        pos = self.next().pos
+        self.duration()
+        step = self.token
+        subquery = step.kind == "COLON" or (step.kind == "IDENTIFIER" and step.value.startswith(":"))
+        if subquery:
+            self.next()
+        if step.kind == "IDENTIFIER" and step.value != ":" and subquery:
+            # 'x[5m:1m]' is tokenized as a duration and an identifier
+            if not re.fullmatch(token_patterns[3][1], step.value[1:]):
+                raise PromQLError(f"unexpected '{step.value[1:]}', expected a duration", step.pos + 1)
+        elif subquery and self.token.kind != "RIGHT_BRACKET":
+            self.duration()
+        if subquery:
+            self.expect("RIGHT_BRACKET", "']'")
+            if node.type != "instant vector":
+                self.error(f"subquery is only allowed on instant vector, got {node.type}", pos)
+            return Node("subquery", "range vector", pos, [node])
+        self.expect("RIGHT_BRACKET", "']' or ':'")
+        if node.kind != "vector_selector":
+            self.error("ranges only allowed for vector selectors", pos)
+        elif node.offset or node.at:
+            self.error("no offset or @ modifiers allowed before range", pos)
+        return Node("matrix_selector", "range vector", pos, [node], name=node.name)
+
+    def primary(self) -> Node:
+        token = self.token
+        if token.kind == "NUMBER":
+            self.next()
+            return Node("number", "scalar", token.pos)
+        if token.kind == "STRING":
+            self.next()
+            return Node("string", "string", token.pos, name=unquote(token))
+        if token.kind == "DURATION":
+            raise PromQLError(f"unexpected duration '{token.value}'", token.pos)
+        if token.kind == "LEFT_PAREN":
+            self.next()
+            node = self.binary(0)
+            self.expect("RIGHT_PAREN", "')'")
+            return Node("paren", node.type, token.pos, [node])
+        if token.kind == "LEFT_BRACE":
+            return self.vector_selector(None)
+        if token.kind == "IDENTIFIER":
+            name = token.value.lower()
+            if name in aggregation_operators and (
+                    self.peek().kind == "LEFT_PAREN" or self.peek().value.lower() in ["by", "without"]):
+                return self.aggregation()
+            if self.peek().kind == "LEFT_PAREN":
+                return self.call()
+            if name in ["inf", "nan"] and self.peek().kind != "LEFT_BRACE":
+                self.next()
+                return Node("number", "scalar", token.pos)
+            if name in keywords:
+                raise self.unexpected("an expression")
+            return self.vector_selector(token.value)
+        raise self.unexpected("an expression")
+
+    def labels(self) -> list[str]:
+        self.expect("LEFT_PAREN", "'('")
+        labels = []
+        while self.token.kind != "RIGHT_PAREN":
+            token = self.token
+            if token.kind == "IDENTIFIER":
+                if not label_name_pattern.match(token.value):
+                    self.error(f"invalid label name \"{token.value}\"", token.pos)
+                labels.append(token.value)
+            elif token.kind == "STRING":
+                labels.append(unquote(token))
+            else:
+                raise self.unexpected("a label name or ')'")
+            self.next()
+            if self.token.kind == "COMMA":
+                self.next()
+            elif self.token.kind != "RIGHT_PAREN":
+                raise self.unexpected("',' or ')'")
+        self.next()
+        return labels
+
+    def arguments(self) -> list[Node]:
+        self.expect("LEFT_PAREN", "'('")
+        args = []
+        while self.token.kind != "RIGHT_PAREN":
+            args.append(self.binary(0))
+            if self.token.kind == "COMMA":
+                self.next()
+            elif self.token.kind != "RIGHT_PAREN":
+                raise self.unexpected("',' or ')'")
+        self.next()
+        return args
+
+    def aggregation(self) -> Node:
+        token = self.next()
+        operator, grouping = token.value.lower(), False
+        if self.is_keyword("by", "without"):
+            self.next()
+            self.labels()
+            grouping = True
+        args = self.arguments()
+        if self.is_keyword("by", "without"):
+            if grouping:
+                self.error("aggregation must only contain one grouping clause", self.token.pos)
+            self.next()
+            self.labels()
+        context = "aggregation expression"
+        expected = 2 if operator in aggregation_parameters else 1
+        if len(args) != expected:
+            self.error(f"wrong number of arguments for aggregate expression provided, "
+                       f"expected {expected}, got {len(args)}", token.pos)
+        elif expected == 2:
+            self.expect_type(args[0], aggregation_parameters[operator], context)
+            if operator == "count_values" and args[0].kind == "string" and \
+                    not label_name_pattern.match(args[0].name):
+                self.error(f"invalid label name \"{args[0].name}\"", args[0].pos)
+            self.expect_type(args[1], "instant vector", context)
+        else:
+            self.expect_type(args[0], "instant vector", context)
+        return Node("aggregation", "instant vector", token.pos, args, name=operator)
+
+    def call(self) -> Node:
+        token = self.next()
+        args = self.arguments()
+        if token.value not in functions:
+            self.error(f"unknown function with name \"{token.value}\"", token.pos)
+            return Node("call", "instant vector", token.pos, args, name=token.value)
+        arg_types, variadic, return_type = functions[token.value]
+        if variadic == 0 and len(args) != len(arg_types):
+            self.error(f"expected {len(arg_types)} argument(s) in call to \"{token.value}\", "
+                       f"got {len(args)}", token.pos)
+        elif variadic != 0 and len(args) < len(arg_types) - 1:
+            self.error(f"expected at least {len(arg_types) - 1} argument(s) in call to \"{token.value}\", "
+                       f"got {len(args)}", token.pos)
+        elif variadic > 0 and len(args) > len(arg_types) - 1 + variadic:
+            self.error(f"expected at most {len(arg_types) - 1 + variadic} argument(s) in call to "
+                       f"\"{token.value}\", got {len(args)}", token.pos)
+        else:
+            for i, arg in enumerate(args):
+                arg_type = arg_types[min(i, len(arg_types) - 1)]
+                self.expect_type(arg, value_types[arg_type], f"call to function \"{token.value}\"")
+            if token.value in ["label_replace", "label_join"] and args[1].kind == "string" and \
+                    not label_name_pattern.match(args[1].name):
+                self.error(f"invalid destination label name in {token.value}(): {args[1].name}", args[1].pos)
+            if token.value == "label_replace" and args[4].kind == "string" and regex_error(args[4].name):
+                self.error(regex_error(args[4].name), args[4].pos)
+        return Node("call", value_types[return_type], token.pos, args, name=token.value)
+
+    def vector_selector(self, name: str) -> Node:
+        pos, matchers = self.token.pos, []
+        if name is not None:
+            self.next()
+        if self.token.kind == "LEFT_BRACE":
+            self.next()
+            while self.token.kind != "RIGHT_BRACE":
+                label = self.token
+                if label.kind not in ["IDENTIFIER", "STRING"]:
+                    raise self.unexpected("a label matcher or '}'")
+                label_name = label.value if label.kind == "IDENTIFIER" else unquote(label)
+                self.next()
+                if label.kind == "STRING" and self.token.kind in ["COMMA", "RIGHT_BRACE"]:
+                    if name is not None:
+                        self.error(f"metric name must not be set twice: \"{name}\" or \"{label_name}\"", label.pos)
+                    name = label_name
+                else:
+                    operator = self.token
+                    if operator.kind != "OPERATOR" or operator.value not in matching_operators:
+                        raise self.unexpected("a label matching operator")
+                    self.next()
+                    value = unquote(self.expect("STRING", "a string"))
+                    if label.kind == "IDENTIFIER" and not label_name_pattern.match(label_name):
+                        self.error(f"invalid label name \"{label_name}\"", label.pos)
+                    if operator.value in ["=~", "!~"] and regex_error(value):
+                        self.error(regex_error(value), label.pos)
+                    if label_name == "__name__" and operator.value == "=" and name is not None:
+                        self.error(f"metric name must not be set twice: \"{name}\" or \"{value}\"", label.pos)
+                    matchers.append((operator.value, value))
+                if self.token.kind == "COMMA":
+                    self.next()
+                elif self.token.kind != "RIGHT_BRACE":
+                    raise self.unexpected("',' or '}'")
+            self.next()
+        if name is None and all(_matches_empty(operator, value) for operator, value in matchers):
+            self.error("vector selector must contain at least one non-empty matcher", pos)
+        return Node("vector_selector", "instant vector", pos, name=name)
+
+
+def parse(expr: str) -> tuple[Node, list[PromQLError]]:
+    """
+    This function parses the PromQL expression and returns its
+    syntax tree with the type errors found. Syntax errors are
+    raised as PromQLError.
+    """
+    parser = Parser(expr)
+    return parser.parse(), parser.errors
+
+
+def check(expr: str) -> list[PromQLError]:
+    """
+    This function returns all errors of the PromQL
+    expression, or an empty list if it is valid
+    """
+    parser = None
+    try:
+        parser = Parser(expr)
+        parser.parse()
+    except PromQLError as e:
+        return (parser.errors if parser else []) + [e]
+    return parser.errors
@@ -0,0 +1,170 @@
+from src.core.query import parse_duration, normalize_expr, merge_results
+from starlette.concurrency import run_in_threadpool
+from src.core.cache import LRUCache, DiskCache
+from src.utils.arguments import arg_parser
+from fastapi import Request, Response
+from dateutil.parser import parse
+from urllib.parse import parse_qsl
+from src.core import sharding
+from time import time
+import asyncio
+import httpx
+import json
+
+args = arg_parser()
+memory_cache = LRUCache(max_bytes=args.get("proxy.cache_size") * 1024 * 1024)
+disk_cache = DiskCache(
+    path=args.get("proxy.cache_path"),
+    max_bytes=args.get("proxy.cache_disk_size") * 1024 * 1024) if args.get("proxy.cache_path") else None
+split_interval = round(parse_duration(args.get("proxy.cache_split_interval")) * 1000)
+max_freshness = round(parse_duration(args.get("proxy.cache_max_freshness")) * 1000)
+max_parallel_queries = 8
+max_buckets = 100
+query_range_path = "/api/v1/query_range"
+excluded_headers = ["host", "content-length", "content-type", "accept-encoding", "connection"]
+uncached_params = ["query", "start", "end", "step", "timeout"]
+
+
+def enabled() -> bool:
+    return bool(memory_cache.max_bytes) or disk_cache is not None
+
+
+def _timestamp_ms(value: str) -> int:
+    """
+    This function converts a Prometheus timestamp, either
+    a unix timestamp or RFC3339, into milliseconds
+    """
+    try:
+        return round(float(value) * 1000)
+    except ValueError:
+        return round(parse(value).timestamp() * 1000)
+
+
+def _params(request: Request, body: bytes) -> dict:
+    """
+    This function returns the parameters of the query,
+    the form-encoded body takes precedence over the URL
+    """
+    params = dict(request.query_params)
+    if request.method == "POST" and request.headers.get(
+            "content-type", "").startswith("application/x-www-form-urlencoded"):
+        params.update(parse_qsl(body.decode("utf-8")))
+    return params
+
+
+async def _cache_get(key: str) -> bytes:
+    value = memory_cache.get(key) if memory_cache.max_bytes else None
+    if value is None and disk_cache is not None:
+        value = await run_in_threadpool(disk_cache.get, key)
+        if value is not None and memory_cache.max_bytes:
+            memory_cache.set(key, value)
+    return value
+
+
+async def _cache_set(key: str, value: bytes) -> None:
+    if memory_cache.max_bytes:
+        memory_cache.set(key, value)
+    if disk_cache is not None:
+        await run_in_threadpool(disk_cache.set, key, value)
+
+
+def _trim(result: dict, start: int, end: int) -> dict:
+    """
+    This function drops the samples outside of the
+    requested time range and the series left empty
+    """
+    series = []
+    for ts in result["data"]["result"]:
+        for field in ["values", "histograms"]:
+            if field in ts:
+                ts[field] = [v for v in ts[field] if start <= round(v[0] * 1000) <= end]
+        if ts.get("values") or ts.get("histograms"):
+            series.append(ts)
+    result["data"]["result"] = series
+    return result
+
+
+def _merge(contents: list[bytes], start: int, end: int) -> bytes:
+    """
+    This function decodes the responses of the buckets,
+    stitches them together, trims them to the requested
+    time range and encodes the result. It is CPU-bound and
+    runs in the thread pool to keep the event loop free.
+    """
+    return json.dumps(_trim(merge_results([json.loads(c) for c in contents]), start, end)).encode("utf-8")
+
+
+async def query_range(client: httpx.AsyncClient, request: Request) -> Response:
+    """
+    This function serves a range query from the results cache.
+    The time range is split into step-aligned buckets, cached
+    buckets are reused and only the missing buckets and the
+    ones newer than the max freshness are queried from
+    Prometheus. Returns None if the query cannot be cached,
+    in which case it is forwarded to Prometheus as is.
+    """
+    if not enabled() or request.method not in ["GET", "POST"]:
+        return None
+    params = _params(request, await request.body())
+    if "stats" in params:
+        return None
+    try:
+        start, end = _timestamp_ms(params["start"]), _timestamp_ms(params["end"])
+        step = round(parse_duration(params["step"]) * 1000)
+        query = normalize_expr(params["query"])
+    except (KeyError, ValueError, OverflowError):
+        return None
+    if step <= 0 or end < start or start % step:
+        return None
+
+    bucket = -(-split_interval // step) * step
+    while (end - start) // bucket > max_buckets:
+        bucket *= 2
+    headers = {k: v for k, v in request.headers.items() if k not in excluded_headers}
+    key_prefix = json.dumps([
+        query, step, bucket, headers.get("authorization"),
+        sorted([k, v] for k, v in params.items() if k not in uncached_params)])
+    fresh_after = time() * 1000 - max_freshness
+    buckets = []
+    for bucket_start in range(start // bucket * bucket, end + 1, bucket):
+        if bucket_start + bucket <= fresh_after:
+            key = f"{key_prefix}{bucket_start}"
+            buckets.append((key, bucket_start, bucket_start + bucket - step, await _cache_get(key)))
+        else:
+            buckets.append((None, max(start, bucket_start), min(end, bucket_start + bucket - step), None))
+
+    semaphore = asyncio.Semaphore(max_parallel_queries)
+
+    async def fetch(bucket_start: int, bucket_end: int) -> httpx.Response:
+        async with semaphore:
+            return await sharding.query(
+                client, query_range_path, headers=headers,
+                params={**params, "start": bucket_start / 1000,
+                        "end": bucket_end / 1000, "step": step / 1000})
+
+    missing = [b for b in buckets if b[3] is None]
+    try:
+        responses = await asyncio.gather(*[fetch(b[1], b[2]) for b in missing])
+    except httpx.HTTPError as e:
+        return Response(
+            content=json.dumps({"status": "error", "errorType": "unavailable",
+                                "error": f"Prometheus query has failed. {e}"}),
+            status_code=503, media_type="application/json")
+    for resp in responses:
+        if resp.status_code != 200:
+            return Response(content=resp.content, status_code=resp.status_code,
+                            media_type=resp.headers.get("content-type"))
+
+    contents, fetched = [], iter(responses)
+    for key, _, _, cached in buckets:
+        if cached is None:
+            resp = next(fetched)
+            cached = resp.content
+            if key:
+                await _cache_set(key, cached)
+        contents.append(cached)
+    return Response(
+        content=await run_in_threadpool(_merge, contents, start, end),
+        media_type="application/json",
+        headers={"X-Cache": "MISS" if len(missing) == len(buckets)
+                 else "PARTIAL" if missing else "HIT"})
@@ -0,0 +1,83 @@
+from math import floor
+import re
+
+duration_units = {
+    "ms": 0.001,
+    "s": 1,
+    "m": 60,
+    "h": 3600,
+    "d": 86400,
+    "w": 604800,
+    "y": 31536000
+}
+duration_pattern = re.compile(r"(\d+)(ms|y|w|d|h|m|s)")
+expr_token_pattern = re.compile(r'"(?:\\.|[^"\\])*"|\'(?:\\.|[^\'\\])*\'|`[^`]*`|\s+|[^"\'`\s]+|.')
+
+
+def parse_duration(duration: str) -> float:
+    """
+    This function converts a Prometheus duration
+    (e.g. 1h30m) or a float number of seconds
+    into seconds.
+    """
+    try:
+        return float(duration)
+    except (TypeError, ValueError):
+        pass
+    parts = duration_pattern.findall(duration or "")
+    if not parts or "".join(f"{v}{u}" for v, u in parts) != duration:
+        raise ValueError(f"Invalid duration '{duration}'")
+    return sum(int(v) * duration_units[u] for v, u in parts)
+
+
+def normalize_expr(expr: str) -> str:
+    """
+    This function normalizes a PromQL expression by
+    collapsing whitespace outside of string literals,
+    so equivalent expressions produce the same key.
+    """
+    tokens = expr_token_pattern.findall(expr.strip())
+    return "".join(" " if t.isspace() else t for t in tokens)
+
+
+def split_range(start: float, end: float, step: float,
+                max_points: int) -> list[tuple[float, float]]:
+    """
+    This function splits the time range of a range query
+    into consecutive step-aligned sub-ranges that contain
+    at most 'max_points' points per time-series each.
+    """
+    if step <= 0 or end < start:
+        return [(start, end)]
+    total_points = floor((end - start) / step) + 1
+    ranges = []
+    for first_point in range(0, total_points, max_points):
+        last_point = min(first_point + max_points, total_points) - 1
+        ranges.append((start + first_point * step, start + last_point * step))
+    return ranges
+
+
+def merge_results(results: list[dict]) -> dict:
+    """
+    This function stitches the responses of sub-queries
+    over consecutive time ranges back together. Samples
+    of the same series are concatenated in the order of
+    the passed results.
+    """
+    series, warnings = dict(), list()
+    result_type = "matrix"
+    for result in results:
+        result_type = result["data"]["resultType"]
+        warnings.extend(w for w in result.get("warnings", []) if w not in warnings)
+        for ts in result["data"]["result"]:
+            key = tuple(sorted(ts["metric"].items()))
+            if key not in series:
+                series[key] = {"metric": ts["metric"], "values": []}
+            series[key]["values"].extend(ts.get("values", []))
+            if "histograms" in ts:
+                series[key].setdefault("histograms", []).extend(ts["histograms"])
+    merged = {"status": "success",
+              "data": {"resultType": result_type, "result": list(series.values())}}
+    if warnings:
+        merged["warnings"] = warnings
+    return merged
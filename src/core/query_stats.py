@@ -0,0 +1,109 @@
+from src.core.promql import tokenize, PromQLError
+from src.utils.arguments import arg_parser
+from src.core.query import parse_duration
+from src.utils import metrics as m
+from src.utils.log import logger
+from hashlib import sha1
+import json
+import gzip
+import zlib
+
+args = arg_parser()
+slow_query_threshold = parse_duration(args.get("proxy.slow_query_threshold"))
+max_fingerprints = args.get("proxy.max_query_fingerprints")
+query_paths = ["/api/v1/query", "/api/v1/query_range"]
+placeholders = {"NUMBER": "?", "STRING": '"?"', "DURATION": "?"}
+word_tokens = ["IDENTIFIER", "NUMBER", "DURATION"]
+closing_tokens = ["RIGHT_PAREN", "RIGHT_BRACE", "RIGHT_BRACKET"]
+max_template_length = 256
+fingerprints = set()
+
+
+def template(expr: str) -> str:
+    """
+    This function returns the query with its numbers,
+    strings and durations replaced with placeholders,
+    so queries differing only by them look the same
+    """
+    try:
+        tokens = tokenize(expr)
+    except PromQLError:
+        return " ".join(expr.split())
+    words, previous = [], None
+    for token in tokens[:-1]:
+        if token.kind in word_tokens and previous in word_tokens + closing_tokens:
+            words.append(" ")
+        words.append(placeholders.get(token.kind, token.value))
+        previous = token.kind
+    return "".join(words)
+
+
+def fingerprint(expr: str) -> tuple[str, str]:
+    """
+    This function returns the fingerprint of the query and
+    its template. Once '--proxy.max-query-fingerprints' are
+    tracked, new fingerprints are accounted as 'other' to
+    keep the cardinality of the metrics bounded
+    """
+    query_template = template(expr)
+    query_fingerprint = sha1(query_template.encode("utf-8")).hexdigest()[:16]
+    if query_fingerprint not in fingerprints:
+        if len(fingerprints) >= max_fingerprints:
+            return "other", query_template
+        fingerprints.add(query_fingerprint)
+        m.proxy_query_fingerprint.labels(
+            fingerprint=query_fingerprint, query=query_template[:max_template_length]).set(1)
+    return query_fingerprint, query_template
+
+
+def _samples(headers: dict, content: bytes) -> dict:
+    """
+    This function returns the samples statistics of
+    the response to a query sent with 'stats=all'
+    """
+    encoding = {k.lower(): v for k, v in headers.items()}.get("content-encoding", "")
+    try:
+        if encoding == "gzip":
+            content = gzip.decompress(content)
+        elif encoding == "deflate":
+            content = zlib.decompress(content)
+        elif encoding:
+            return {}
+        return json.loads(content).get("data", {}).get("stats", {}).get("samples", {})
+    except (ValueError, OSError, zlib.error, AttributeError):
+        return {}
+
+
+def record(path: str, params: dict, status_code: int, headers: dict, content: bytes,
+           duration: float, latency: float, cache: str = None) -> None:
+    """
+    This function accounts the cost of the query under its
+    fingerprint and logs it if it is slower than the
+    '--proxy.slow-query-threshold' flag
+    """
+    if path not in query_paths or not params.get("query"):
+        return
+    query_fingerprint, query_template = fingerprint(params["query"])
+    samples = _samples(headers, content) if "stats" in params else {}
+    m.proxy_query_duration_seconds.labels(fingerprint=query_fingerprint).observe(duration)
+    m.proxy_query_response_bytes.labels(fingerprint=query_fingerprint).inc(len(content))
+    if samples.get("totalQueryableSamples"):
+        m.proxy_query_samples.labels(fingerprint=query_fingerprint).inc(samples["totalQueryableSamples"])
+    if slow_query_threshold and duration >= slow_query_threshold:
+        logger.warning(
+            msg="Slow query",
+            extra={
+                "status": status_code,
+                "request_path": path,
+                "query": params["query"],
+                "fingerprint": query_fingerprint,
+                "start": params.get("start"),
+                "end": params.get("end"),
+                "step": params.get("step"),
+                "time": params.get("time"),
+                "duration": round(duration, 3),
+                "upstream_latency": round(latency, 3),
+                "response_bytes": len(content),
+                "samples": samples.get("totalQueryableSamples"),
+                "peak_samples": samples.get("peakSamples"),
+                "cache": cache})
@@ -0,0 +1,45 @@
+from typing import Callable
+from threading import Lock, Event
+import time
+
+
+class _Batch:
+    def __init__(self):
+        self.done = Event()
+        self.result = None
+
+
+class ReloadCoalescer:
+    """
+    Merges the Prometheus reloads requested within the same
+    window into one. The first caller of a batch waits for
+    the window to pass and reloads Prometheus, the callers
+    joining the batch in the meantime wait for and share
+    its result. Reloads never run concurrently.
+    """
+
+    def __init__(self, reload: Callable[[], tuple], window: float):
+        self._reload = reload
+        self.window = window
+        self.lock, self.reload_lock = Lock(), Lock()
+        self.batch = None
+
+    def reload(self) -> tuple:
+        with self.lock:
+            batch, leader = self.batch, self.batch is None
+            if leader:
+                batch = self.batch = _Batch()
+        if not leader:
+            batch.done.wait()
+            return batch.result
+        try:
+            time.sleep(self.window)
+            with self.lock:
+                self.batch = None
+            with self.reload_lock:
+                batch.result = self._reload()
+        except BaseException as e:
+            batch.result = 500, "error", str(e)
+        finally:
+            batch.done.set()
+        return batch.result
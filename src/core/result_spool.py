@@ -0,0 +1,164 @@
+from typing import BinaryIO, Iterable, Iterator
+from collections.abc import Mapping, Sequence
+from tempfile import SpooledTemporaryFile
+from src.core.query import merge_results
+from threading import Lock
+import codecs
+import json
+import re
+
+# spools larger than this are written to disk instead of being kept in memory
+max_memory_size = 8 * 1024 * 1024
+result_pattern = re.compile(r'"resultType"\s*:\s*"(\w+)"\s*,\s*"result"\s*:\s*\[')
+decoder = json.JSONDecoder()
+
+
+class Spool:
+    """
+    A temporary file holding the series of one query
+    response, one JSON document per line. Small spools
+    stay in memory, larger ones are rolled over to disk.
+    """
+
+    def __init__(self):
+        self.file: BinaryIO = SpooledTemporaryFile(max_size=max_memory_size)
+        self.lock = Lock()
+
+    def write(self, series: str) -> int:
+        offset = self.file.tell()
+        self.file.write(series.replace("\n", " ").encode("utf-8") + b"\n")
+        return offset
+
+    def read(self, offset: int) -> dict:
+        with self.lock:
+            self.file.seek(offset)
+            return json.loads(self.file.readline())
+
+
+class SpooledSeries(Mapping):
+    """
+    A time series of a spooled query result. Its labels
+    are kept in memory, its samples are read from the
+    spools every time they are accessed, so only one
+    series is held in memory while rows are generated.
+    Samples of consecutive sub-queries are concatenated.
+    """
+
+    def __init__(self, metric: dict, fields: list):
+        self.metric, self.fields, self.parts = metric, fields, []
+
+    def __getitem__(self, key: str):
+        if key == "metric":
+            return self.metric
+        if key not in self.fields:
+            raise KeyError(key)
+        parts = [spool.read(offset).get(key) for spool, offset in self.parts]
+        parts = [part for part in parts if part is not None]
+        if parts and isinstance(parts[0], list):
+            return [sample for part in parts for sample in part]
+        return parts[0] if parts else None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(["metric"] + self.fields)
+
+    def __len__(self) -> int:
+        return len(self.fields) + 1
+
+
+class SpooledResult(Sequence):
+    """The series of a spooled query result in their original order"""
+
+    def __init__(self, series: list[SpooledSeries]):
+        self.series = series
+
+    def __getitem__(self, idx):
+        return self.series[idx]
+
+    def __len__(self) -> int:
+        return len(self.series)
+
+
+def spool_response(chunks: Iterable[bytes]) -> dict:
+    """
+    This function decodes the body of a Prometheus query
+    response while it is downloaded and writes its series
+    one by one to a spool, so the response is never parsed
+    as a whole. It returns the response with the series in
+    'data.result' read back from the spool on access. Scalar
+    and string results are decoded the usual way.
+    """
+    chunks, utf8 = iter(chunks), codecs.getincrementaldecoder("utf-8")()
+    text, pos = "", 0
+
+    def fill() -> bool:
+        nonlocal text, pos
+        chunk = next(chunks, None)
+        if chunk is None:
+            text, pos = text[pos:] + utf8.decode(b"", final=True), 0
+            return False
+        text, pos = text[pos:] + utf8.decode(chunk), 0
+        return True
+
+    match = result_pattern.search(text)
+    while not match:
+        if not fill():
+            return json.loads(text)
+        match = result_pattern.search(text)
+    if match.group(1) not in ["vector", "matrix"]:
+        while fill():
+            pass
+        return json.loads(text)
+    head, pos = text[:match.end()], match.end()
+    spool, series = Spool(), dict()
+    while True:
+        while pos < len(text) and text[pos] in " \t\r\n,":
+            pos += 1
+        if pos >= len(text):
+            if not fill():
+                raise ValueError("Unexpected end of the response")
+            continue
+        if text[pos] == "]":
+            break
+        try:
+            ts, end = decoder.raw_decode(text, pos)
+        except json.JSONDecodeError:
+            # the series is not downloaded completely yet
+            if not fill():
+                raise
+            continue
+        key = tuple(sorted(ts["metric"].items()))
+        if key not in series:
+            series[key] = SpooledSeries(ts["metric"], [k for k in ts if k != "metric"])
+        series[key].parts.append((spool, spool.write(text[pos:end])))
+        pos = end
+    while fill():
+        pass
+    response = json.loads(head + text)
+    response["data"]["result"] = SpooledResult(list(series.values()))
+    return response
+
+
+def merge_spooled(results: list[dict]) -> dict:
+    """
+    This function stitches spooled responses to sub-queries
+    over consecutive time ranges back together, the same way
+    'merge_results' in src/core/query.py does for decoded ones
+    """
+    if not all(isinstance(result["data"]["result"], SpooledResult) for result in results):
+        return merge_results(results)
+    series, warnings = dict(), list()
+    result_type = "matrix"
+    for result in results:
+        result_type = result["data"]["resultType"]
+        warnings.extend(w for w in result.get("warnings", []) if w not in warnings)
+        for ts in result["data"]["result"]:
+            key = tuple(sorted(ts["metric"].items()))
+            if key not in series:
+                series[key] = SpooledSeries(ts["metric"], list(ts.fields))
+            series[key].fields.extend(k for k in ts.fields if k not in series[key].fields)
+            series[key].parts.extend(ts.parts)
+    merged = {"status": "success",
+              "data": {"resultType": result_type, "result": SpooledResult(list(series.values()))}}
+    if warnings:
+        merged["warnings"] = warnings
+    return merged
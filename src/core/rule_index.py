@@ -0,0 +1,238 @@
+from src.utils.arguments import arg_parser
+from src.core.promql import parse, Node, PromQLError
+from src.utils.log import logger
+from threading import Lock
+from hashlib import sha256
+import yaml
+import os
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:
+    Observer, FileSystemEventHandler = None, object
+
+args = arg_parser()
+rule_extensions = [".yml", ".yaml"]
+
+
+def metrics(node: Node) -> set[str]:
+    """Returns the metric names selected by the expression"""
+    names = {node.name} if node.kind == "vector_selector" and node.name else set()
+    for arg in node.args:
+        names.update(metrics(arg))
+    return names
+
+
+def _rules(file: str, digest: str, data: object) -> list[dict]:
+    """
+    This function flattens the groups of the rule file
+    into the entries of the catalogue, one per rule
+    """
+    entries = []
+    groups = data.get("groups") if isinstance(data, dict) else None
+    for group in groups if isinstance(groups, list) else []:
+        if not isinstance(group, dict):
+            continue
+        rules = group.get("rules")
+        for rule in rules if isinstance(rules, list) else []:
+            if not isinstance(rule, dict):
+                continue
+            kind = "alert" if "alert" in rule else "record"
+            expr = str(rule.get("expr", ""))
+            try:
+                node, errors = parse(expr)
+            except PromQLError:
+                # rules with invalid expressions are still indexed, without their metrics
+                node, errors = None, True
+            labels, annotations = rule.get("labels"), rule.get("annotations")
+            entry = {
+                "file": file,
+                "hash": digest,
+                "group": group.get("name"),
+                "type": "alerting" if kind == "alert" else "recording",
+                "name": rule.get(kind),
+                "expr": expr,
+                "labels": labels if isinstance(labels, dict) else {},
+                "metrics": sorted(metrics(node)) if node and not errors else []
+            }
+            if kind == "alert":
+                entry.update({"for": rule.get("for", "0s"),
+                              "annotations": annotations if isinstance(annotations, dict) else {}})
+            entries.append(entry)
+    return entries
+
+
+class _EventHandler(FileSystemEventHandler):
+    def __init__(self, index: "RuleIndex"):
+        super().__init__()
+        self.index = index
+
+    def on_any_event(self, event) -> None:
+        if event.is_directory:
+            return
+        for path in [event.src_path, getattr(event, "dest_path", None)]:
+            if path and os.path.dirname(os.path.abspath(path)) == self.index.abs_path:
+                self.index.refresh(os.path.basename(path))
+
+
+class RuleIndex:
+    """
+    Keeps an in-memory catalogue of the rule files in the
+    rules directory: their hashes, groups and rules with the
+    metrics their expressions select. The catalogue follows
+    the filesystem events of the directory when the watchdog
+    package is installed and is rescanned periodically, so
+    rules can be looked up without asking Prometheus.
+    """
+
+    def __init__(self, path: str, extensions: list[str]):
+        self.path, self.abs_path = path, os.path.abspath(path)
+        self.extensions = extensions
+        self.lock = Lock()
+        self.files, self.by_metric, self.by_label = dict(), dict(), dict()
+        self.observer = None
+        self.scanned = False
+
+    def indexed(self, file: str) -> bool:
+        """Returns whether the file is a rule file the catalogue holds"""
+        return bool(file) and os.sep not in file and not file.startswith(".") \
+            and any(file.endswith(ext) for ext in self.extensions)
+
+    def _unlink(self, file: str) -> None:
+        for entry in self.files.pop(file, {}).get("rules", []):
+            keys = [(self.by_metric, metric) for metric in entry["metrics"]]
+            keys += [(self.by_label, f"{k}={v}") for k, v in entry["labels"].items()]
+            for index, key in keys:
+                index.get(key, set()).discard(file)
+                if not index.get(key, True):
+                    del index[key]
+
+    def refresh(self, file: str) -> None:
+        """
+        This function brings the entry of the file up to date.
+        Unchanged files are detected by their modification
+        time, size and hash and are not parsed again
+        """
+        if not self.indexed(file):
+            return
+        try:
+            stat = os.stat(f"{self.path}/{file}")
+            signature = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+            with self.lock:
+                if self.files.get(file, {}).get("signature") == signature:
+                    return
+            with open(f"{self.path}/{file}", "rb") as f:
+                content = f.read()
+        except OSError:
+            with self.lock:
+                self._unlink(file)
+            return
+        digest = sha256(content).hexdigest()
+        with self.lock:
+            if self.files.get(file, {}).get("hash") == digest:
+                self.files[file]["signature"] = signature
+                return
+        entry = {"file": file, "hash": digest, "size": stat.st_size,
+                 "modified": stat.st_mtime, "signature": signature, "rules": [], "error": None}
+        try:
+            entry["rules"] = _rules(file, digest, yaml.safe_load(content))
+        except yaml.YAMLError as e:
+            entry["error"] = str(e)
+        with self.lock:
+            self._unlink(file)
+            self.files[file] = entry
+            for rule in entry["rules"]:
+                for metric in rule["metrics"]:
+                    self.by_metric.setdefault(metric, set()).add(file)
+                for k, v in rule["labels"].items():
+                    self.by_label.setdefault(f"{k}={v}", set()).add(file)
+
+    def scan(self) -> None:
+        """
+        This function rescans the rules directory, indexes new
+        and changed files and drops the removed ones
+        """
+        try:
+            files = [f.name for f in os.scandir(self.path) if f.is_file() and self.indexed(f.name)]
+        except OSError as e:
+            logger.error(f"Failed to scan the rules directory {self.path}. {e}")
+            return
+        with self.lock:
+            removed = set(self.files) - set(files)
+        for file in files + sorted(removed):
+            self.refresh(file)
+        self.scanned = True
+
+    def start(self) -> None:
+        """
+        This function indexes the rules directory and starts
+        following its filesystem events if watchdog is installed
+        """
+        self.scan()
+        if Observer is None or self.observer is not None:
+            return
+        try:
+            self.observer = Observer()
+            self.observer.schedule(_EventHandler(self), self.abs_path, recursive=False)
+            self.observer.daemon = True
+            self.observer.start()
+        except OSError as e:
+            self.observer = None
+            logger.warning(f"Failed to watch the rules directory {self.path}, "
+                           f"it is rescanned periodically instead. {e}")
+
+    def exists(self, file: str, verify: bool = False) -> bool:
+        """
+        This function checks whether the rule file exists.
+        Files missing from the catalogue are checked on disk,
+        so files created since the last event or scan are found.
+        With 'verify', files the catalogue holds are checked on
+        disk too, before they are replaced or deleted
+        """
+        if not self.indexed(file):
+            return os.path.exists(f"{self.path}/{file}")
+        if verify:
+            self.refresh(file)
+        with self.lock:
+            if file in self.files:
+                return True
+        self.refresh(file)
+        with self.lock:
+            return file in self.files
+
+    def search(self, name: str = None, kind: str = None, group: str = None, files: list[str] = None,
+               metric: str = None, labels: list[str] = None, limit: int = 0) -> list[dict]:
+        """
+        This function returns the rules matching all the passed
+        filters. Metrics and labels are looked up in the inverted
+        indexes, names are matched case-insensitively by substring
+        """
+        if not self.scanned:
+            self.scan()
+        with self.lock:
+            candidates = set(self.files) if not files else set(files) & set(self.files)
+            if metric:
+                candidates &= self.by_metric.get(metric, set())
+            for label in labels or []:
+                candidates &= self.by_label.get(label, set())
+            rules = [rule for file in sorted(candidates) for rule in self.files[file]["rules"]]
+        name = name.lower() if name else None
+        results = []
+        for rule in rules:
+            if name and name not in str(rule["name"]).lower():
+                continue
+            if kind and rule["type"] != kind or group and rule["group"] != group:
+                continue
+            if metric and metric not in rule["metrics"]:
+                continue
+            if not all(label in [f"{k}={v}" for k, v in rule["labels"].items()] for label in labels or []):
+                continue
+            results.append(rule)
+            if limit and len(results) >= limit:
+                break
+        return results
+
+
+index = RuleIndex(args.get("rule.path"),
+                  sorted(set(rule_extensions + [args.get("file.extension") or ".yml"])))
@@ -0,0 +1,188 @@
+from src.utils.validations import schema_validator
+from src.core.promql import check, parse
+from jsonschema import exceptions
+import re
+
+metric_name_pattern = re.compile(r"^[a-zA-Z_:][a-zA-Z0-9_:]*$")
+duration_pattern = re.compile(
+    r"^(([0-9]+)y)?(([0-9]+)w)?(([0-9]+)d)?(([0-9]+)h)?(([0-9]+)m)?(([0-9]+)s)?(([0-9]+)ms)?$")
+duration_fields = ["for", "keep_firing_for", "interval"]
+template_token_pattern = re.compile(
+    r'(?P<STRING>"(?:\\.|[^"\\])*"|`[^`]*`|\'(?:\\.|[^\'\\])*\')|(?P<VARIABLE>\$\w*)|'
+    r'(?P<FIELD>\.[\w.]*)|(?P<WORD>[a-zA-Z_]\w*)|(?P<NUMBER>[-+]?\d[\w.+-]*)|'
+    r'(?P<DECLARE>:=)|(?P<ASSIGN>=)|(?P<OTHER>[|(),])|(?P<SPACE>\s+)')
+# Go text/template built-in functions and the functions Prometheus adds to alert templates
+template_functions = [
+    "and", "call", "html", "index", "slice", "js", "len", "not", "or", "print", "printf", "println",
+    "urlquery", "eq", "ge", "gt", "le", "lt", "ne", "args", "externalURL", "first", "graphLink", "humanize",
+    "humanize1024", "humanizeDuration", "humanizePercentage", "humanizeTimestamp", "label", "match",
+    "now", "parseDuration", "pathPrefix", "query", "reReplaceAll", "safeHtml", "sortByLabel", "stripDomain",
+    "stripPort", "strvalue", "tableLink", "title", "toDuration", "toLower", "toTime", "toUpper", "value"
+]
+template_keywords = ["if", "else", "end", "range", "with", "define", "template", "block", "break",
+                     "continue", "nil", "true", "false"]
+template_blocks = ["if", "range", "with", "define", "block"]
+template_variables = ["$", "$labels", "$value", "$externalLabels", "$externalURL"]
+
+
+def _actions(text: str) -> list[tuple[str, int]]:
+    """
+    This function splits the template into its actions,
+    the text between '{{' and '}}', and their positions
+    """
+    actions, pos = [], 0
+    while True:
+        start = text.find("{{", pos)
+        if start == -1:
+            return actions
+        i, quote = start + 2, None
+        while i < len(text) and (quote or not text.startswith("}}", i)):
+            if quote and text[i] == "\\" and quote != "`":
+                i += 1
+            elif quote and text[i] == quote:
+                quote = None
+            elif not quote and text[i] in "\"'`":
+                quote = text[i]
+            i += 1
+        if i >= len(text):
+            raise ValueError(f"unclosed action at position {start}")
+        action = text[start + 2:i]
+        action = action[2:] if action.startswith("- ") else action
+        action = action[:-2] if action.endswith(" -") else action
+        actions.append((action, start))
+        pos = i + 2
+
+
+def check_template(text: str) -> list[str]:
+    """
+    This function checks the label or annotation template
+    the way Prometheus parses it: actions must be closed,
+    blocks must be ended, functions must exist and variables
+    must be defined before they are used
+    """
+    try:
+        actions = _actions(text)
+    except ValueError as e:
+        return [str(e)]
+    errors, blocks, variables = [], [], set(template_variables)
+    for action, pos in actions:
+        if action.strip().startswith("/*"):
+            continue
+        tokens, i = [], 0
+        while i < len(action):
+            match = template_token_pattern.match(action, i)
+            if not match:
+                errors.append(f"unexpected '{action[i]}' in action at position {pos}")
+                break
+            if match.lastgroup != "SPACE":
+                tokens.append((match.lastgroup, match.group()))
+            i = match.end()
+        if not tokens:
+            errors.append(f"missing value for command at position {pos}")
+            continue
+        kind, first = tokens[0]
+        if kind == "WORD" and first in template_blocks:
+            blocks.append(first)
+        elif kind == "WORD" and first == "end":
+            if not blocks:
+                errors.append(f"unexpected {{{{end}}}} at position {pos}")
+            else:
+                blocks.pop()
+        elif kind == "WORD" and first == "else" and not blocks:
+            errors.append(f"unexpected {{{{else}}}} at position {pos}")
+        declared = [value for i, (kind, value) in enumerate(tokens)
+                    if kind == "VARIABLE" and any(k == "DECLARE" for k, _ in tokens[i + 1:])]
+        for kind, value in tokens:
+            if kind == "VARIABLE" and value not in variables and value not in declared:
+                errors.append(f"undefined variable \"{value}\" at position {pos}")
+            elif kind == "WORD" and value not in template_functions + template_keywords:
+                errors.append(f"function \"{value}\" not defined at position {pos}")
+        variables.update(declared)
+    if blocks:
+        errors.append(f"unexpected EOF, {{{{{blocks[-1]}}}}} is not ended with {{{{end}}}}")
+    return errors
+
+
+def _valid_duration(value: object) -> bool:
+    if not isinstance(value, str):
+        return True
+    return value == "0" or bool(value and duration_pattern.match(value))
+
+
+def _name(items: object, index: list, *keys: str) -> object:
+    """Returns the name of the group or rule at the index"""
+    if not index or not isinstance(items, list) or not isinstance(items[index[0]], dict):
+        return index[0] if index else None
+    return next((items[index[0]][k] for k in keys if items[index[0]].get(k)), index[0])
+
+
+def _error(errors: list, group: object, rule: object, field: str, message: str) -> None:
+    errors.append({"group": group, "rule": rule, "field": field, "message": message})
+
+
+def _lint_rule(errors: list, group: object, rule: dict) -> None:
+    name = rule.get("record") or rule.get("alert")
+    if "record" in rule and not metric_name_pattern.match(str(rule["record"])):
+        _error(errors, group, name, "record", f"invalid recording rule name: {rule['record']}")
+    if "alert" in rule and not str(rule["alert"]).strip():
+        _error(errors, group, name, "alert", "alerting rule name must not be empty")
+    if isinstance(rule.get("expr"), str):
+        expr_errors = check(rule["expr"])
+        for e in expr_errors:
+            _error(errors, group, name, "expr", str(e))
+        if not expr_errors:
+            node, _ = parse(rule["expr"])
+            if node.type not in ["instant vector", "scalar"]:
+                _error(errors, group, name, "expr",
+                       f"expression must evaluate to an instant vector or a scalar, got {node.type}")
+    for field in duration_fields[:2]:
+        if not _valid_duration(rule.get(field)):
+            _error(errors, group, name, field, f"invalid duration \"{rule[field]}\"")
+    if "record" in rule and "__name__" in (rule.get("labels") or {}):
+        _error(errors, group, name, "labels.__name__", "invalid recording rule label name: __name__")
+    if "alert" in rule:
+        for field in ["labels", "annotations"]:
+            for key, value in (rule.get(field) or {}).items():
+                for message in check_template(value) if isinstance(value, str) else []:
+                    _error(errors, group, name, f"{field}.{key}", f"invalid template: {message}")
+
+
+def lint(data: dict) -> list[dict]:
+    """
+    This function checks the rule file content against the
+    rules schema, then checks each group and rule: PromQL
+    expressions, durations, names and alert templates. All
+    errors are returned at once, each with the group, the
+    rule and the field it was found in.
+    """
+    errors = []
+    groups = (data or {}).get("groups") if isinstance(data, dict) else None
+    schema_errors = schema_validator("rules.json").iter_errors(data)
+    for e in sorted(schema_errors, key=lambda e: [(isinstance(p, str), p) for p in e.absolute_path]):
+        if e.validator == "oneOf" and isinstance(e.instance, dict):
+            # report the errors of the recording or alerting rule schema the rule was meant for
+            branch = 0 if "record" in e.instance else 1
+            e = exceptions.best_match([c for c in e.context if c.relative_schema_path[0] == branch]) or e
+        e = exceptions.best_match([e])
+        path = list(e.absolute_path)
+        if e.validator == "pattern" and path and path[-1] in duration_fields:
+            continue
+        group = _name(groups, path[1:2], "name")
+        rules = groups[path[1]].get("rules") if len(path) > 1 and isinstance(groups[path[1]], dict) else None
+        rule = _name(rules, path[3:4], "record", "alert")
+        field = ".".join(str(p) for p in (path[4:] if len(path) > 3 else path[2:]))
+        _error(errors, group, rule, field or None, e.message)
+    names = set()
+    for i, group in enumerate(groups if isinstance(groups, list) else []):
+        if not isinstance(group, dict):
+            continue
+        name = group.get("name", i)
+        if name in names:
+            _error(errors, name, None, "name", f"groupname: \"{name}\" is repeated in the same file")
+        names.add(name)
+        if not _valid_duration(group.get("interval")):
+            _error(errors, name, None, "interval", f"invalid duration \"{group['interval']}\"")
+        for rule in group.get("rules") or []:
+            if isinstance(rule, dict):
+                _lint_rule(errors, name, rule)
+    return errors
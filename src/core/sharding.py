@@ -0,0 +1,196 @@
+from src.core.promql import tokenize, selectors, matching_paren, PromQLError
+from starlette.concurrency import run_in_threadpool
+from src.core.promql import aggregation_operators
+from src.utils.arguments import arg_parser
+from src.core import metadata_cache as mc
+from src.utils import upstream
+from decimal import Decimal
+from zlib import crc32
+from time import time
+import asyncio
+import httpx
+import json
+import math
+
+args = arg_parser()
+shards = args.get("proxy.query_shards")
+shard_label = args.get("proxy.shard_label")
+query_paths = ["/api/v1/query", "/api/v1/query_range"]
+shardable_aggregations = {
+    "sum": lambda a, b: a + b,
+    "count": lambda a, b: a + b,
+    "min": min,
+    "max": max,
+    "group": lambda a, b: 1.0
+}
+unshardable_functions = ["absent", "absent_over_time", "scalar", "vector", "sort", "sort_desc",
+                         "sort_by_label", "sort_by_label_desc", "time", "timestamp"]
+regex_special = set("\\.+*?()|[]{}^$")
+excluded_headers = ["host", "content-length", "content-type", "accept-encoding", "connection"]
+
+
+def enabled() -> bool:
+    return shards > 1
+
+
+def _grouping(tokens: list, i: int) -> int:
+    """Skips the optional 'by (...)' or 'without (...)' clause"""
+    if tokens[i].value.lower() in ["by", "without"] and tokens[i + 1].kind == "LEFT_PAREN":
+        return matching_paren(tokens, i + 1) + 1
+    return i
+
+
+def plan(expr: str) -> tuple[str, list]:
+    """
+    This function checks whether the expression is a sum, count,
+    min, max or group aggregation of an inner expression with a
+    single vector selector, evaluated series by series. Returns
+    the aggregation and the tokens of the expression, or None
+    if the expression cannot be sharded.
+    """
+    try:
+        tokens = tokenize(expr)
+        aggregation = tokens[0].value.lower()
+        if tokens[0].kind != "IDENTIFIER" or aggregation not in shardable_aggregations:
+            return None
+        start = _grouping(tokens, 1)
+        if tokens[start].kind != "LEFT_PAREN":
+            return None
+        end = matching_paren(tokens, start)
+        if tokens[_grouping(tokens, end + 1)].kind != "EOF":
+            return None
+        inner = tokens[start + 1:end] + [tokens[-1]]
+        if len(selectors(inner)) != 1:
+            return None
+    except (PromQLError, IndexError):
+        return None
+    for i, token in enumerate(inner[:-1]):
+        if token.kind == "IDENTIFIER" and inner[i + 1].kind == "LEFT_PAREN" and \
+                token.value.lower() in aggregation_operators + unshardable_functions:
+            return None
+        if token.kind == "IDENTIFIER" and token.value.lower() in aggregation_operators and \
+                inner[i + 1].value.lower() in ["by", "without"]:
+            return None
+    return aggregation, tokens
+
+
+def _regex(values: list[str]) -> str:
+    """
+    This function builds a PromQL string with a regular
+    expression matching any of the label values
+    """
+    escaped = "|".join("".join(f"\\{c}" if c in regex_special else c for c in v) for v in values)
+    return json.dumps(escaped)
+
+
+def shard_queries(expr: str, tokens: list, values: list[str]) -> list[str]:
+    """
+    This function rewrites the expression into one query per
+    shard by adding a matcher on the shard label to its vector
+    selector. Label values are assigned to shards by hash, the
+    first shard also takes the series with unknown values or
+    without the label. Returns a single query if all values
+    fall into the first shard.
+    """
+    groups = [[] for _ in range(shards)]
+    for value in values:
+        groups[crc32(value.encode()) % shards].append(value)
+    if not any(groups[1:]):
+        return [expr]
+    matchers = [f'{shard_label}!~{_regex([v for g in groups[1:] for v in g])}'] + \
+               [f'{shard_label}=~{_regex(g)}' for g in groups[1:] if g]
+    _, last = selectors(tokens)[0]
+    queries = []
+    for matcher in matchers:
+        if tokens[last].kind == "RIGHT_BRACE":
+            pos = tokens[last].pos
+            separator = "" if tokens[last - 1].kind == "LEFT_BRACE" else ","
+            queries.append(f"{expr[:pos]}{separator}{matcher}{expr[pos:]}")
+        else:
+            pos = tokens[last].pos + len(tokens[last].value)
+            queries.append(f"{expr[:pos]}{{{matcher}}}{expr[pos:]}")
+    return queries
+
+
+def format_value(value: float) -> str:
+    """
+    This function formats the sample value
+    the same way as Prometheus does
+    """
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return format(Decimal(repr(value)).normalize(), "f")
+
+
+def merge_partials(aggregation: str, results: list[dict]) -> dict:
+    """
+    This function merges the partial aggregates returned
+    by the shards into the result of the whole query
+    """
+    combine = shardable_aggregations[aggregation]
+    series, warnings = dict(), list()
+    result_type = results[0]["data"]["resultType"]
+    for result in results:
+        warnings.extend(w for w in result.get("warnings", []) if w not in warnings)
+        for ts in result["data"]["result"]:
+            key = tuple(sorted(ts["metric"].items()))
+            samples = series.setdefault(key, (ts["metric"], dict()))[1]
+            for t, v in ts["values"] if result_type == "matrix" else [ts["value"]]:
+                samples[t] = combine(samples[t], float(v)) if t in samples else float(v)
+    merged = []
+    for key in sorted(series):
+        metric, samples = series[key]
+        values = [[t, format_value(samples[t])] for t in sorted(samples)]
+        merged.append({"metric": metric, "values": values} if result_type == "matrix"
+                      else {"metric": metric, "value": values[0]})
+    response = {"status": "success", "data": {"resultType": result_type, "result": merged}}
+    if warnings:
+        response["warnings"] = warnings
+    return response
+
+
+def _merge(aggregation: str, contents: list[bytes]) -> bytes:
+    """
+    This function decodes the responses of the shards and
+    merges them. It is CPU-bound and runs in the thread pool.
+    Returns None if the shards returned native histograms,
+    which cannot be merged.
+    """
+    results = [json.loads(content) for content in contents]
+    if any("histogram" in ts or "histograms" in ts for r in results for ts in r["data"]["result"]):
+        return None
+    return json.dumps(merge_partials(aggregation, results)).encode("utf-8")
+
+
+async def query(client: httpx.AsyncClient, path: str, params: dict, headers: dict) -> httpx.Response:
+    """
+    This function runs a shardable aggregation as concurrent
+    sub-queries, one per shard, and merges their results.
+    Other queries are sent to Prometheus as they are.
+    """
+    headers = {k: v for k, v in headers.items() if k.lower() not in excluded_headers}
+    expr_plan = plan(params.get("query", "")) if enabled() and "stats" not in params else None
+    queries = [params.get("query")]
+    if expr_plan:
+        values_status, _, _, values = await mc.label_values(
+            client, shard_label, headers.get("authorization"))
+        if values_status:
+            queries = shard_queries(params["query"], expr_plan[1], values)
+    if len(queries) < 2:
+        return await client.post(path, data=params, headers=headers, timeout=upstream.timeout(path))
+    if path == "/api/v1/query" and not params.get("time"):
+        params = {**params, "time": time()}
+
+    responses = await asyncio.gather(*[
+        client.post(path, data={**params, "query": q}, headers=headers, timeout=upstream.timeout(path))
+        for q in queries])
+    for resp in responses:
+        if resp.status_code != 200:
+            return resp
+    content = await run_in_threadpool(_merge, expr_plan[0], [resp.content for resp in responses])
+    if content is None:
+        return await client.post(path, data=params, headers=headers, timeout=upstream.timeout(path))
+    return httpx.Response(200, content=content, headers={
+        "content-type": "application/json", "X-Query-Shards": str(len(responses))})
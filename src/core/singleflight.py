@@ -0,0 +1,97 @@
+from src.utils.arguments import arg_parser
+from src.core.query import normalize_expr
+from typing import Awaitable, Callable
+from urllib.parse import parse_qsl
+from fastapi import Request
+import asyncio
+import json
+import re
+
+read_paths = re.compile(
+    r"^/api/v1/(query|query_range|query_exemplars|series|labels|label/[^/]+/values|metadata|"
+    r"targets|targets/metadata|rules|alerts|alertmanagers|status/[a-z]+|format_query)$")
+form_read_paths = ["/api/v1/query", "/api/v1/query_range", "/api/v1/query_exemplars",
+                   "/api/v1/series", "/api/v1/labels", "/api/v1/format_query"]
+args = arg_parser()
+# responses differ per tenant on multi-tenant backends such as Cortex, Mimir and Thanos
+key_headers = ["accept-encoding", "authorization", "x-scope-orgid"]
+if args.get("proxy.tenant_header") and args.get("proxy.tenant_header").lower() not in key_headers:
+    key_headers.append(args.get("proxy.tenant_header").lower())
+
+
+def coalescable(request: Request) -> bool:
+    """
+    This function checks whether the request only reads
+    data, so identical requests may share one response
+    """
+    if request.method == "GET":
+        return bool(read_paths.match(request.url.path))
+    return request.method == "POST" and request.url.path in form_read_paths
+
+
+def request_params(request: Request, body: bytes) -> list[tuple[str, str]]:
+    """
+    This function returns the sorted parameters of the
+    request from both the URL and the form-encoded body,
+    with the PromQL query normalized
+    """
+    params = request.query_params.multi_items()
+    if request.method == "POST" and request.headers.get(
+            "content-type", "").startswith("application/x-www-form-urlencoded"):
+        params += parse_qsl(body.decode("utf-8"))
+    elif body:
+        params.append(("", body.decode("utf-8", "replace")))
+    return sorted((k, normalize_expr(v) if k == "query" else v) for k, v in params)
+
+
+def request_key(request: Request, body: bytes) -> str:
+    """
+    This function builds the key of the request from its
+    method, path, normalized parameters and the headers
+    affecting the response
+    """
+    return json.dumps([
+        request.method, request.url.path, request_params(request, body),
+        [request.headers.get(h) for h in key_headers]])
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent calls with the same key. The
+    first caller runs the call, the callers arriving while
+    it is in flight wait for and share its result. If the
+    first caller is cancelled, a waiting caller takes over.
+    """
+
+    def __init__(self):
+        self.calls = dict()
+
+    async def do(self, key: str, fn: Callable[[], Awaitable]) -> tuple[bool, object]:
+        """
+        Returns whether the result was shared with
+        another call, and the result itself
+        """
+        while key in self.calls:
+            outcome = await asyncio.shield(self.calls[key])
+            if outcome is None:
+                # the call was cancelled, the first waiter runs it again
+                continue
+            result, error = outcome
+            if error:
+                raise error
+            return True, result
+        future = asyncio.get_running_loop().create_future()
+        self.calls[key] = future
+        try:
+            result = await fn()
+        except Exception as e:
+            future.set_result((None, e))
+            raise
+        except BaseException:
+            future.set_result(None)
+            raise
+        else:
+            future.set_result((result, None))
+        finally:
+            del self.calls[key]
+        return False, result
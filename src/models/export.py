@@ -9,6 +9,8 @@ class ExportData(BaseModel, extra=Extra.allow):
     step: Optional[str] = "auto"
     timestamp_format: Optional[str] = "unix"
     replace_fields: Optional[dict] = dict()
+    layout: Optional[str] = "long"
+    column_labels: Optional[list] = list()
     _request_body_examples = {
         "User logins per hour in a day": {
             "description": "Count of successful logins by users per hour in a day",
@@ -43,5 +45,57 @@ class ExportData(BaseModel, extra=Extra.allow):
                     "timestamp": "Time"
                 }
             }
+        },
+        "User logins per hour in a day with one column per instance": {
+            "description": "Count of successful user logins per hour in a day in a wide layout "
+                         "with one row per timestamp and one column per instance",
+            "value": {
+                "expr": "users_login_count{status='success'}",
+                "start": "2024-01-30T00:00:00Z",
+                "end": "2024-01-31T23:59:59Z",
+                "step": "1h",
+                "layout": "wide",
+                "column_labels": ["instance"]
+            }
+        }
+    }
+
+
+class ExportQuery(BaseModel):
+    name: str
+    expr: str
+
+
+class ExportBundle(BaseModel, extra=Extra.allow):
+    queries: list[ExportQuery]
+    start: str = Field(regex=r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(|.\d{3})Z")
+    end: str = Field(regex=r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(|.\d{3})Z")
+    step: Optional[str] = "auto"
+    timestamp_format: Optional[str] = "unix"
+    replace_fields: Optional[dict] = dict()
+    layout: Optional[str] = "long"
+    column_labels: Optional[list] = list()
+    _request_body_examples = {
+        "Monthly capacity report": {
+            "description": "CPU, memory and disk usage per instance over a month, one file per query",
+            "value": {
+                "queries": [
+                    {
+                        "name": "cpu",
+                        "expr": "sum by (instance) (rate(node_cpu_seconds_total{mode!='idle'}[5m]))"
+                    },
+                    {
+                        "name": "memory",
+                        "expr": "node_memory_MemTotal_bytes - node_memory_MemAvailable_bytes"
+                    },
+                    {
+                        "name": "disk",
+                        "expr": "node_filesystem_size_bytes - node_filesystem_avail_bytes"
+                    }
+                ],
+                "start": "2024-01-01T00:00:00Z",
+                "end": "2024-01-31T23:59:59Z",
+                "step": "1h"
+            }
         }
     }
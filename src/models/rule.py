@@ -1,9 +1,10 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import Optional
 
 
 class Rule(BaseModel):
-    file: Optional[str] = str()
+    # plain file names inside the rules directory only
+    file: Optional[str] = Field(default=str(), regex=r"^(?!\.)(?!.*\.\.)[^/\\]*$")
     data: Optional[dict] = dict()
     _request_body_examples = {
         "Prometheus Recording Rule": {
@@ -51,3 +52,104 @@ class Rule(BaseModel):
             }
         }
     }
+
+
+class RuleBulk(BaseModel):
+    rules: list[Rule]
+    recreate: Optional[bool] = False
+    _request_body_examples = {
+        "Prometheus Recording Rules": {
+            "description": "Creates two Prometheus recording rule files with a single reload",
+            "value": {
+                "rules": [
+                    {
+                        "file": "http-requests.yml",
+                        "data": {
+                            "groups": [
+                                {
+                                    "name": "HttpRequests",
+                                    "rules": [
+                                        {
+                                            "record": "code:prometheus_http_requests_total:sum",
+                                            "expr": "sum by (code) (prometheus_http_requests_total)"
+                                        }
+                                    ]
+                                }
+                            ]
+                        }
+                    },
+                    {
+                        "data": {
+                            "groups": [
+                                {
+                                    "name": "HttpRequestDuration",
+                                    "rules": [
+                                        {
+                                            "record": "handler:prometheus_http_request_duration_seconds:rate5m",
+                                            "expr": "sum by (handler) (rate(prometheus_http_request_duration_seconds_count[5m]))"
+                                        }
+                                    ]
+                                }
+                            ]
+                        }
+                    }
+                ]
+            }
+        }
+    }
+
+
+class RuleBacktest(BaseModel):
+    data: dict
+    start: str = Field(regex=r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(|.\d{3})Z")
+    end: str = Field(regex=r"\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(|.\d{3})Z")
+    step: Optional[str] = None
+    _request_body_examples = {
+        "Prometheus Alerting Rule": {
+            "description": "Shows when the alerting rule **HighCPUUsage** would have fired in a day",
+            "value": {
+                "data": {
+                    "groups": [
+                        {
+                            "name": "ServiceHealthAlerts",
+                            "rules": [
+                                {
+                                    "alert": "HighCPUUsage",
+                                    "expr": "sum(rate(cpu_usage{job=\"webserver\"}[5m])) > 0.8",
+                                    "for": "5m",
+                                    "labels": {
+                                        "severity": "warning"
+                                    }
+                                }
+                            ]
+                        }
+                    ]
+                },
+                "start": "2024-01-30T00:00:00Z",
+                "end": "2024-01-30T23:59:59Z"
+            }
+        },
+        "Prometheus Alerting Rule with a custom step": {
+            "description": "Evaluates the alerting rule **HighCPUUsage** every 5 minutes for a week",
+            "value": {
+                "data": {
+                    "groups": [
+                        {
+                            "name": "ServiceHealthAlerts",
+                            "rules": [
+                                {
+                                    "alert": "HighCPUUsage",
+                                    "expr": "sum(rate(cpu_usage{job=\"webserver\"}[5m])) > 0.8",
+                                    "for": "15m",
+                                    "keep_firing_for": "10m"
+                                }
+                            ]
+                        }
+                    ]
+                },
+                "start": "2024-01-24T00:00:00Z",
+                "end": "2024-01-30T23:59:59Z",
+                "step": "5m"
+            }
+        }
+    }
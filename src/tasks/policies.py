@@ -1,12 +1,10 @@
 from src.core.policies import load_policies
-from src.utils.arguments import arg_parser
+from src.utils import upstream
 from src.utils.log import logger
 from pytimeparse2 import parse
 from time import time
-import requests
 
 
-prom_addr = arg_parser().get("prom.addr")
 running_tasks = False
 
 
@@ -15,22 +13,26 @@ def delete_series(policy_name: str, policy: dict) -> bool:
     This function calls following Prometheus endpoint:
     POST /api/v1/admin/tsdb/delete_series
     User-defined policies passed to this function
-    perform clean-up based on the specified policy settings.
+    perform clean-up based on the specified policy settings
+    on every Prometheus replica.
     """
     time_range = time() - parse(policy["keep_for"])
-    try:
-        r = requests.post(
-            f'{prom_addr}/api/v1/admin/tsdb/delete_series?match[]={policy["match"]}&end={time_range}')
-    except BaseException as e:
-        logger.error(e, extra={"policy_name": policy_name})
-    else:
-        if r.status_code == 204:
-            logger.debug("Task clean-up time-series has been successfully completed",
-                         extra={"policy_name": policy_name})
-            return True
-        logger.error(f"Failed to delete series, {r.json().get('error')}", extra={
-                     "status": r.status_code, "policy_name": policy_name})
-    return False
+    completed = True
+    for addr, r in upstream.client.broadcast(
+            "POST", "/api/v1/admin/tsdb/delete_series",
+            params={"match[]": policy["match"], "end": time_range},
+            timeout=upstream.timeout("/api/v1/admin/tsdb/delete_series")):
+        if isinstance(r, Exception):
+            logger.error(r, extra={"policy_name": policy_name, "prom_addr": addr})
+            completed = False
+        elif r.status_code != 204:
+            logger.error(f"Failed to delete series, {r.json().get('error')}", extra={
+                         "status": r.status_code, "policy_name": policy_name, "prom_addr": addr})
+            completed = False
+    if completed:
+        logger.debug("Task clean-up time-series has been successfully completed",
+                     extra={"policy_name": policy_name})
+    return completed
 
 
 def clean_tombstones() -> bool:
@@ -40,17 +42,18 @@ def clean_tombstones() -> bool:
     Removes the deleted data from disk and
     cleans up the existing tombstones
     """
-    try:
-        r = requests.post(
-            f'{prom_addr}/api/v1/admin/tsdb/clean_tombstones')
-    except BaseException as e:
-        logger.error(e)
-    else:
-        if r.status_code == 204:
-            return True
-        logger.error(f"Failed to clean tombstones, {r.json().get('error')}", extra={
-            "status": r.status_code})
-    return False
+    completed = True
+    for addr, r in upstream.client.broadcast(
+            "POST", "/api/v1/admin/tsdb/clean_tombstones",
+            timeout=upstream.timeout("/api/v1/admin/tsdb/clean_tombstones")):
+        if isinstance(r, Exception):
+            logger.error(r, extra={"prom_addr": addr})
+            completed = False
+        elif r.status_code != 204:
+            logger.error(f"Failed to clean tombstones, {r.json().get('error')}", extra={
+                "status": r.status_code, "prom_addr": addr})
+            completed = False
+    return completed
 
 
 def run_policies() -> bool:
@@ -28,7 +28,8 @@ def arg_parser() -> dict:
         "--prom.addr",
         required=True,
         type=str,
-        help="URL of Prometheus server, e.g. http://localhost:9090")
+        help="URL of Prometheus server, e.g. http://localhost:9090. "
+             "Comma-separated URLs of Prometheus HA replicas enable failover between them")
 
     parser.add_argument(
         "--web.listen-address",
@@ -53,6 +54,23 @@ def arg_parser() -> dict:
         help="rule files will be created with this suffix"
     )
 
+    parser.add_argument(
+        "--rule.reload-window",
+        required=False,
+        type=str,
+        default="100ms",
+        help="Prometheus reloads requested by rule changes within this window are merged into one reload"
+    )
+
+    parser.add_argument(
+        "--rule.index-scan-interval",
+        required=False,
+        type=str,
+        default="30s",
+        help="the in-memory index of the rules directory is rescanned at this interval. Changes are "
+             "picked up immediately when the watchdog package is installed"
+    )
+
     parser.add_argument(
         "--log.level",
         required=False,
@@ -71,4 +89,304 @@ def arg_parser() -> dict:
         help="enable web management UI"
     )
 
+    parser.add_argument(
+        "--export.max-parallel-queries",
+        required=False,
+        type=int,
+        default=4,
+        help="maximum number of concurrent sub-queries sent to Prometheus by a single export"
+    )
+
+    parser.add_argument(
+        "--export.max-points-per-query",
+        required=False,
+        type=int,
+        default=11000,
+        help="long export time ranges are split into sub-queries with at most this many points per time-series"
+    )
+
+    parser.add_argument(
+        "--export.job-path",
+        required=False,
+        type=str,
+        default="/tmp/parosly-export-jobs",
+        help="directory where the results of export jobs are stored"
+    )
+
+    parser.add_argument(
+        "--export.job-ttl",
+        required=False,
+        type=str,
+        default="1h",
+        help="how long the results of finished export jobs are kept, e.g. 30m, 1h, 1d"
+    )
+
+    parser.add_argument(
+        "--export.job-workers",
+        required=False,
+        type=int,
+        default=2,
+        help="number of export jobs processed concurrently"
+    )
+
+    parser.add_argument(
+        "--export.max-queued-jobs",
+        required=False,
+        type=int,
+        default=100,
+        help="maximum number of queued and running export jobs"
+    )
+
+    parser.add_argument(
+        "--export.cache-size",
+        required=False,
+        type=int,
+        default=256,
+        help="maximum size in megabytes of the cache of export results. 0 disables the cache"
+    )
+
+    parser.add_argument(
+        "--export.cache-max-entry-size",
+        required=False,
+        type=int,
+        default=16,
+        help="maximum size in megabytes of a single cached export result. Larger results are not cached"
+    )
+
+    parser.add_argument(
+        "--proxy.cache-size",
+        required=False,
+        type=int,
+        default=256,
+        help="maximum size in megabytes of the in-memory cache of range query results. 0 disables the cache"
+    )
+
+    parser.add_argument(
+        "--proxy.cache-path",
+        required=False,
+        type=str,
+        help="directory of the on-disk cache of range query results. Disabled if not set"
+    )
+
+    parser.add_argument(
+        "--proxy.cache-disk-size",
+        required=False,
+        type=int,
+        default=1024,
+        help="maximum size in megabytes of the on-disk cache of range query results"
+    )
+
+    parser.add_argument(
+        "--proxy.cache-split-interval",
+        required=False,
+        type=str,
+        default="1h",
+        help="range queries are split into time buckets of this length, which are cached independently"
+    )
+
+    parser.add_argument(
+        "--proxy.cache-max-freshness",
+        required=False,
+        type=str,
+        default="5m",
+        help="time buckets newer than this are always queried from Prometheus and never cached"
+    )
+
+    parser.add_argument(
+        "--proxy.metadata-cache-size",
+        required=False,
+        type=int,
+        default=64,
+        help="maximum size in megabytes of the cache of labels, label values, series and metadata responses. 0 disables the cache"
+    )
+
+    parser.add_argument(
+        "--proxy.metadata-cache-ttl",
+        required=False,
+        type=str,
+        default="1m",
+        help="how long cached labels, label values, series and metadata responses are considered fresh"
+    )
+
+    parser.add_argument(
+        "--proxy.metadata-cache-max-stale",
+        required=False,
+        type=str,
+        default="10m",
+        help="how long after their TTL cached responses are still served while being refreshed in the background"
+    )
+
+    parser.add_argument(
+        "--proxy.max-concurrent-queries",
+        required=False,
+        type=int,
+        default=0,
+        help="maximum number of queries running against Prometheus through the proxy. Admission control is disabled "
+             "by default (0), set it to limit the queries and to queue the queries of each client separately"
+    )
+
+    parser.add_argument(
+        "--proxy.max-concurrent-queries-per-client",
+        required=False,
+        type=int,
+        default=4,
+        help="maximum number of queries of a single client running against Prometheus through the proxy"
+    )
+
+    parser.add_argument(
+        "--proxy.max-queued-queries",
+        required=False,
+        type=int,
+        default=200,
+        help="maximum number of queries waiting for admission. Further queries are rejected with 429"
+    )
+
+    parser.add_argument(
+        "--proxy.max-queued-queries-per-client",
+        required=False,
+        type=int,
+        default=20,
+        help="maximum number of queries of a single client waiting for admission"
+    )
+
+    parser.add_argument(
+        "--proxy.tenant-header",
+        required=False,
+        type=str,
+        default="X-Scope-OrgID",
+        help="HTTP header identifying the tenant of a query. Clients are identified by source IP without it"
+    )
+
+    parser.add_argument(
+        "--proxy.query-shards",
+        required=False,
+        type=int,
+        default=0,
+        help="number of concurrent sub-queries sum, count, min, max and group aggregations are split into. 0 disables query sharding"
+    )
+
+    parser.add_argument(
+        "--proxy.shard-label",
+        required=False,
+        type=str,
+        default="instance",
+        help="label whose values are used to partition the series of sharded queries"
+    )
+
+    parser.add_argument(
+        "--proxy.slow-query-threshold",
+        required=False,
+        type=str,
+        default="5s",
+        help="duration after which queries are logged as slow queries, with their cost. 0 disables the slow query log"
+    )
+
+    parser.add_argument(
+        "--proxy.max-query-fingerprints",
+        required=False,
+        type=int,
+        default=500,
+        help="maximum number of query fingerprints with their own per-query metrics. Other queries are accounted "
+             "under the 'other' fingerprint"
+    )
+
+    parser.add_argument(
+        "--proxy.fanout-upstreams",
+        required=False,
+        type=str,
+        default="",
+        help="comma-separated Prometheus servers queried by fan-out queries (fanout=true), as name=URL or URL, "
+             "e.g. eu=http://prometheus-eu:9090,us=http://prometheus-us:9090"
+    )
+
+    parser.add_argument(
+        "--proxy.fanout-timeout",
+        required=False,
+        type=str,
+        default="30s",
+        help="time each Prometheus server has to answer a fan-out query before the response is marked as partial"
+    )
+
+    parser.add_argument(
+        "--proxy.fanout-source-label",
+        required=False,
+        type=str,
+        default="prometheus",
+        help="label added to the series of fan-out queries with the name of the Prometheus server they come from"
+    )
+
+    parser.add_argument(
+        "--upstream.max-connections",
+        required=False,
+        type=int,
+        default=100,
+        help="maximum number of concurrent connections to Prometheus"
+    )
+
+    parser.add_argument(
+        "--upstream.max-keepalive-connections",
+        required=False,
+        type=int,
+        default=20,
+        help="maximum number of idle keep-alive connections to Prometheus"
+    )
+
+    parser.add_argument(
+        "--upstream.keepalive-timeout",
+        required=False,
+        type=str,
+        default="30s",
+        help="how long idle connections to Prometheus are kept open"
+    )
+
+    parser.add_argument(
+        "--upstream.connect-timeout",
+        required=False,
+        type=str,
+        default="5s",
+        help="timeout for establishing a connection to Prometheus"
+    )
+
+    parser.add_argument(
+        "--upstream.query-timeout",
+        required=False,
+        type=str,
+        default="2m",
+        help="timeout for query, series, labels and remote read requests to Prometheus"
+    )
+
+    parser.add_argument(
+        "--upstream.admin-timeout",
+        required=False,
+        type=str,
+        default="5m",
+        help="timeout for TSDB admin and reload requests to Prometheus"
+    )
+
+    parser.add_argument(
+        "--upstream.timeout",
+        required=False,
+        type=str,
+        default="30s",
+        help="timeout for other requests to Prometheus"
+    )
+
+    parser.add_argument(
+        "--upstream.hedge-percentile",
+        required=False,
+        type=float,
+        default=0,
+        help="percentile of the latency of a Prometheus replica after which a read query is also sent "
+             "to the next replica, e.g. 95. 0 disables hedged requests"
+    )
+
+    parser.add_argument(
+        "--upstream.http2",
+        required=False,
+        type=str,
+        default="false",
+        choices=["true", "false"],
+        help="use HTTP/2 for connections to Prometheus served over TLS"
+    )
+
     return parser.parse_args().__dict__
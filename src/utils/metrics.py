@@ -1,8 +1,43 @@
 from prometheus_fastapi_instrumentator import PrometheusFastApiInstrumentator
+from prometheus_client import Histogram, Counter, Gauge
 from fastapi import FastAPI
 from .log import logger
 from sys import modules
 
+proxy_request_body_bytes = Histogram(
+    "parosly_proxy_request_body_bytes",
+    "Size of request bodies forwarded to Prometheus by the reverse proxy",
+    buckets=[0, 256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216])
+proxy_overhead_seconds = Histogram(
+    "parosly_proxy_overhead_seconds",
+    "Time spent by the reverse proxy on a request before forwarding it to Prometheus",
+    buckets=[0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1])
+proxy_queue_wait_seconds = Histogram(
+    "parosly_proxy_queue_wait_seconds",
+    "Time queries spent waiting for admission in the reverse proxy",
+    buckets=[0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60])
+proxy_rejected_queries = Counter(
+    "parosly_proxy_rejected_queries_total",
+    "Queries rejected by the admission control of the reverse proxy")
+
+proxy_query_duration_seconds = Histogram(
+    "parosly_proxy_query_duration_seconds",
+    "Duration of queries sent through the reverse proxy by query fingerprint",
+    ["fingerprint"],
+    buckets=[0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120])
+proxy_query_response_bytes = Counter(
+    "parosly_proxy_query_response_bytes_total",
+    "Size of query responses returned by Prometheus by query fingerprint",
+    ["fingerprint"])
+proxy_query_samples = Counter(
+    "parosly_proxy_query_samples_total",
+    "Samples loaded by queries by query fingerprint, reported by Prometheus for queries with stats=all",
+    ["fingerprint"])
+proxy_query_fingerprint = Gauge(
+    "parosly_proxy_query_fingerprint",
+    "Query template of each query fingerprint, numbers, strings and durations replaced with '?'",
+    ["fingerprint", "query"])
+
 
 def metrics(app: FastAPI):
     """
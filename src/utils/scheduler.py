@@ -1,6 +1,10 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from apscheduler.triggers.interval import IntervalTrigger
+from src.core.export_jobs import cleanup_jobs
 from src.tasks.policies import run_policies
+from src.utils.arguments import arg_parser
+from src.core.query import parse_duration
+from src.core.rule_index import index
 import atexit
 
 
@@ -13,4 +17,18 @@ def schedule(trigger=IntervalTrigger(hours=2)):
         replace_existing=True,
         name="Clean-up Prometheus time-series"
     )
+    scheduler.add_job(
+        func=cleanup_jobs,
+        trigger=IntervalTrigger(minutes=1),
+        replace_existing=True,
+        name="Clean-up expired export jobs"
+    )
+    scan_interval = parse_duration(arg_parser().get("rule.index_scan_interval"))
+    if scan_interval > 0:
+        scheduler.add_job(
+            func=index.scan,
+            trigger=IntervalTrigger(seconds=scan_interval),
+            replace_existing=True,
+            name="Rescan the rules directory"
+        )
     atexit.register(lambda: scheduler.shutdown())
@@ -2,19 +2,23 @@ from src.utils.arguments import arg_parser
 from os.path import exists, isdir, isfile
 from os import remove, access, W_OK
 from .log import logger
+from . import upstream
 from time import sleep
-import requests
+import httpx
 
 args = arg_parser()
-prom_addr, config_file, rule_path = \
-    args.get("prom.addr"), args.get("config.file"), args.get("rule.path")
+prom_addrs, config_file, rule_path = \
+    upstream.prom_addrs, args.get("config.file"), args.get("rule.path")
 
 
-def check_prom_readiness(prometheus_address: str = prom_addr) -> bool:
-    """Checks the connection to the Prometheus server over HTTP."""
+def check_prom_readiness(prometheus_address: str = "") -> bool:
+    """
+    Checks the connection to the Prometheus server over HTTP.
+    Without an address, any ready replica is enough.
+    """
     try:
-        r = requests.get(f"{prometheus_address}/-/ready")
-    except requests.exceptions.ConnectionError as e:
+        r = upstream.client.get(f"{prometheus_address}/-/ready")
+    except httpx.TransportError as e:
         logger.error(e)
     else:
         if r.status_code == 200:
@@ -28,15 +32,15 @@ def check_prom_readiness(prometheus_address: str = prom_addr) -> bool:
 
 
 def establish_prom_connection(
-        prometheus_address: str = prom_addr, retries=600) -> bool:
+        prometheus_addresses: list = prom_addrs, retries=600) -> bool:
     """
     This function continuously checks the
-    connection to the Prometheus server, waiting
-    for it to establish. The total wait time is
-    30 minutes (600 checks at 3-second intervals)
+    connection to the Prometheus servers, waiting
+    for at least one of them to establish. The total
+    wait time is 30 minutes (600 checks at 3-second intervals)
     """
     for i in range(retries):
-        if check_prom_readiness(prometheus_address):
+        if any([check_prom_readiness(addr) for addr in prometheus_addresses]):
             return True
         sleep(3)
     logger.error(
@@ -44,19 +48,22 @@ def establish_prom_connection(
     return False
 
 
-def check_reload_api_status(prometheus_address: str = prom_addr) -> bool:
-    """Checks the status of the Prometheus Management API."""
-    try:
-        r = requests.post(f"{prometheus_address}/-/reload")
-    except requests.exceptions.ConnectionError as e:
-        logger.error(e)
-    else:
-        if r.status_code == 403:
+def check_reload_api_status() -> bool:
+    """
+    Checks the status of the Prometheus Management
+    API on every replica that is reachable.
+    """
+    for addr, r in upstream.client.broadcast("POST", "/-/reload",
+                                             timeout=upstream.timeout("/-/reload")):
+        if isinstance(r, httpx.HTTPError):
+            logger.error(r, extra={"prom_addr": addr})
+        elif r.status_code == 403:
             logger.error(
                 f"{r.text} It's disabled by default and can be enabled via the --web.enable-lifecycle. "
-                f"See https://prometheus.io/docs/prometheus/latest/management_api/#reload for more details.")
+                f"See https://prometheus.io/docs/prometheus/latest/management_api/#reload for more details.",
+                extra={"prom_addr": addr})
             return False
-        return True
+    return True
 
 
 def check_files_and_directories(
@@ -116,14 +123,14 @@ def check_fs_permissions(prometheus_rules_dir: str = rule_path,
     return all([config_file_writable(), rules_dir_writable()])
 
 
-def prom_info(prometheus_address, sub_path) -> dict:
+def prom_info(prometheus_address: str = "", sub_path: str = "") -> dict:
     """
     Returns various runtime, and configuration information properties
     about the Prometheus server based on the sub_path parameter
     """
     try:
-        r = requests.get(f"{prometheus_address}/api/v1/status{sub_path}")
-    except requests.exceptions.ConnectionError as e:
+        r = upstream.client.get(f"{prometheus_address}/api/v1/status{sub_path}")
+    except httpx.TransportError as e:
         logger.error(e)
         return {}
     return r.json()
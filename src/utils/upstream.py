@@ -0,0 +1,304 @@
+from src.utils.arguments import arg_parser
+from typing import Awaitable, Callable, Iterator
+from contextlib import contextmanager
+from collections import deque
+from pytimeparse2 import parse
+from time import time, perf_counter
+import asyncio
+import httpx
+import re
+
+args = arg_parser()
+prom_addrs = [addr.strip().rstrip("/") for addr in args.get("prom.addr").split(",") if addr.strip()]
+prom_addr = prom_addrs[0]
+connect_timeout = parse(args.get("upstream.connect_timeout"))
+limits = httpx.Limits(
+    max_connections=args.get("upstream.max_connections"),
+    max_keepalive_connections=args.get("upstream.max_keepalive_connections"),
+    keepalive_expiry=parse(args.get("upstream.keepalive_timeout")))
+timeouts = {
+    "query": httpx.Timeout(parse(args.get("upstream.query_timeout")), connect=connect_timeout),
+    "admin": httpx.Timeout(parse(args.get("upstream.admin_timeout")), connect=connect_timeout),
+    "default": httpx.Timeout(parse(args.get("upstream.timeout")), connect=connect_timeout)
+}
+query_paths = re.compile(
+    r"^/api/v1/(query|query_range|query_exemplars|series|labels|label/[^/]+/values|read)$|^/federate$")
+admin_paths = re.compile(r"^/api/v1/admin/|^/-/(reload|quit)$")
+http2 = args.get("upstream.http2") == "true"
+hedge_percentile = args.get("upstream.hedge_percentile")
+retry_status_codes = [502, 503, 504]
+min_latency_samples = 20
+max_backoff = 30
+
+
+def timeout(path: str) -> httpx.Timeout:
+    """
+    This function returns the timeout of requests
+    to Prometheus depending on the API route
+    """
+    if query_paths.match(path):
+        return timeouts["query"]
+    if admin_paths.match(path):
+        return timeouts["admin"]
+    return timeouts["default"]
+
+
+class Upstream:
+    """
+    A Prometheus replica with its own connection pools and
+    health state. A replica that fails is skipped for an
+    exponentially growing period, up to 30 seconds.
+    """
+
+    def __init__(self, addr: str):
+        self.addr = addr
+        self.client = httpx.Client(base_url=addr, limits=limits, http2=http2,
+                                   timeout=timeouts["default"])
+        self.async_client = httpx.AsyncClient(base_url=addr, limits=limits, http2=http2,
+                                              timeout=timeouts["default"])
+        self.failures, self.down_until = 0, 0
+        self.latencies = deque(maxlen=512)
+
+    @property
+    def healthy(self) -> bool:
+        return time() >= self.down_until
+
+    def succeeded(self, latency: float) -> None:
+        self.failures, self.down_until = 0, 0
+        self.latencies.append(latency)
+
+    def failed(self) -> None:
+        self.failures += 1
+        self.down_until = time() + min(2 ** (self.failures - 1), max_backoff)
+
+    def latency_percentile(self, percentile: float) -> float:
+        if len(self.latencies) < min_latency_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[int(percentile / 100 * (len(latencies) - 1))]
+
+
+pool = [Upstream(addr) for addr in prom_addrs]
+
+
+def candidates() -> list[Upstream]:
+    """
+    This function returns the replicas in the order they
+    should be tried: healthy ones first, in the order of
+    the '--prom.addr' flag, then the unhealthy ones
+    """
+    return [u for u in pool if u.healthy] + [u for u in pool if not u.healthy]
+
+
+def _retryable(resp: httpx.Response) -> bool:
+    return resp.status_code in retry_status_codes
+
+
+def _direct(url: str) -> Upstream:
+    """Returns the replica of the absolute URL"""
+    return next((u for u in pool if url.startswith(u.addr)), pool[0])
+
+
+class PoolClient:
+    """
+    A drop-in replacement of httpx.Client sending requests
+    to the first available Prometheus replica and failing
+    over to the next one on connection errors and 502, 503
+    and 504 responses. Absolute URLs are sent as they are.
+    """
+
+    def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if str(url).startswith(("http://", "https://")):
+            return _direct(str(url)).client.request(method, url, **kwargs)
+        upstreams, error = candidates(), None
+        for i, upstream in enumerate(upstreams):
+            started = perf_counter()
+            try:
+                resp = upstream.client.request(method, url, **kwargs)
+            except httpx.TransportError as e:
+                upstream.failed()
+                error = e
+                continue
+            if _retryable(resp) and i < len(upstreams) - 1:
+                upstream.failed()
+                continue
+            upstream.succeeded(perf_counter() - started)
+            return resp
+        raise error
+
+    @contextmanager
+    def stream(self, method: str, url: str, **kwargs) -> Iterator[httpx.Response]:
+        """
+        Sends the request like 'request' without reading the
+        response body, see httpx.Client.stream. Replicas are
+        failed over before the body is read
+        """
+        if str(url).startswith(("http://", "https://")):
+            upstreams = [_direct(str(url))]
+        else:
+            upstreams = candidates()
+        resp, error = None, None
+        for i, upstream in enumerate(upstreams):
+            started = perf_counter()
+            try:
+                resp = upstream.client.send(upstream.client.build_request(method, url, **kwargs), stream=True)
+            except httpx.TransportError as e:
+                upstream.failed()
+                error = e
+                continue
+            if _retryable(resp) and i < len(upstreams) - 1:
+                resp.close()
+                upstream.failed()
+                continue
+            upstream.succeeded(perf_counter() - started)
+            break
+        else:
+            raise error
+        try:
+            yield resp
+        finally:
+            resp.close()
+
+    def get(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> httpx.Response:
+        return self.request("POST", url, **kwargs)
+
+    def broadcast(self, method: str, url: str, addresses: list[str] = None,
+                  **kwargs) -> list[tuple[str, object]]:
+        """
+        Sends the request to every replica, or to the given
+        ones, and returns their responses or the errors raised
+        """
+        results = []
+        for addr in addresses or prom_addrs:
+            try:
+                results.append((addr, _direct(addr).client.request(method, f"{addr}{url}", **kwargs)))
+            except httpx.HTTPError as e:
+                results.append((addr, e))
+        return results
+
+
+class AsyncPoolClient:
+    """
+    A drop-in replacement of httpx.AsyncClient with failover
+    between the Prometheus replicas. Read queries may also be
+    hedged: if the first replica has not answered within the
+    '--upstream.hedge-percentile' of its latencies, the same
+    request is sent to the next replica and the first response
+    wins. Streamed request bodies fail over on connection
+    errors only and are never hedged.
+    """
+
+    async def _attempt(self, upstream: Upstream,
+                       send: Callable[[Upstream], Awaitable]) -> httpx.Response:
+        started = perf_counter()
+        try:
+            resp = await send(upstream)
+        except httpx.TransportError:
+            upstream.failed()
+            raise
+        if _retryable(resp):
+            upstream.failed()
+        else:
+            upstream.succeeded(perf_counter() - started)
+        return resp
+
+    async def _hedged(self, upstreams: list[Upstream], delay: float,
+                      send: Callable[[Upstream], Awaitable]) -> httpx.Response:
+        """
+        Runs the request on the first replica and, if it is
+        slower than the delay or fails, on the second one as well.
+        The responses which lose the race are closed
+        """
+        tasks = [asyncio.create_task(self._attempt(upstreams[0], send))]
+        pending, winner, result = set(tasks), None, None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=delay)
+            if not done or tasks[0].exception() is not None or _retryable(tasks[0].result()):
+                tasks.append(asyncio.create_task(self._attempt(upstreams[1], send)))
+            pending = set(tasks)
+            while pending and winner is None:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if winner is None and task.exception() is None and not _retryable(task.result()):
+                        winner = task
+                    result = result or task
+            winner = winner or result
+            return winner.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            for task in tasks:
+                if task is not winner and task.done() and not task.cancelled() and \
+                        task.exception() is None:
+                    await task.result().aclose()
+
+    async def _failover(self, send: Callable[[Upstream], Awaitable], hedge: bool = False,
+                        errors: tuple = (httpx.TransportError,), retry_status: bool = True):
+        upstreams = candidates()
+        delay = upstreams[0].latency_percentile(hedge_percentile) if hedge and hedge_percentile else None
+        if delay is not None and len(upstreams) > 1:
+            return await self._hedged(upstreams, delay, send)
+        error = None
+        for i, upstream in enumerate(upstreams):
+            try:
+                resp = await self._attempt(upstream, send)
+            except errors as e:
+                error = e
+                continue
+            if retry_status and _retryable(resp) and i < len(upstreams) - 1:
+                await resp.aclose()
+                continue
+            return resp
+        raise error
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        if str(url).startswith(("http://", "https://")):
+            return await _direct(str(url)).async_client.request(method, url, **kwargs)
+        return await self._failover(
+            lambda u: u.async_client.request(method, url, **kwargs),
+            hedge=bool(query_paths.match(str(url))))
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("GET", url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+    def build_request(self, method: str, url: httpx.URL, **kwargs) -> httpx.Request:
+        return pool[0].async_client.build_request(method, url, **kwargs)
+
+    async def send(self, request: httpx.Request, stream: bool = False) -> httpx.Response:
+        """
+        Sends the request built for the first replica to the
+        first available one. Buffered requests fail over like
+        the other ones, streamed request bodies are retried on
+        connection errors only, since they may be consumed by then.
+        """
+        buffered = isinstance(request.stream, httpx.ByteStream)
+        prefix = len(httpx.URL(prom_addr).raw_path.rstrip(b"/"))
+
+        def retarget(upstream: Upstream) -> httpx.Request:
+            base = httpx.URL(upstream.addr)
+            url = request.url.copy_with(
+                scheme=base.scheme, host=base.host, port=base.port,
+                raw_path=base.raw_path.rstrip(b"/") + request.url.raw_path[prefix:])
+            if not buffered:
+                request.url = url
+                return request
+            return httpx.Request(request.method, url, headers=request.headers,
+                                 content=request.content, extensions=request.extensions)
+
+        if buffered:
+            return await self._failover(
+                lambda u: u.async_client.send(retarget(u), stream=stream),
+                hedge=bool(query_paths.match(request.url.path)))
+        return await self._failover(
+            lambda u: u.async_client.send(retarget(u), stream=stream),
+            errors=(httpx.ConnectError, httpx.ConnectTimeout), retry_status=False)
+
+
+client = PoolClient()
+async_client = AsyncPoolClient()
@@ -1,5 +1,37 @@
-from jsonschema import validate, exceptions
+from jsonschema import validators, exceptions
+from functools import lru_cache
+from .log import logger
 import json
+import os
+
+
+@lru_cache(maxsize=None)
+def schema_validator(schema_file: str):
+    """
+    This function loads the schema from disk, checks it and
+    compiles its validator once. The validator is reused by
+    every later validation against the same schema.
+    """
+    with open(f"src/schemas/{schema_file}") as f:
+        schema = json.load(f)
+    cls = validators.validator_for(schema)
+    cls.check_schema(schema)
+    return cls(schema)
+
+
+def compile_schemas(schema_path: str = "src/schemas") -> bool:
+    """
+    This function compiles the validators of all schemas
+    at startup, so the first requests do not pay for it
+    and broken schemas are found early
+    """
+    for schema_file in sorted(f for f in os.listdir(schema_path) if f.endswith(".json")):
+        try:
+            schema_validator(schema_file)
+        except (OSError, ValueError, exceptions.SchemaError) as e:
+            logger.error(f"Failed to compile JSON schema {schema_file}. {e}")
+            return False
+    return True
 
 
 def validate_schema(schema_file, data) -> tuple[bool, int, str, str]:
@@ -7,12 +39,7 @@ def validate_schema(schema_file, data) -> tuple[bool, int, str, str]:
     This function validates the passed object
     provided by the user against the required schema.
     """
-    schema_file = f"src/schemas/{schema_file}"
-    with open(schema_file) as f:
-        schema = json.load(f)
-    try:
-        validate(instance=data, schema=schema)
-    except exceptions.ValidationError as e:
-        return False, 400, "error", e.args[0]
+    error = exceptions.best_match(schema_validator(schema_file).iter_errors(data))
+    if error is not None:
+        return False, 400, "error", error.args[0]
     return True, 200, "success", "Data is valid"
-
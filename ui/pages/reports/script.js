@@ -7,6 +7,19 @@ document.addEventListener('DOMContentLoaded', function() {
     
     modal.style.display = "none";
 
+    // Parquet and Arrow IPC are offered only if the server has the pyarrow package
+    fetch('/health')
+        .then(response => response.json())
+        .then(data => data.export_formats || [])
+        .catch(() => [])
+        .then(formats => {
+            document.querySelectorAll('#format option[data-requires="pyarrow"]').forEach(option => {
+                if (!formats.includes(option.value)) {
+                    option.remove();
+                }
+            });
+        });
+
     btn.onclick = function() {
         modal.style.display = "flex"; 
     }
@@ -27,6 +40,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const step = document.getElementById('step').value;
         const timestamp_format = document.getElementById('timestamp_format').value;
         const format = document.getElementById('format').value;
+        const layout = document.getElementById('layout').value;
+        const columnLabels = document.getElementById('column_labels').value
+            .split(',').map(label => label.trim()).filter(label => label);
 
         const replaceFields = {};
         document.querySelectorAll('.replace-field').forEach(field => {
@@ -43,7 +59,9 @@ document.addEventListener('DOMContentLoaded', function() {
             end: end,
             step: step,
             timestamp_format: timestamp_format,
-            replace_fields: replaceFields
+            replace_fields: replaceFields,
+            layout: layout,
+            column_labels: columnLabels
         };
 
         try {